@@ -0,0 +1,672 @@
+import argparse
+import json
+import math
+import os
+import platform
+import struct
+import sys
+import tempfile
+import timeit
+import tracemalloc
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from main import LNK, LNKCache, LNKIndex, LNKLimits, LNKMetrics, LNKParseError, LNKPathCache, LNKTemplate, LNKTimeline, LNKVerifyReport, _FILE_ATTRIBUTES, _LINK_FLAGS, _ShellLinkHeader, systemTimeToUtcSeconds, utcSecondsToSystemTime
+
+# ----------------------------------------------------------------------------------
+# CORPUS SYNTHESIS
+
+FILETIME_2020 = 132223104000000000 # 2020-01-01T00:00:00Z
+
+def synthesizeHeader(linkFlags: int = 0x9B, fileAttributes: int = 0x20, fileSize: int = 4096):
+    return struct.pack(
+        "<I16sIIQQQIiIBB10x",
+        0x4C, _ShellLinkHeader.LINK_CLSID, linkFlags, fileAttributes,
+        FILETIME_2020, FILETIME_2020, FILETIME_2020,
+        fileSize, 0, 1, 0, 0
+        )
+
+def synthesizeIdList(itemIdDatas: list):
+    contents = b""
+    for itemIdData in itemIdDatas:
+        contents += struct.pack("<H", 2 + len(itemIdData)) + itemIdData
+    contents += b"\x00\x00" # TerminalID
+    return struct.pack("<H", len(contents)) + contents
+
+def synthesizeItemIdDatas(path: str = "C:\\Windows\\System32\\cmd.exe"):
+    # Root folder (My Computer), volume, then one file entry per path component
+    itemIdDatas = [b"\x1F\x50" + uuid.UUID("20D04FE0-3AEA-1069-A2D8-08002B30309D").bytes_le]
+    components = path.split("\\")
+    itemIdDatas.append(b"\x2F" + (components[0] + "\\").encode("ascii").ljust(22, b"\x00"))
+    for i, component in enumerate(components[1:]):
+        isFile = i == len(components) - 2
+        primaryName = component.encode("ascii") + b"\x00"
+        primaryName += b"\x00" * (len(primaryName) % 2)
+        itemIdDatas.append(
+            bytes([0x32 if isFile else 0x31, 0x00])
+            + struct.pack("<IIH", 4096 if isFile else 0, 0x50215021, 0x20 if isFile else 0x10)
+            + primaryName
+            )
+    return itemIdDatas
+
+def synthesizeLinkInfoLocal(localBasePath: str = "C:\\Windows\\System32\\cmd.exe", volumeLabel: str = "OS", driveSerialNumber: int = 0x1234ABCD):
+    volumeId = struct.pack("<IIII", 16 + len(volumeLabel) + 1, 3, driveSerialNumber, 0x10) + volumeLabel.encode("ascii") + b"\x00"
+    localBasePathEncoded = localBasePath.encode("ascii") + b"\x00"
+    volumeIdOffset = 0x1C
+    localBasePathOffset = volumeIdOffset + len(volumeId)
+    commonPathSuffixOffset = localBasePathOffset + len(localBasePathEncoded)
+    linkInfoSize = commonPathSuffixOffset + 1
+    return (
+        struct.pack("<IIIIIII", linkInfoSize, 0x1C, 1, volumeIdOffset, localBasePathOffset, 0, commonPathSuffixOffset)
+        + volumeId + localBasePathEncoded + b"\x00"
+        )
+
+def synthesizeLinkInfoNetwork(netName: str = "\\\\SERVER\\share", commonPathSuffix: str = "tools\\run.exe"):
+    netNameEncoded = netName.encode("ascii") + b"\x00"
+    commonNetworkRelativeLink = struct.pack("<IIIII", 0x14 + len(netNameEncoded), 2, 0x14, 0, 0x00020000) + netNameEncoded
+    commonNetworkRelativeLinkOffset = 0x1C
+    commonPathSuffixOffset = commonNetworkRelativeLinkOffset + len(commonNetworkRelativeLink)
+    commonPathSuffixEncoded = commonPathSuffix.encode("ascii") + b"\x00"
+    linkInfoSize = commonPathSuffixOffset + len(commonPathSuffixEncoded)
+    return (
+        struct.pack("<IIIIIII", linkInfoSize, 0x1C, 2, 0, 0, commonNetworkRelativeLinkOffset, commonPathSuffixOffset)
+        + commonNetworkRelativeLink + commonPathSuffixEncoded
+        )
+
+def synthesizeStringData(strings: list, isUnicode: bool = True):
+    contents = b""
+    for string in strings:
+        contents += struct.pack("<H", len(string)) + string.encode("utf-16le" if isUnicode else "ascii")
+    return contents
+
+# PropertyStoreDataBlock; one storage per FormatID, each value a VT_LPWSTR
+def synthesizePropertyStoreDataBlock(properties: dict):
+    storages = {}
+    for (formatId, propertyId), value in properties.items():
+        encoded = (value + "\x00").encode("utf-16le")
+        encoded += b"\x00" * (-len(encoded) % 4)
+        typedValue = struct.pack("<HHI", 0x1F, 0, len(value) + 1) + encoded
+        storages.setdefault(formatId, b"")
+        storages[formatId] += struct.pack("<IIB", 9 + len(typedValue), propertyId, 0) + typedValue
+
+    propertyStore = b""
+    for formatId, values in storages.items():
+        values += b"\x00\x00\x00\x00" # End of the storage
+        propertyStore += struct.pack("<II16s", 24 + len(values), 0x53505331, uuid.UUID(formatId).bytes_le) + values
+    propertyStore += b"\x00\x00\x00\x00" # TerminalStorage
+    return struct.pack("<II", 8 + len(propertyStore), 0xA0000009) + propertyStore
+
+# A typical shortcut: IDList, local LinkInfo and four unicode strings
+def synthesizeLnk(isUnicode: bool = True, isNetwork: bool = False, arguments: str = "/c echo hello", extraData: bytes = b""):
+    linkFlags = 0x01 | 0x02 | 0x08 | 0x10 | 0x20 | 0x40 | (0x80 if isUnicode else 0)
+    return (
+        synthesizeHeader(linkFlags = linkFlags)
+        + synthesizeIdList(synthesizeItemIdDatas())
+        + (synthesizeLinkInfoNetwork() if isNetwork else synthesizeLinkInfoLocal())
+        + synthesizeStringData(["..\\..\\Windows\\System32\\cmd.exe", "C:\\Windows\\System32", arguments, "%SystemRoot%\\System32\\shell32.dll"], isUnicode)
+        + extraData
+        + b"\x00\x00\x00\x00" # TerminalBlock
+        )
+
+def synthesizeTrackerDataBlock(machineId: str = "host"):
+    return struct.pack("<IIII16s16s16s16s16s", 0x60, 0xA0000003, 0x58, 0, machineId.encode("ascii"), *(uuid.uuid4().bytes_le for i in range(4)))
+
+# Corpus shape -> function(i) returning the i-th file; files differ slightly so nothing can be shared between them
+CORPUS_SHAPES = {
+    "header-only": lambda i: synthesizeHeader(linkFlags = 0, fileSize = i) + b"\x00\x00\x00\x00",
+    "idlist-heavy": lambda i: (
+        synthesizeHeader(linkFlags = 0x01 | 0x80)
+        + synthesizeIdList(synthesizeItemIdDatas("C:\\" + "\\".join(f"folder{depth}" for depth in range(40)) + f"\\file{i}.txt"))
+        + b"\x00\x00\x00\x00"
+        ),
+    "network": lambda i: synthesizeLnk(isNetwork = True, arguments = f"/c echo {i}"),
+    "unicode": lambda i: synthesizeLnk(arguments = f"/c echo \u00e9t\u00e9 \u65e5\u672c\u8a9e {i} " + "\u0436" * 512),
+    "large-extradata": lambda i: synthesizeLnk(
+        arguments = f"/c echo {i}",
+        extraData = synthesizeTrackerDataBlock(f"host{i % 100}") + synthesizePropertyStoreDataBlock({(str(uuid.UUID(int = key + 1)), 2): "value " * 32 for key in range(64)})
+        ),
+}
+
+# CORPUS SYNTHESIS END
+# ----------------------------------------------------------------------------------
+
+
+
+# ----------------------------------------------------------------------------------
+# PER-FIELD REFERENCE
+
+# The header decoder and encoder as they were before the single-struct rewrite: one getBit / packBit call per flag,
+# each rebuilding its byte (packBit: the whole 4-byte buffer), and per-field unpacking and concatenation otherwise.
+# Kept here only as the "before" of the A/B benchmarks; its bit order (most significant bit first) was the bug the
+# rewrite fixed, so its flag values are not to be trusted, only its cost.
+
+def perFieldGetBit(contents: bytes, bitIndex = 0):
+    byteIndex = math.floor(bitIndex / 8)
+    byteExtracted = contents[byteIndex]
+
+    bitValue = (byteExtracted << (bitIndex % 8)) & 0xFF
+    bitValue = (bitValue >> 7) & 0xFF
+    bitValue = (bitValue << 7) & 0xFF
+
+    return bitValue != 0
+
+def perFieldPackBit(contents: bytes, bitIndex = 0, value: bool = False):
+    byteIndex = math.floor(bitIndex / 8)
+    byteExtracted = contents[byteIndex]
+
+    byteNew = 0
+    bitIndexInByte = bitIndex % 8
+    if value:
+        mask = ((0x01 << 7) >> bitIndexInByte) & 0xFF
+        byteNew = byteExtracted | mask
+    else:
+        mask1 = (0xFF >> (bitIndexInByte + 1)) & 0xFF
+        mask2 = (0xFF << (8 - bitIndexInByte)) & 0xFF
+        mask = mask1 | mask2
+        byteNew = byteExtracted & mask
+
+    return contents[0:byteIndex] + int.to_bytes(byteNew) + contents[byteIndex + 1:]
+
+# (name, bit index) of the LinkFlags and FileAttributes bits, as the per-field code walked them
+PER_FIELD_LINK_FLAGS = [(name, mask.bit_length() - 1) for name, mask in _LINK_FLAGS]
+PER_FIELD_FILE_ATTRIBUTES = [(name, mask.bit_length() - 1) for name, mask in _FILE_ATTRIBUTES]
+
+class PerFieldHeader:
+    def __init__(self, contents: bytes, offset: int = 0):
+        self.HeaderSize = struct.unpack_from("<I", contents, offset)[0]
+        self.LinkCLSID = bytes(contents[offset + 4:offset + 20])
+
+        linkFlagsBit = (offset + 20) * 8
+        for name, bitIndex in PER_FIELD_LINK_FLAGS:
+            setattr(self, name, perFieldGetBit(contents, linkFlagsBit + bitIndex))
+        fileAttributesBit = (offset + 24) * 8
+        for name, bitIndex in PER_FIELD_FILE_ATTRIBUTES:
+            setattr(self, name, perFieldGetBit(contents, fileAttributesBit + bitIndex))
+
+        self.CreationTime = systemTimeToUtcSeconds(contents, offset + 28)
+        self.AccessTime = systemTimeToUtcSeconds(contents, offset + 36)
+        self.WriteTime = systemTimeToUtcSeconds(contents, offset + 44)
+        self.FileSize = struct.unpack_from("<I", contents, offset + 52)[0]
+        self.IconIndex = struct.unpack_from("<i", contents, offset + 56)[0]
+        self.ShowCommand = struct.unpack_from("<I", contents, offset + 60)[0]
+        self.HotkeyFlags = [contents[offset + 64], contents[offset + 65]]
+
+    def pack(self):
+        contents = b""
+        contents += struct.pack("<I", self.HeaderSize)
+        contents += self.LinkCLSID
+
+        linkFlags = bytes(4)
+        for name, bitIndex in PER_FIELD_LINK_FLAGS:
+            linkFlags = perFieldPackBit(linkFlags, bitIndex, getattr(self, name))
+        contents += linkFlags
+
+        fileAttributes = bytes(4)
+        for name, bitIndex in PER_FIELD_FILE_ATTRIBUTES:
+            fileAttributes = perFieldPackBit(fileAttributes, bitIndex, getattr(self, name))
+        contents += fileAttributes
+
+        contents += utcSecondsToSystemTime(self.CreationTime)
+        contents += utcSecondsToSystemTime(self.AccessTime)
+        contents += utcSecondsToSystemTime(self.WriteTime)
+        contents += struct.pack("<I", self.FileSize)
+        contents += struct.pack("<i", self.IconIndex)
+        contents += struct.pack("<I", self.ShowCommand)
+        contents += int.to_bytes(self.HotkeyFlags[0]) + int.to_bytes(self.HotkeyFlags[1])
+        contents += bytes(2 + 4 + 4) # Reserved1 + Reserved2 + Reserved3
+        return contents
+
+# A section's fields copied into a plain __dict__ instance, as the sections kept them before __slots__
+class PerFieldSection:
+    def __init__(self, section = None):
+        if section != None:
+            for sectionClass in type(section).__mro__:
+                for name in getattr(sectionClass, "__slots__", ()):
+                    if hasattr(section, name):
+                        setattr(self, name, getattr(section, name))
+
+# PER-FIELD REFERENCE END
+# ----------------------------------------------------------------------------------
+
+
+
+# ----------------------------------------------------------------------------------
+# BENCHMARKS
+
+# Header decode, A/B: the per-field reference against the single-struct _ShellLinkHeader; the rewrite must be 5x faster
+def benchmarkHeader(iterations: int = 100000):
+    contents = synthesizeHeader()
+    perFieldSeconds = min(timeit.repeat(lambda: PerFieldHeader(contents), number=iterations, repeat=5))
+    seconds = min(timeit.repeat(lambda: _ShellLinkHeader(contents), number=iterations, repeat=5))
+    print(f"_ShellLinkHeader parse: {seconds / iterations * 1e6:.2f} us/header ({iterations / seconds:,.0f} headers/sec), per-field {perFieldSeconds / iterations * 1e6:.2f} us/header; {perFieldSeconds / seconds:.1f}x")
+    assert perFieldSeconds / seconds >= 5, "header decode is less than 5x faster than per-field decoding"
+
+# Retained memory per fully decoded LNK, as seen by tracemalloc: the __slots__ sections against the same fields held in
+# per-instance __dict__s, the way the object model stored them before (one attribute per flag in the header)
+def benchmarkMemory(count: int = 20000):
+    contents = synthesizeLnk()
+
+    def retainedPerLink(build):
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        lnks = [build() for i in range(count)]
+        retained = tracemalloc.get_traced_memory()[0] - baseline
+        tracemalloc.stop()
+        del lnks
+        return retained / count
+
+    def slotted():
+        lnk = LNK.fromBytes(contents)
+        for name in LNK.SECTIONS:
+            getattr(lnk, name)
+        return lnk
+
+    def perField():
+        lnk = slotted()
+        perFieldLnk = PerFieldSection()
+        perFieldLnk.shellLinkHeader = PerFieldHeader(contents)
+        for name in LNK.SECTIONS:
+            setattr(perFieldLnk, name, PerFieldSection(getattr(lnk, name)))
+        return perFieldLnk
+
+    perFieldBytes = retainedPerLink(perField)
+    slottedBytes = retainedPerLink(slotted)
+    print(f"LNK memory: {slottedBytes:,.0f} bytes/link retained, per-field __dict__ {perFieldBytes:,.0f} bytes/link over {count:,} links; {perFieldBytes / slottedBytes:.1f}x")
+    assert slottedBytes < perFieldBytes, "__slots__ sections retain more than per-field __dict__ sections"
+
+# Serialization with nothing cached: the header A/B against per-field packBit / concatenation, then whole links; the large
+# variant has a long IDList and a 32k-character argument string
+def benchmarkPack(iterations: int = 20000):
+    def decoded(contents):
+        lnk = LNK.fromBytes(contents)
+        for name in LNK.SECTIONS:
+            getattr(lnk, name)
+        return lnk
+
+    def packCold(lnk):
+        lnk._packCache = {}
+        return lnk.pack()
+
+    header = synthesizeHeader()
+    shellLinkHeader = _ShellLinkHeader(header)
+    perFieldHeader = PerFieldHeader(header)
+    perFieldSeconds = min(timeit.repeat(perFieldHeader.pack, number=iterations, repeat=5))
+    seconds = min(timeit.repeat(shellLinkHeader.pack, number=iterations, repeat=5))
+    print(f"_ShellLinkHeader pack: {seconds / iterations * 1e6:.2f} us/header, per-field {perFieldSeconds / iterations * 1e6:.2f} us/header; {perFieldSeconds / seconds:.1f}x")
+    assert perFieldSeconds > seconds, "header pack is slower than per-field packBit / concatenation"
+
+    lnk = decoded(synthesizeLnk())
+    seconds = min(timeit.repeat(lambda: packCold(lnk), number=iterations, repeat=5))
+    print(f"LNK pack: {seconds / iterations * 1e6:.2f} us/link ({len(lnk.pack()):,} bytes)")
+
+    lnk = decoded(synthesizeLnk(arguments = "a" * 32000))
+    lnk.linkTargetIdList.itemIdDatas = lnk.linkTargetIdList.itemIdDatas * 200
+    seconds = min(timeit.repeat(lambda: packCold(lnk), number=max(1, iterations // 20), repeat=5))
+    print(f"LNK pack (large): {seconds / max(1, iterations // 20) * 1e6:.2f} us/link ({len(lnk.pack()):,} bytes)")
+
+# Edit-in-place: parse, change one string, pack; untouched sections are copied from the source
+def benchmarkEdit(iterations: int = 20000):
+    contents = synthesizeLnk()
+
+    def edit():
+        lnk = LNK.fromBytes(contents)
+        lnk.stringData.COMMAND_LINE_ARGUMENTS = "/c echo edited"
+        return lnk.pack()
+
+    seconds = min(timeit.repeat(edit, number=iterations, repeat=5))
+    print(f"LNK edit: {seconds / iterations * 1e6:.2f} us/link parsed, edited and repacked")
+
+# One variant of a template: LNKTemplate.render against reparsing and repacking the whole link
+def benchmarkGenerate(iterations: int = 5000):
+    contents = synthesizeLnk()
+    template = LNKTemplate(LNK.fromBytes(contents))
+
+    def repack():
+        lnk = LNK.fromBytes(contents)
+        lnk.stringData.COMMAND_LINE_ARGUMENTS = "/c echo variant"
+        return lnk.pack()
+
+    renderSeconds = min(timeit.repeat(lambda: template.render({"COMMAND_LINE_ARGUMENTS": "/c echo variant"}), number=iterations, repeat=5))
+    repackSeconds = min(timeit.repeat(repack, number=iterations, repeat=5))
+    print(f"LNK variant: {renderSeconds / iterations * 1e6:.2f} us/link rendered from a template, {repackSeconds / iterations * 1e6:.2f} us/link reparsed and repacked")
+
+# One property out of a link with a large PropertyStoreDataBlock, against decoding every value in it
+def benchmarkProperties(iterations: int = 5000):
+    properties = {("B9B4B3FC-2B51-4A42-B5D8-324146AFCF25", 2): "C:\\Windows\\System32\\cmd.exe"}
+    for i in range(200):
+        properties[(str(uuid.UUID(int = i + 1)), 2 + (i % 8))] = "value " * 16
+    contents = synthesizeLnk(extraData = synthesizePropertyStoreDataBlock(properties))
+
+    def extractOne():
+        return LNK.fromBytes(contents).getProperty("System.Link.TargetParsingPath")
+
+    def decodeAll():
+        propertyStore = LNK.fromBytes(contents).extraData.getBlock("PropertyStoreDataBlock").propertyStore
+        return [propertyStore.getValue(key) for key in propertyStore.keys()]
+
+    oneSeconds = min(timeit.repeat(extractOne, number=iterations, repeat=5))
+    allSeconds = min(timeit.repeat(decodeAll, number=max(1, iterations // 10), repeat=5))
+    print(f"LNK property: {oneSeconds / iterations * 1e6:.2f} us/link for one key, {allSeconds / max(1, iterations // 10) * 1e6:.2f} us/link decoding all {len(properties)} ({len(contents):,} bytes)")
+
+# Target paths of links with an IDList and no LinkInfo, all under one folder; with a shared LNKPathCache the common
+# prefix is decoded once for the whole batch instead of once per link
+def benchmarkIdListPaths(count: int = 2000):
+    lnks = [
+        LNK.fromBytes(synthesizeHeader(linkFlags = 0x01 | 0x80) + synthesizeIdList(synthesizeItemIdDatas(f"C:\\Users\\user\\AppData\\Roaming\\Microsoft\\Windows\\Recent\\file{i}.txt")) + b"\x00\x00\x00\x00")
+        for i in range(count)
+        ]
+
+    def resolve(pathCache):
+        return [lnk.getTargetPath(pathCache) for lnk in lnks]
+
+    uncachedSeconds = min(timeit.repeat(lambda: resolve(None), number=1, repeat=5))
+    cachedSeconds = min(timeit.repeat(lambda: resolve(LNKPathCache()), number=1, repeat=5))
+    print(f"LNK IDList path: {uncachedSeconds / count * 1e6:.2f} us/link decoded per link, {cachedSeconds / count * 1e6:.2f} us/link with a shared LNKPathCache")
+
+# Queries against an LNKIndex of many links spread over a few thousand folders, local and network
+def benchmarkIndex(count: int = 200000, queries: int = 1000):
+    local = LNK.fromBytes(synthesizeLnk())
+    network = LNK.fromBytes(synthesizeLnk(isNetwork = True))
+    lnkIndex = LNKIndex()
+    start = timeit.default_timer()
+    for i in range(count):
+        if i % 4 == 0:
+            network.linkInfo.CommonPathSuffix = f"dir{i % 2000}\\file{i}.exe"
+            lnkIndex.add(network, f"link{i}.lnk")
+        else:
+            local.linkInfo.LocalBasePath = f"C:\\Data\\dir{i % 2000}\\file{i}.exe"
+            lnkIndex.add(local, f"link{i}.lnk")
+    addSeconds = timeit.default_timer() - start
+
+    atSeconds = min(timeit.repeat(lambda: [lnkIndex.pointingAt(f"C:\\Data\\dir{i % 2000}\\file{i}.exe") for i in range(1, queries * 4, 4)], number=1, repeat=5))
+    underSeconds = min(timeit.repeat(lambda: [lnkIndex.pointingUnder(f"\\\\SERVER\\share\\dir{i % 2000}") for i in range(queries)], number=1, repeat=5))
+    print(f"LNK index: {addSeconds / count * 1e6:.2f} us/link added, {atSeconds / queries * 1e6:.2f} us/query at a path, {underSeconds / queries * 1e6:.2f} us/query under a folder, over {len(lnkIndex):,} links")
+
+# Loading unchanged files through an LNKCache against parsing them from disk every time
+def benchmarkCache(count: int = 2000):
+    with tempfile.TemporaryDirectory() as directory:
+        lnkFilePaths = []
+        for i in range(count):
+            lnkFilePaths.append(os.path.join(directory, f"link{i}.lnk"))
+            with open(lnkFilePaths[-1], "wb") as lnkFile:
+                lnkFile.write(synthesizeLnk(arguments = f"/c echo {i}", extraData = synthesizeTrackerDataBlock(f"host{i}")))
+
+        # Every section decoded, as scan() does
+        def parseAll():
+            for lnkFilePath in lnkFilePaths:
+                lnk = LNK(lnkFilePath)
+                for name in LNK.SECTIONS:
+                    getattr(lnk, name)
+
+        def loadAll(lnkCache):
+            for lnkFilePath in lnkFilePaths:
+                lnk = lnkCache.load(lnkFilePath)
+                for name in LNK.SECTIONS:
+                    getattr(lnk, name)
+
+        def parseStrings():
+            for lnkFilePath in lnkFilePaths:
+                LNK(lnkFilePath, fields = ("stringData",)).stringData
+
+        def loadStrings(lnkCache):
+            for lnkFilePath in lnkFilePaths:
+                lnkCache.load(lnkFilePath, fields = ("stringData",)).stringData
+
+        parseSeconds = min(timeit.repeat(parseAll, number=1, repeat=3))
+        parseStringsSeconds = min(timeit.repeat(parseStrings, number=1, repeat=3))
+        with LNKCache(os.path.join(directory, "cache.db")) as lnkCache:
+            start = timeit.default_timer()
+            loadAll(lnkCache)
+            coldSeconds = timeit.default_timer() - start
+            warmSeconds = min(timeit.repeat(lambda: loadAll(lnkCache), number=1, repeat=3))
+            warmStringsSeconds = min(timeit.repeat(lambda: loadStrings(lnkCache), number=1, repeat=3))
+    print(f"LNK cache: {parseSeconds / count * 1e6:.2f} us/link parsed from disk, {coldSeconds / count * 1e6:.2f} us/link cold, {warmSeconds / count * 1e6:.2f} us/link hit")
+    print(f"LNK cache (StringData only): {parseStringsSeconds / count * 1e6:.2f} us/link parsed from disk, {warmStringsSeconds / count * 1e6:.2f} us/link hit")
+    assert warmSeconds < parseSeconds, "a cache hit is slower than parsing the file"
+
+# Strict mode over crafted files (truncated, oversized counts, unterminated strings, block floods) mixed with good
+# ones; every file must either parse or raise LNKParseError, at a cost close to that of a good file
+def benchmarkStrict(count: int = 5000):
+    good = synthesizeLnk()
+    linkInfo = synthesizeLinkInfoLocal()
+    crafted = [
+        good[:60], # Truncated header
+        synthesizeHeader(linkFlags = 0x01) + struct.pack("<HH", 0xFFFF, 1) + b"\x00" * 64, # IDListSize past the end, ItemIDSize 1
+        synthesizeHeader(linkFlags = 0x02) + struct.pack("<I", 0xFFFFFFF0) + linkInfo[4:], # LinkInfoSize past the end
+        synthesizeHeader(linkFlags = 0x02) + linkInfo[:-1] + b"X" * 4096 + b"\x00\x00\x00\x00", # Unterminated CommonPathSuffix
+        synthesizeHeader(linkFlags = 0x20 | 0x80) + struct.pack("<H", 0xFFFF) + b"A\x00" * 4096, # CountCharacters past the end
+        synthesizeLnk(extraData = struct.pack("<II", 8, 0xA0000010) * 10000), # ExtraData block flood
+    ]
+    corpus = [crafted[i % len(crafted)] if i % 2 else good for i in range(count)]
+    limits = LNKLimits()
+
+    def parseAll():
+        errors = 0
+        for contents in corpus:
+            try:
+                LNK.fromBytes(contents, limits = limits)
+            except LNKParseError:
+                errors += 1
+        return errors
+
+    errors = parseAll()
+    seconds = min(timeit.repeat(parseAll, number=1, repeat=3))
+    goodSeconds = min(timeit.repeat(lambda: [LNK.fromBytes(good, limits = limits) for i in range(count)], number=1, repeat=3))
+    print(f"LNK strict: {seconds / count * 1e6:.2f} us/file over a half-crafted corpus ({errors:,} rejected), {goodSeconds / count * 1e6:.2f} us/file over good files")
+    assert errors == count // 2, "a crafted file was accepted"
+
+# Parse-and-discard many links from several threads in one process; every result must match a single-threaded
+# parse, and retained memory must stay flat (shared per-class state would grow with every file)
+def benchmarkConcurrency(count: int = 100000, threads: int = 8, batches: int = 10):
+    corpus = [synthesizeLnk(isUnicode = i % 2 == 0, isNetwork = i % 3 == 0, arguments = f"/c echo {i}") for i in range(threads)]
+    expected = [(len(lnk.linkTargetIdList.itemIdDatas), lnk.getTargetPath(), lnk.totalSize) for lnk in map(LNK.fromBytes, corpus)]
+
+    def parseBatch(index: int):
+        mismatches = 0
+        for i in range(count // batches // threads):
+            lnk = LNK.fromBytes(corpus[index])
+            if (len(lnk.linkTargetIdList.itemIdDatas), lnk.getTargetPath(), lnk.totalSize) != expected[index]:
+                mismatches += 1
+        return mismatches
+
+    tracemalloc.start()
+    retained = []
+    mismatches = 0
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        start = timeit.default_timer()
+        for batch in range(batches):
+            mismatches += sum(executor.map(parseBatch, range(threads)))
+            retained.append(tracemalloc.get_traced_memory()[0])
+        seconds = timeit.default_timer() - start
+    tracemalloc.stop()
+
+    parsed = (count // batches // threads) * threads * batches
+    growth = retained[-1] - retained[0]
+    print(f"LNK concurrency: {parsed:,} links on {threads} threads in {seconds:.2f} s, {mismatches} mismatches, {growth:,} bytes retained growth after the first batch")
+    assert mismatches == 0, "concurrent parses disagree with a single-threaded parse"
+    assert growth < 64 * 1024, "memory grows with the number of parsed links"
+
+# parse -> pack -> parse of an on-disk corpus across a process pool; synthesized links must come back byte for byte,
+# and a nonzero Reserved1 must show up in the header's histogram at its offset, 0x42
+def benchmarkVerify(count: int = 5000, workers: int = None):
+    corpus = [synthesizeLnk(isUnicode = i % 2 == 0, isNetwork = i % 3 == 0, arguments = f"/c echo {i}", extraData = synthesizeTrackerDataBlock()) for i in range(16)]
+    reserved = bytearray(corpus[0])
+    reserved[0x42] = 0x01
+    corpus.append(bytes(reserved))
+
+    with tempfile.TemporaryDirectory() as corpusDir:
+        for i in range(count):
+            with open(os.path.join(corpusDir, f"{i}.lnk"), "wb") as lnkFile:
+                lnkFile.write(corpus[i % len(corpus)])
+
+        start = timeit.default_timer()
+        report = LNKVerifyReport.fromResults(LNK.verify(corpusDir, workers = workers))
+        seconds = timeit.default_timer() - start
+
+    print(f"LNK verify: {count:,} files in {seconds:.2f} s ({count / seconds:,.0f} files/s), {report.identical:,} identical")
+    print(report.summary())
+    assert report.identical == count - count // len(corpus), "a synthesized link did not round-trip"
+    assert report.offsetHistogram["shellLinkHeader"] == {0x42: count // len(corpus)}, "Reserved1 went unreported"
+
+# Parse, decode and pack with metrics disabled and enabled; disabled is the cost every caller pays
+def benchmarkMetrics(count: int = 20000):
+    corpus = [synthesizeLnk(isUnicode = i % 2 == 0, isNetwork = i % 3 == 0, arguments = f"/c echo {i}", extraData = synthesizeTrackerDataBlock()) for i in range(16)]
+
+    def parseAll():
+        for i in range(count):
+            lnk = LNK.fromBytes(corpus[i % len(corpus)])
+            for name in LNK.SECTIONS:
+                getattr(lnk, name)
+            lnk.shellLinkHeader.IconIndex = 1
+            lnk.pack()
+
+    disabledSeconds = min(timeit.repeat(parseAll, number=1, repeat=3))
+    with LNKMetrics() as metrics:
+        enabledSeconds = min(timeit.repeat(parseAll, number=1, repeat=3))
+    print(f"LNK metrics: {disabledSeconds / count * 1e6:.2f} us/file disabled, {enabledSeconds / count * 1e6:.2f} us/file enabled")
+    print(metrics.summary())
+    assert metrics.get("parse", "stringData").count == 3 * count, "a section decode went unrecorded"
+
+# Build a timeline of header-only parses and stream it back in time order; FILETIMEs must come out exactly as stored
+def benchmarkTimeline(count: int = 200000, runSize: int = 1 << 16):
+    corpus = []
+    for i in range(1024):
+        lnk = LNK.fromBytes(synthesizeLnk(arguments = f"/c echo {i}"))
+        shellLinkHeader = lnk.shellLinkHeader
+        shellLinkHeader.CreationFiletime = 133000000000000000 + i * 7919 * 10000019
+        shellLinkHeader.AccessFiletime = shellLinkHeader.CreationFiletime + 1 # 100 ns apart
+        shellLinkHeader.WriteFiletime = 133000000000000000 - i * 104729
+        corpus.append(lnk.pack())
+
+    start = timeit.default_timer()
+    lnkTimeline = LNKTimeline(runSize)
+    for i in range(count):
+        lnkTimeline.add(LNK.fromBytes(corpus[i % len(corpus)], fields = ()), i)
+    buildSeconds = timeit.default_timer() - start
+
+    start = timeit.default_timer()
+    previous = None
+    for event in lnkTimeline.events():
+        assert previous == None or previous <= event, "events out of order"
+        previous = event
+    mergeSeconds = timeit.default_timer() - start
+
+    expected = sorted(LNK.fromBytes(contents).shellLinkHeader.AccessFiletime for contents in corpus)
+    accessed = [filetime for filetime, kind, entry in lnkTimeline.events() if kind == 1 and entry < len(corpus)]
+    print(f"LNK timeline: {len(lnkTimeline):,} events from {count:,} links, built in {buildSeconds:.2f} s, merged from {len(lnkTimeline.runs)} runs in {mergeSeconds:.2f} s ({len(lnkTimeline) / mergeSeconds:,.0f} events/s)")
+    assert accessed == expected, "FILETIMEs were not kept exactly"
+
+# BENCHMARKS END
+# ----------------------------------------------------------------------------------
+
+
+
+# ----------------------------------------------------------------------------------
+# CORPUS BENCHMARKS
+
+def decodeAll(lnk: LNK):
+    for name in LNK.SECTIONS:
+        getattr(lnk, name)
+    return lnk
+
+# Operation -> (prepare(corpus) returning the inputs, run(input)); only run is timed
+CORPUS_OPERATIONS = {
+    "parse": (lambda corpus: corpus, lambda contents: decodeAll(LNK.fromBytes(contents))),
+    "pack": (lambda corpus: [decodeAll(LNK.fromBytes(contents)) for contents in corpus], lambda lnk: (lnk._packCache.clear(), lnk.pack())),
+    "roundtrip": (lambda corpus: corpus, lambda contents: decodeAll(LNK.fromBytes(decodeAll(LNK.fromBytes(contents)).pack()))),
+}
+
+# One result per (shape, operation): throughput from the best of repeat timed passes, then one traced pass for
+# allocations (blocks left allocated by the outputs, and bytes at peak, from tracemalloc)
+def benchmarkCorpora(count: int = 2000, repeat: int = 3, shapes = None, operations = None):
+    results = []
+    for shape in (shapes or CORPUS_SHAPES):
+        corpus = [CORPUS_SHAPES[shape](i) for i in range(count)]
+        corpusBytes = sum(map(len, corpus))
+
+        for operation in (operations or CORPUS_OPERATIONS):
+            prepare, run = CORPUS_OPERATIONS[operation]
+            inputs = prepare(corpus)
+            seconds = min(timeit.repeat(lambda: [run(item) for item in inputs], number=1, repeat=repeat))
+
+            # Outputs are kept until the second snapshot, so the block count is what the operation leaves allocated
+            inputs = prepare(corpus)
+            tracemalloc.start()
+            before = tracemalloc.take_snapshot()
+            outputs = [run(item) for item in inputs]
+            after = tracemalloc.take_snapshot()
+            peakTracedBytes = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            allocatedBlocks = sum(max(0, statistic.count_diff) for statistic in after.compare_to(before, "lineno"))
+            del outputs
+
+            results.append({
+                "shape": shape,
+                "operation": operation,
+                "files": count,
+                "bytes": corpusBytes,
+                "seconds": seconds,
+                "filesPerSecond": count / seconds,
+                "bytesPerSecond": corpusBytes / seconds,
+                "allocatedBlocksPerFile": allocatedBlocks / count,
+                "peakTracedBytes": peakTracedBytes,
+            })
+            print(f"{shape:>16} {operation:>9}: {count / seconds:>10,.0f} files/s {corpusBytes / seconds / 1e6:>8.1f} MB/s {allocatedBlocks / count:>8.1f} blocks/file")
+    return results
+
+def saveResults(results: list, resultsPath: str):
+    with open(resultsPath, "w", encoding="utf-8") as resultsFile:
+        json.dump({"python": platform.python_version(), "platform": platform.platform(), "results": results}, resultsFile, indent=1)
+
+# Throughput and peak traced memory of each (shape, operation) against a baseline results file; throughput below 1.0 is a regression
+def compareResults(baselinePath: str, resultsPath: str):
+    with open(baselinePath, encoding="utf-8") as baselineFile:
+        baseline = {(result["shape"], result["operation"]): result for result in json.load(baselineFile)["results"]}
+    with open(resultsPath, encoding="utf-8") as resultsFile:
+        results = json.load(resultsFile)["results"]
+
+    ratios = {}
+    for result in results:
+        key = (result["shape"], result["operation"])
+        if key in baseline:
+            ratios[key] = result["filesPerSecond"] / baseline[key]["filesPerSecond"]
+            peakRatio = result["peakTracedBytes"] / baseline[key]["peakTracedBytes"]
+            print(f"{key[0]:>16} {key[1]:>9}: {ratios[key]:.2f}x throughput, {peakRatio:.2f}x peak traced memory")
+    return ratios
+
+# CORPUS BENCHMARKS END
+# ----------------------------------------------------------------------------------
+
+
+
+########### MAIN
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="LNK parse/pack benchmarks")
+    parser.add_argument("--corpora", metavar="RESULTS_JSON", help="run only the corpus benchmarks and write their results here")
+    parser.add_argument("--count", type=int, default=2000, help="files per corpus")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE_JSON", "RESULTS_JSON"), help="compare two results files and exit")
+    arguments = parser.parse_args()
+
+    if arguments.compare:
+        compareResults(*arguments.compare)
+        sys.exit(0)
+
+    results = benchmarkCorpora(arguments.count)
+    if arguments.corpora:
+        saveResults(results, arguments.corpora)
+        sys.exit(0)
+
+    benchmarkHeader()
+    benchmarkMemory()
+    benchmarkPack()
+    benchmarkEdit()
+    benchmarkGenerate()
+    benchmarkProperties()
+    benchmarkIdListPaths()
+    benchmarkIndex()
+    benchmarkCache()
+    benchmarkStrict()
+    benchmarkConcurrency()
+    benchmarkVerify()
+    benchmarkMetrics()
+    benchmarkTimeline()
@@ -1,5 +1,29 @@
 import struct
 import math
+import array
+import asyncio
+import bisect
+import contextlib
+import copy
+import csv
+import datetime
+import hashlib
+import heapq
+import io
+import json
+import marshal
+import mmap
+import operator
+import os
+import re
+import signal
+import sqlite3
+import sys
+import threading
+import time
+import types
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 # ----------------------------------------------------------------------------------
 # HELPER METHODS
@@ -16,41 +40,57 @@ def getUshort(contents: bytes, offset: int = 0):
 def getShort(contents: bytes, offset: int = 0):
     return (struct.unpack_from("<h", contents, offset))[0]
 
+# Terminator, searched for by the regex engine in C; it works on any buffer (bytes, memoryview, mmap)
+_NUL_PATTERN = re.compile(b"\x00")
+
+# Bytes of a memoryview copied out per terminator search, first and at most
+_UTF16_SEARCH_WINDOW = 512
+_UTF16_SEARCH_WINDOW_MAX = 64 * 1024
+
+# Offset of the first UTF-16 NUL in contents[offset:end] that is 2-byte aligned from offset, or -1; bytes.find runs
+# in C, and only its rare misaligned hits (a 0x00 high byte followed by a 0x00 low byte) are stepped over here
+def _findUtf16Terminator(contents, offset: int, end: int):
+    if isinstance(contents, memoryview):
+        # No find(); search copies of windows that grow from a string's usual size, never the rest of the buffer at
+        # once. Windows start aligned and are of even size, so an aligned terminator never straddles two of them
+        windowStart = offset
+        windowSize = _UTF16_SEARCH_WINDOW
+        while windowStart < end:
+            windowEnd = min(end, windowStart + windowSize)
+            position = _findUtf16Terminator(contents[windowStart:windowEnd].tobytes(), 0, windowEnd - windowStart)
+            if position >= 0:
+                return windowStart + position
+            windowStart = windowEnd
+            windowSize = min(windowSize * 2, _UTF16_SEARCH_WINDOW_MAX)
+        return -1
+
+    position = contents.find(b"\x00\x00", offset, end)
+    while position >= 0 and (position - offset) % 2 != 0:
+        position = contents.find(b"\x00\x00", position + 1, end)
+    return position
+
+# NULL-terminated string at offset, or the first maxCount bytes if there is no NULL before them
 def getStringUtf8(contents: bytes, offset: int = 0, maxCount = -1):
-    length = 0
-    while True:
-        if contents[offset + length] == 0:
-            break
-        length += 1
-
-        if maxCount == length:
-            break
+    end = len(contents) if maxCount < 0 else min(len(contents), offset + maxCount)
+    terminator = _NUL_PATTERN.search(contents, offset, end)
+    if terminator != None:
+        end = terminator.start()
+    elif maxCount < 0 or offset + maxCount > len(contents):
+        raise IndexError(f"Unterminated string at offset {offset}")
 
-    return contents[offset:offset + length].decode("utf-8")
+    return str(contents[offset:end], "utf-8")
 
+# NULL-terminated (2 zero bytes, 2-byte aligned) string at offset, or the first maxCount characters if there is no NULL before them
 def getStringUtf16Le(contents: bytes, offset: int = 0, maxCount = -1):
-    length = 0
-    while True:
-        if contents[offset + length] == 0:
-            break
-        length += 2
+    end = len(contents) if maxCount < 0 else min(len(contents), offset + (maxCount * 2))
+    terminator = _findUtf16Terminator(contents, offset, end)
+    end = terminator if terminator >= 0 else end - ((end - offset) % 2) # Whole code units only
+    if end + 2 > len(contents) and (maxCount < 0 or end < offset + (maxCount * 2)):
+        raise IndexError(f"Unterminated string at offset {offset}")
 
-        if maxCount == int(length / 2):
-            break
-
-    return contents[offset:offset + length].decode("utf-16le")
-
-def getBit(contents: bytes, bitIndex = 0):
-    byteIndex = math.floor(bitIndex / 8)
-    byteExtracted = contents[byteIndex]
-
-    bitValue = (byteExtracted << (bitIndex % 8)) & 0xFF
-    bitValue = (bitValue >> 7) & 0xFF
-    bitValue = (bitValue << 7) & 0xFF
-    
-    return bitValue != 0
+    return str(contents[offset:end], "utf-16le")
 
-def systemTimeToUtcSeconds(systemTime: bytes):
+def systemTimeToUtcSeconds(systemTime: bytes, offset: int = 0):
     """
     The FILETIME structure is a 64-bit value that represents the number of 100-nanosecond intervals that have elapsed since January 1, 1601, Coordinated Universal Time (UTC).
 
@@ -61,10 +101,43 @@ def systemTimeToUtcSeconds(systemTime: bytes):
       *PFILETIME,
       *LPFILETIME;
     """
-    intervals = (struct.unpack_from("<Q", systemTime, 0))[0]
-    intervalsSeconds = (intervals * 100) / (math.pow(10, 9))
-    intervalsSecondsCorrected = intervalsSeconds - ((1970 - 1601) * 31556926)
-    return intervalsSecondsCorrected
+    intervals = (struct.unpack_from("<Q", systemTime, offset))[0]
+    return filetimeToUtcSeconds(intervals)
+
+# 100-nanosecond intervals from 1601-01-01 to 1970-01-01 UTC (369 Gregorian years, 89 of them leap years)
+_FILETIME_UNIX_EPOCH = 116444736000000000
+_FILETIME_INTERVALS_PER_SECOND = 10000000
+_FILETIME_EPOCH_DATETIME = datetime.datetime(1601, 1, 1, tzinfo = datetime.timezone.utc)
+
+# UTC seconds as a float; exact to about a microsecond. Keep the FILETIME itself for anything sorted or compared
+def filetimeToUtcSeconds(intervals: int):
+    return (intervals - _FILETIME_UNIX_EPOCH) / _FILETIME_INTERVALS_PER_SECOND
+
+# Aware UTC datetime; datetime stops at microseconds, so the last digit of the FILETIME is truncated (OverflowError past the year 9999)
+def filetimeToDatetime(intervals: int):
+    return _FILETIME_EPOCH_DATETIME + datetime.timedelta(microseconds = intervals // 10)
+
+# ISO 8601 UTC with all seven fractional digits, e.g. 2024-05-01T12:00:00.1234567Z; exact
+# Past the year 9999, which datetime cannot represent (and a crafted file can store), an empty string
+def filetimeToIso(intervals: int):
+    seconds, fraction = divmod(intervals, _FILETIME_INTERVALS_PER_SECOND)
+    try:
+        wholeSeconds = _FILETIME_EPOCH_DATETIME + datetime.timedelta(seconds = seconds)
+    except OverflowError:
+        return ""
+    return f"{wholeSeconds.strftime('%Y-%m-%dT%H:%M:%S')}.{fraction:07d}Z"
+
+# FILETIME of a datetime, exactly; naive datetimes are taken as UTC
+def datetimeToFiletime(value: datetime.datetime):
+    if value.tzinfo == None:
+        value = value.replace(tzinfo = datetime.timezone.utc)
+    delta = value - _FILETIME_EPOCH_DATETIME
+    return (delta.days * 86400 + delta.seconds) * _FILETIME_INTERVALS_PER_SECOND + delta.microseconds * 10
+
+# "Category: message" of an exception, as error strings report it; struct.error, whose class is named just "error",
+# is reported as StructError
+def _describeError(e: Exception):
+    return f"{'StructError' if isinstance(e, struct.error) else type(e).__name__}: {e}"
 
 def packUint(number: int = 0):
     return struct.pack("<I", number)
@@ -84,25 +157,11 @@ def packStringUtf8(string: str):
 def packStringUtf16Le(string: str):
     return string.encode("utf-16le")
 
-def packBit(contents: bytes, bitIndex = 0, value: bool = False):
-    byteIndex = math.floor(bitIndex / 8)
-    byteExtracted = contents[byteIndex]
-
-    byteNew = 0
-    bitIndexInByte = bitIndex % 8
-    if value:
-        mask = ((0x01 << 7) >> bitIndexInByte) & 0xFF
-        byteNew = byteExtracted | mask
-    else:
-        mask1 = (0xFF >> (bitIndexInByte + 1)) & 0xFF
-        mask2 = (0xFF << (8 - bitIndexInByte)) & 0xFF
-        mask = mask1 | mask2
-        byteNew = byteExtracted & mask
-
-    contentsPre = contents[0:byteIndex]
-    contentsPost = contents[byteIndex + 1:]
-
-    return contentsPre + int.to_bytes(byteNew) + contentsPost
+# Copy data into a preallocated buffer at offset; returns the offset just past it
+def packBytesInto(contents: bytearray, offset: int, data: bytes):
+    end = offset + len(data)
+    contents[offset:end] = data
+    return end
 
 def utcSecondsToSystemTime(utcSeconds: int):
     """
@@ -115,10 +174,13 @@ def utcSecondsToSystemTime(utcSeconds: int):
       *PFILETIME,
       *LPFILETIME;
     """
-    intervalsSeconds = utcSeconds +  ((1970 - 1601) * 31556926)
-    intervals = int((intervalsSeconds * (math.pow(10, 9))) / 100)
-    intervalsPacked = struct.pack("<Q", intervals)
+    intervalsPacked = struct.pack("<Q", utcSecondsToFiletime(utcSeconds))
     return intervalsPacked
+
+# Whole seconds convert exactly; a float's fraction is rounded to the nearest interval without scaling the whole value
+def utcSecondsToFiletime(utcSeconds: int):
+    wholeSeconds = math.floor(utcSeconds)
+    return _FILETIME_UNIX_EPOCH + int(wholeSeconds) * _FILETIME_INTERVALS_PER_SECOND + round((utcSeconds - wholeSeconds) * _FILETIME_INTERVALS_PER_SECOND)
     
 
 # HELPER METHODS END
@@ -129,222 +191,202 @@ def utcSecondsToSystemTime(utcSeconds: int):
 # ----------------------------------------------------------------------------------
 # SUB-STRUCTURES CLASSES
 
+# HeaderSize, LinkCLSID, LinkFlags, FileAttributes, CreationTime, AccessTime, WriteTime, FileSize, IconIndex, ShowCommand, HotKey low, HotKey high, Reserved1-3
+_SHELL_LINK_HEADER_STRUCT = struct.Struct("<I16sIIQQQIiIBB10x")
+
+# Serialization; "<H" and "<" + "I" * count, indexed by count, for the runs of uint32 fields in LinkInfo
+_USHORT_STRUCT = struct.Struct("<H")
+_UINT_STRUCTS = tuple(struct.Struct("<" + "I" * count) for count in range(10))
+
+# LinkFlags bits (attribute, mask); each is a bool property over _ShellLinkHeader.LinkFlags. Unused1 (bit 11) and Unused2 (bit 16) stay in the bitmask but are not named
+_LINK_FLAGS = (
+    ("HasLinkTargetIDList", 1 << 0), # The shell link is saved with an item ID list (IDList). If this bit is set, a LinkTargetIDList structure (section 2.2) MUST follow the ShellLinkHeader. If this bit is not set, this structure MUST NOT be present.
+    ("HasLinkInfo", 1 << 1), # The shell link is saved with link information. If this bit is set, a LinkInfo structure (section 2.3) MUST be present. If this bit is not set, this structure MUST NOT be present.
+    ("HasName", 1 << 2), # The shell link is saved with a name string. If this bit is set, a NAME_STRING StringData structure (section 2.4) MUST be present. If this bit is not set, this structure MUST NOT be present.
+    ("HasRelativePath", 1 << 3), # The shell link is saved with a relative path string. If this bit is set, a RELATIVE_PATH StringData structure (section 2.4) MUST be present. If this bit is not set, this structure MUST NOT be present.
+    ("HasWorkingDir", 1 << 4), # The shell link is saved with a working directory string. If this bit is set, a WORKING_DIR StringData structure (section 2.4) MUST be present. If this bit is not set, this structure MUST NOT be present.
+    ("HasArguments", 1 << 5), # The shell link is saved with command line arguments. If this bit is set, a COMMAND_LINE_ARGUMENTS StringData structure (section 2.4) MUST be present. If this bit is not set, this structure MUST NOT be present.
+    ("HasIconLocation", 1 << 6), # The shell link is saved with an icon location string. If this bit is set, an ICON_LOCATION StringData structure (section 2.4) MUST be present. If this bit is not set, this structure MUST NOT be present.
+    ("IsUnicode", 1 << 7), # The shell link contains Unicode encoded strings. This bit SHOULD be set. If this bit is set, the StringData section contains Unicode-encoded strings; otherwise, it contains strings that are encoded using the system default code page.
+    ("ForceNoLinkInfo", 1 << 8), # The LinkInfo structure (section 2.3) is ignored.
+    ("HasExpString", 1 << 9), # The shell link is saved with an EnvironmentVariableDataBlock (section 2.5.4).
+    ("RunInSeparateProcess", 1 << 10), # The target is run in a separate virtual machine when launching a link target that is a 16-bit application.
+    ("HasDarwinID", 1 << 12), # The shell link is saved with a DarwinDataBlock (section 2.5.3).
+    ("RunAsUser", 1 << 13), # The application is run as a different user when the target of the shell link is activated.
+    ("HasExpIcon", 1 << 14), # The shell link is saved with an IconEnvironmentDataBlock (section 2.5.5).
+    ("NoPidlAlias", 1 << 15), # The file system location is represented in the shell namespace when the path to an item is parsed into an IDList.
+    ("RunWithShimLayer", 1 << 17), # The shell link is saved with a ShimDataBlock (section 2.5.8).
+    ("ForceNoLinkTrack", 1 << 18), # The TrackerDataBlock (section 2.5.10) is ignored.
+    ("EnableTargetMetadata", 1 << 19), # The shell link attempts to collect target properties and store them in the PropertyStoreDataBlock (section 2.5.7) when the link target is set.
+    ("DisableLinkPathTracking", 1 << 20), # The EnvironmentVariableDataBlock is ignored.
+    ("DisableKnownFolderTracking", 1 << 21), # The SpecialFolderDataBlock (section 2.5.9) and the KnownFolderDataBlock (section 2.5.6) are ignored when loading the shell link. If this bit is set, these extra data blocks SHOULD NOT be saved when saving the shell link.
+    ("DisableKnownFolderAlias", 1 << 22), # If the link has a KnownFolderDataBlock (section 2.5.6), the unaliased form of the known folder IDList SHOULD be used when translating the target IDList at the time that the link is loaded.
+    ("AllowLinkToLink", 1 << 23), # Creating a link that references another link is enabled. Otherwise, specifying a link as the target IDList SHOULD NOT be allowed.
+    ("UnaliasOnSave", 1 << 24), # When saving a link for which the target IDList is under a known folder, either the unaliased form of that known folder or the target IDList SHOULD be used.
+    ("PreferEnvironmentPath", 1 << 25), # The target IDList SHOULD NOT be stored; instead, the path specified in the EnvironmentVariableDataBlock (section 2.5.4) SHOULD be used to refer to the target.
+    ("KeepLocalIDListForUNCTarget", 1 << 26), # When the target is a UNC name that refers to a location on a local machine, the local path IDList in the PropertyStoreDataBlock (section 2.5.7) SHOULD be stored, so it can be used when the link is loaded on the local machine.
+)
+
+# FileAttributes bits (attribute, mask); each is a bool property over _ShellLinkHeader.FileAttributes. Reserved1 (bit 3) and Reserved2 (bit 6) stay in the bitmask but are not named
+_FILE_ATTRIBUTES = (
+    ("FILE_ATTRIBUTE_READONLY", 1 << 0), # The file or directory is read-only. For a file, if this bit is set, applications can read the file but cannot write to it or delete it. For a directory, if this bit is set, applications cannot delete the directory.
+    ("FILE_ATTRIBUTE_HIDDEN", 1 << 1), # The file or directory is hidden. If this bit is set, the file or folder is not included in an ordinary directory listing.
+    ("FILE_ATTRIBUTE_SYSTEM", 1 << 2), # The file or directory is part of the operating system or is used exclusively by the operating system.
+    ("FILE_ATTRIBUTE_DIRECTORY", 1 << 4), # The link target is a directory instead of a file.
+    ("FILE_ATTRIBUTE_ARCHIVE", 1 << 5), # The file or directory is an archive file. Applications use this flag to mark files for backup or removal.
+    ("FILE_ATTRIBUTE_NORMAL", 1 << 7), # The file or directory has no other flags set. If this bit is 1, all other bits in this structure MUST be clear.
+    ("FILE_ATTRIBUTE_TEMPORARY", 1 << 8), # The file is being used for temporary storage.
+    ("FILE_ATTRIBUTE_SPARSE_FILE", 1 << 9), # The file is a sparse file.
+    ("FILE_ATTRIBUTE_REPARSE_POINT", 1 << 10), # The file or directory has an associated reparse point.
+    ("FILE_ATTRIBUTE_COMPRESSED", 1 << 11), # The file or directory is compressed. For a file, this means that all data in the file is compressed. For a directory, this means that compression is the default for newly created files and subdirectories.
+    ("FILE_ATTRIBUTE_OFFLINE", 1 << 12), # The data of the file is not immediately available.
+    ("FILE_ATTRIBUTE_NOT_CONTENT_INDEXED", 1 << 13), # The contents of the file need to be indexed.
+    ("FILE_ATTRIBUTE_ENCRYPTED", 1 << 14), # The file or directory is encrypted. For a file, this means that all data in the file is encrypted. For a directory, this means that encryption is the default for newly created files and subdirectories.
+)
+
 class _ShellLinkHeader:
-    # Data
-    HeaderSize = 0x4C # 4 bytes; 0x4C
-    LinkCLSID = b"\x01\x14\x02\x00\x00\x00\x00\x00\xC0\x00\x00\x00\x00\x00\x00\x46" # 16 bytes; 00021401-0000-0000-C000-000000000046 OR 00021401-0000-0000-C000-00000000000F
-    HasLinkTargetIDList = False # 1 bit; The shell link is saved with an item ID list (IDList). If this bit is set, a LinkTargetIDList structure (section 2.2) MUST follow the ShellLinkHeader. If this bit is not set, this structure MUST NOT be present.
-    HasLinkInfo = False # The shell link is saved with link information. If this bit is set, a LinkInfo structure (section 2.3) MUST be present. If this bit is not set, this structure MUST NOT be present.
-    HasName = False # 1 bit; The shell link is saved with a name string. If this bit is set, a NAME_STRING StringData structure (section 2.4) MUST be present. If this bit is not set, this structure MUST NOT be present.
-    HasRelativePath = False # 1 bit; The shell link is saved with a relative path string. If this bit is set, a RELATIVE_PATH StringData structure (section 2.4) MUST be present. If this bit is not set, this structure MUST NOT be present.
-    HasWorkingDir = False # 1 bit; The shell link is saved with a working directory string. If this bit is set, a WORKING_DIR StringData structure (section 2.4) MUST be present. If this bit is not set, this structure MUST NOT be present.
-    HasArguments = False # 1 bit; The shell link is saved with command line arguments. If this bit is set, a COMMAND_LINE_ARGUMENTS StringData structure (section 2.4) MUST be present. If this bit is not set, this structure MUST NOT be present.
-    HasIconLocation = False # 1 bit; The shell link is saved with an icon location string. If this bit is set, an ICON_LOCATION StringData structure (section 2.4) MUST be present. If this bit is not set, this structure MUST NOT be present.
-    IsUnicode = False # 1 bit; The shell link contains Unicode encoded strings. This bit SHOULD be set. If this bit is set, the StringData section contains Unicode-encoded strings; otherwise, it contains strings that are encoded using the system default code page.
-    ForceNoLinkInfo = False # 1 bit; The LinkInfo structure (section 2.3) is ignored.
-    HasExpString = False # 1 bit; The shell link is saved with an EnvironmentVariableDataBlock (section 2.5.4).
-    RunInSeparateProcess = False # 1 bit; The target is run in a separate virtual machine when launching a link target that is a 16-bit application.
-    HasDarwinID = False # 1 bit; The shell link is saved with a DarwinDataBlock (section 2.5.3).
-    RunAsUser = False # 1 bit; The application is run as a different user when the target of the shell link is activated.
-    HasExpIcon = False # 1 bit; The shell link is saved with an IconEnvironmentDataBlock (section 2.5.5).
-    NoPidlAlias = False # 1 bit; The file system location is represented in the shell namespace when the path to an item is parsed into an IDList.
-    RunWithShimLayer = False # 1 bit; The shell link is saved with a ShimDataBlock (section 2.5.8).
-    ForceNoLinkTrack = False # 1 bit; The TrackerDataBlock (section 2.5.10) is ignored.
-    EnableTargetMetadata = False # 1 bit; The shell link attempts to collect target properties and store them in the PropertyStoreDataBlock (section 2.5.7) when the link target is set.
-    DisableLinkPathTracking = False # 1 bit; The EnvironmentVariableDataBlock is ignored.
-    DisableKnownFolderTracking = False # 1 bit; The SpecialFolderDataBlock (section 2.5.9) and the KnownFolderDataBlock (section 2.5.6) are ignored when loading the shell link. If this bit is set, these extra data blocks SHOULD NOT be saved when saving the shell link.
-    DisableKnownFolderAlias = False # 1 bit; If the link has a KnownFolderDataBlock (section 2.5.6), the unaliased form of the known folder IDList SHOULD be used when translating the target IDList at the time that the link is loaded.
-    AllowLinkToLink = False # 1 bit; Creating a link that references another link is enabled. Otherwise, specifying a link as the target IDList SHOULD NOT be allowed.
-    UnaliasOnSave = False # 1 bit; When saving a link for which the target IDList is under a known folder, either the unaliased form of that known folder or the target IDList SHOULD be used.
-    PreferEnvironmentPath = False # 1 bit; The target IDList SHOULD NOT be stored; instead, the path specified in the EnvironmentVariableDataBlock (section 2.5.4) SHOULD be used to refer to the target.
-    KeepLocalIDListForUNCTarget = False # 1 bit; When the target is a UNC name that refers to a location on a local machine, the local path IDList in the PropertyStoreDataBlock (section 2.5.7) SHOULD be stored, so it can be used when the link is loaded on the local machine.
-    FILE_ATTRIBUTE_READONLY = False # 1 bit; The file or directory is read-only. For a file, if this bit is set, applications can read the file but cannot write to it or delete it. For a directory, if this bit is set, applications cannot delete the directory.
-    FILE_ATTRIBUTE_HIDDEN = False # 1 bit; The file or directory is hidden. If this bit is set, the file or folder is not included in an ordinary directory listing.
-    FILE_ATTRIBUTE_SYSTEM = False # 1 bit; The file or directory is part of the operating system or is used exclusively by the operating system.
-    FILE_ATTRIBUTE_DIRECTORY = False # 1 bit; The link target is a directory instead of a file.
-    FILE_ATTRIBUTE_ARCHIVE = False # 1 bit; The file or directory is an archive file. Applications use this flag to mark files for backup or removal.
-    FILE_ATTRIBUTE_NORMAL = False # 1 bit; The file or directory has no other flags set. If this bit is 1, all other bits in this structure MUST be clear.
-    FILE_ATTRIBUTE_TEMPORARY = False # 1 bit; The file is being used for temporary storage.
-    FILE_ATTRIBUTE_SPARSE_FILE = False # 1 bit; The file is a sparse file.
-    FILE_ATTRIBUTE_REPARSE_POINT = False # 1 bit; The file or directory has an associated reparse point.
-    FILE_ATTRIBUTE_COMPRESSED = False # 1 bit; The file or directory is compressed. For a file, this means that all data in the file is compressed. For a directory, this means that compression is the default for newly created files and subdirectories.
-    FILE_ATTRIBUTE_OFFLINE = False # 1 bit; The data of the file is not immediately available.
-    FILE_ATTRIBUTE_NOT_CONTENT_INDEXED = False # 1 bit; The contents of the file need to be indexed.
-    FILE_ATTRIBUTE_ENCRYPTED = False # 1 bit; The file or directory is encrypted. For a file, this means that all data in the file is encrypted. For a directory, this means that encryption is the default for newly created files and subdirectories.
-    CreationTime = 0 # UTC seconds
-    AccessTime = 0 # UTC seconds
-    WriteTime = 0 # UTC seconds
-    FileSize = 0 # Size, in bytes, of the link target. If the link target file is larger than 0xFFFFFFFF, this value specifies the least significant 32 bits of the link target file size.
-    IconIndex = 0 # Index of an icon within a given icon location
-    ShowCommand = 1 # 1=Normal, 3=Maximized, 7=Minimized
-    HotkeyFlags = [0, 0] # low byte, high byte; https://learn.microsoft.com/en-us/openspecs/windows_protocols/ms-shllink/8cd21240-1b5d-43e6-adc4-38cf14e30cea
-
-    def __init__(self, contents: bytes):
-        # HeaderSize; 4 bytes
-        self.HeaderSize = getUint(contents, 0)
-
-        # LinkCLSID; 16 bytes
-        self.LinkCLSID = contents[4:20]
-
-        # LinkFlags; 4 bytes
-        linkFlags = contents[20:24]
-        self.HasLinkTargetIDList = getBit(linkFlags, 0)
-        self.HasLinkInfo = getBit(linkFlags, 1)
-        self.HasName = getBit(linkFlags, 2)
-        self.HasRelativePath = getBit(linkFlags, 3)
-        self.HasWorkingDir = getBit(linkFlags, 4)
-        self.HasArguments = getBit(linkFlags, 5)
-        self.HasIconLocation = getBit(linkFlags, 6)
-        self.IsUnicode = getBit(linkFlags, 7)
-        self.ForceNoLinkInfo = getBit(linkFlags, 8)
-        self.HasExpString = getBit(linkFlags, 9)
-        self.RunInSeparateProcess = getBit(linkFlags, 10)
-        self.HasDarwinID = getBit(linkFlags, 12)
-        self.RunAsUser = getBit(linkFlags, 13)
-        self.HasExpIcon = getBit(linkFlags, 14)
-        self.NoPidlAlias = getBit(linkFlags, 15)
-        self.RunWithShimLayer = getBit(linkFlags, 17)
-        self.ForceNoLinkTrack = getBit(linkFlags, 18)
-        self.EnableTargetMetadata = getBit(linkFlags, 19)
-        self.DisableLinkPathTracking = getBit(linkFlags, 20)
-        self.DisableKnownFolderTracking = getBit(linkFlags, 21)
-        self.DisableKnownFolderAlias = getBit(linkFlags,22)
-        self.AllowLinkToLink = getBit(linkFlags, 23)
-        self.UnaliasOnSave = getBit(linkFlags, 24)
-        self.PreferEnvironmentPath = getBit(linkFlags, 25)
-        self.KeepLocalIDListForUNCTarget = getBit(linkFlags, 26)
-
-        # File attributes; 4 bytes
-        fileAttributes = contents[24:28]
-        self.FILE_ATTRIBUTE_READONLY = getBit(fileAttributes, 0)
-        self.FILE_ATTRIBUTE_HIDDEN = getBit(fileAttributes, 1)
-        self.FILE_ATTRIBUTE_SYSTEM = getBit(fileAttributes, 2)
-        self.FILE_ATTRIBUTE_DIRECTORY = getBit(fileAttributes, 4)
-        self.FILE_ATTRIBUTE_ARCHIVE = getBit(fileAttributes, 5)
-        self.FILE_ATTRIBUTE_NORMAL = getBit(fileAttributes, 7)
-        self.FILE_ATTRIBUTE_TEMPORARY = getBit(fileAttributes, 8)
-        self.FILE_ATTRIBUTE_SPARSE_FILE = getBit(fileAttributes, 9)
-        self.FILE_ATTRIBUTE_REPARSE_POINT = getBit(fileAttributes, 10)
-        self.FILE_ATTRIBUTE_COMPRESSED = getBit(fileAttributes, 11)
-        self.FILE_ATTRIBUTE_OFFLINE = getBit(fileAttributes, 12)
-        self.FILE_ATTRIBUTE_NOT_CONTENT_INDEXED = getBit(fileAttributes, 13)
-        self.FILE_ATTRIBUTE_ENCRYPTED = getBit(fileAttributes, 14)
-        
-        # CreationTime; 8 bytes
-        creationTime = contents[28:36]
-        self.CreationTime = systemTimeToUtcSeconds(creationTime)
-
-        # AccessTime; 8 bytes
-        accessTime = contents[36:44]
-        self.AccessTime = systemTimeToUtcSeconds(accessTime)
-
-        # WriteTime; 8 bytes
-        writeTime = contents[44:52]
-        self.WriteTime = systemTimeToUtcSeconds(writeTime)
-
-        # FileSize; 4 bytes
-        fileSize = contents[52:56]
-        self.FileSize = getUint(fileSize, 0)
-
-        # IconIndex; 4 bytes
-        iconIndex = contents[56:60]
-        self.IconIndex = getInt(iconIndex, 0)
-
-        # ShowCommand; 4 bytes
-        showCommand = contents[60:64]
-        self.ShowCommand = getUint(showCommand, 0)
-
-        # HotKeyFlags; 2 bytes
-        self.HotkeyFlags[0] = contents[64]
-        self.HotkeyFlags[1] = contents[65]
+    HEADER_SIZE = 0x4C
+    LINK_CLSID = b"\x01\x14\x02\x00\x00\x00\x00\x00\xC0\x00\x00\x00\x00\x00\x00\x46"
+
+    # Data; the flags in _LINK_FLAGS and _FILE_ATTRIBUTES are properties over the two bitmasks, not stored fields
+    __slots__ = (
+        "HeaderSize", # 4 bytes; 0x4C
+        "LinkCLSID", # 16 bytes; 00021401-0000-0000-C000-000000000046 OR 00021401-0000-0000-C000-00000000000F
+        "LinkFlags", # 4 bytes; bitmask, see _LINK_FLAGS
+        "FileAttributes", # 4 bytes; bitmask, see _FILE_ATTRIBUTES
+        "CreationFiletime", # FILETIME; 100-nanosecond intervals since 1601-01-01 UTC, exactly as stored. CreationTime is the UTC seconds view of it
+        "AccessFiletime", # FILETIME; see AccessTime
+        "WriteFiletime", # FILETIME; see WriteTime
+        "FileSize", # Size, in bytes, of the link target. If the link target file is larger than 0xFFFFFFFF, this value specifies the least significant 32 bits of the link target file size.
+        "IconIndex", # Index of an icon within a given icon location
+        "ShowCommand", # 1=Normal, 3=Maximized, 7=Minimized
+        "HotkeyFlags", # low byte, high byte; https://learn.microsoft.com/en-us/openspecs/windows_protocols/ms-shllink/8cd21240-1b5d-43e6-adc4-38cf14e30cea
+    )
+
+    # Comparable copy of the state pack() writes; see LNK.dirtySections
+    _SNAPSHOT_FIELDS = operator.attrgetter(*(name for name in __slots__ if name != "HotkeyFlags"))
+
+    def _snapshot(self):
+        return (_ShellLinkHeader._SNAPSHOT_FIELDS(self), tuple(self.HotkeyFlags))
+
+    def __init__(self, contents: bytes = None, offset: int = 0):
+        if contents != None:
+            # Whole fixed-size header in one unpack
+            (
+                self.HeaderSize,
+                self.LinkCLSID,
+                self.LinkFlags,
+                self.FileAttributes,
+                self.CreationFiletime,
+                self.AccessFiletime,
+                self.WriteFiletime,
+                self.FileSize,
+                self.IconIndex,
+                self.ShowCommand,
+                hotkeyLow,
+                hotkeyHigh
+            ) = _SHELL_LINK_HEADER_STRUCT.unpack_from(contents, offset)
+            self.HotkeyFlags = [hotkeyLow, hotkeyHigh]
+
+        else:
+            self.HeaderSize = _ShellLinkHeader.HEADER_SIZE
+            self.LinkCLSID = _ShellLinkHeader.LINK_CLSID
+            self.LinkFlags = 0
+            self.FileAttributes = 0
+            self.CreationFiletime = 0
+            self.AccessFiletime = 0
+            self.WriteFiletime = 0
+            self.FileSize = 0
+            self.IconIndex = 0
+            self.ShowCommand = 1
+            self.HotkeyFlags = [0, 0]
+
+    # UTC seconds
+    @property
+    def CreationTime(self):
+        return filetimeToUtcSeconds(self.CreationFiletime)
+
+    @CreationTime.setter
+    def CreationTime(self, utcSeconds):
+        self.CreationFiletime = utcSecondsToFiletime(utcSeconds)
+
+    # UTC seconds
+    @property
+    def AccessTime(self):
+        return filetimeToUtcSeconds(self.AccessFiletime)
+
+    @AccessTime.setter
+    def AccessTime(self, utcSeconds):
+        self.AccessFiletime = utcSecondsToFiletime(utcSeconds)
+
+    # UTC seconds
+    @property
+    def WriteTime(self):
+        return filetimeToUtcSeconds(self.WriteFiletime)
+
+    @WriteTime.setter
+    def WriteTime(self, utcSeconds):
+        self.WriteFiletime = utcSecondsToFiletime(utcSeconds)
+
+    # Inputs shared by packedSize and packInto (encoded strings and the like), computed once per pack; the header needs none
+    def _packLayout(self):
+        return None
+
+    def packedSize(self, layout = None):
+        return _SHELL_LINK_HEADER_STRUCT.size
+
+    # Write the header at offset; Reserved1-3 are written as zeros
+    def packInto(self, contents: bytearray, offset: int = 0, layout = None):
+        _SHELL_LINK_HEADER_STRUCT.pack_into(
+            contents,
+            offset,
+            self.HeaderSize,
+            self.LinkCLSID,
+            self.LinkFlags,
+            self.FileAttributes,
+            self.CreationFiletime,
+            self.AccessFiletime,
+            self.WriteFiletime,
+            self.FileSize,
+            self.IconIndex,
+            self.ShowCommand,
+            self.HotkeyFlags[0],
+            self.HotkeyFlags[1]
+            )
+        return offset + _SHELL_LINK_HEADER_STRUCT.size
 
     def pack(self):
-        contents = b""
-
-        # HeaderSize; 4 bytes
-        contents += packUint(self.HeaderSize)
-
-        # LinkCLSID; 16 bytes
-        contents += self.LinkCLSID
-
-        # LinkFlags; 4 bytes
-        linkFlags = bytes(4)
-        linkFlags = packBit(linkFlags, 0, self.HasLinkTargetIDList)
-        linkFlags = packBit(linkFlags, 1, self.HasLinkInfo)
-        linkFlags = packBit(linkFlags, 2, self.HasName)
-        linkFlags = packBit(linkFlags, 3, self.HasRelativePath)
-        linkFlags = packBit(linkFlags, 4, self.HasWorkingDir)
-        linkFlags = packBit(linkFlags, 5, self.HasArguments)
-        linkFlags = packBit(linkFlags, 6, self.HasIconLocation)
-        linkFlags = packBit(linkFlags, 7, self.IsUnicode)
-        linkFlags = packBit(linkFlags, 8, self.ForceNoLinkInfo)
-        linkFlags = packBit(linkFlags, 9, self.HasExpString)
-        linkFlags = packBit(linkFlags, 10, self.RunInSeparateProcess)
-        linkFlags = packBit(linkFlags, 12, self.HasDarwinID)
-        linkFlags = packBit(linkFlags, 13, self.RunAsUser)
-        linkFlags = packBit(linkFlags, 14, self.HasExpIcon)
-        linkFlags = packBit(linkFlags, 15, self.NoPidlAlias)
-        linkFlags = packBit(linkFlags, 17, self.RunWithShimLayer)
-        linkFlags = packBit(linkFlags, 18, self.ForceNoLinkTrack)
-        linkFlags = packBit(linkFlags, 19, self.EnableTargetMetadata)
-        linkFlags = packBit(linkFlags, 20, self.DisableLinkPathTracking)
-        linkFlags = packBit(linkFlags, 21, self.DisableKnownFolderTracking)
-        linkFlags = packBit(linkFlags, 22, self.DisableKnownFolderAlias)
-        linkFlags = packBit(linkFlags, 23, self.AllowLinkToLink)
-        linkFlags = packBit(linkFlags, 24, self.UnaliasOnSave)
-        linkFlags = packBit(linkFlags, 25, self.PreferEnvironmentPath)
-        linkFlags = packBit(linkFlags, 26, self.KeepLocalIDListForUNCTarget)
-        contents += linkFlags
-
-        # File attributes; 4 bytes
-        fileAttributes = bytes(4)
-        fileAttributes = packBit(fileAttributes, 0, self.FILE_ATTRIBUTE_READONLY)
-        fileAttributes = packBit(fileAttributes, 1, self.FILE_ATTRIBUTE_HIDDEN)
-        fileAttributes = packBit(fileAttributes, 2, self.FILE_ATTRIBUTE_SYSTEM)
-        fileAttributes = packBit(fileAttributes, 4, self.FILE_ATTRIBUTE_DIRECTORY)
-        fileAttributes = packBit(fileAttributes, 5, self.FILE_ATTRIBUTE_ARCHIVE)
-        fileAttributes = packBit(fileAttributes, 7, self.FILE_ATTRIBUTE_NORMAL)
-        fileAttributes = packBit(fileAttributes, 8, self.FILE_ATTRIBUTE_TEMPORARY)
-        fileAttributes = packBit(fileAttributes, 9, self.FILE_ATTRIBUTE_SPARSE_FILE)
-        fileAttributes = packBit(fileAttributes, 10, self.FILE_ATTRIBUTE_REPARSE_POINT)
-        fileAttributes = packBit(fileAttributes, 11, self.FILE_ATTRIBUTE_COMPRESSED)
-        fileAttributes = packBit(fileAttributes, 12, self.FILE_ATTRIBUTE_OFFLINE)
-        fileAttributes = packBit(fileAttributes, 13, self.FILE_ATTRIBUTE_NOT_CONTENT_INDEXED)
-        fileAttributes = packBit(fileAttributes, 14, self.FILE_ATTRIBUTE_ENCRYPTED)
-        contents += fileAttributes
-        
-        # CreationTime; 8 bytes
-        contents += utcSecondsToSystemTime(self.CreationTime)
-
-        # AccessTime; 8 bytes
-        contents += utcSecondsToSystemTime(self.AccessTime)
-
-        # WriteTime; 8 bytes
-        contents += utcSecondsToSystemTime(self.WriteTime)
-
-        # FileSize; 4 
-        contents += packUint(self.FileSize)
-
-        # IconIndex; 4 bytes
-        contents += packInt(self.IconIndex)
-
-        # ShowCommand; 4 bytes
-        contents += packUint(self.ShowCommand)
-
-        # HotKeyFlags; 2 bytes
-        contents += int.to_bytes(self.HotkeyFlags[0]) + int.to_bytes(self.HotkeyFlags[1])
-
-        # Reserved1 + Reserved2 + Reserved3
-        reserved = bytes(2 + 4 + 4)
-        contents += reserved
-
-        # Return result
-        return contents
+        layout = self._packLayout()
+        contents = bytearray(self.packedSize(layout))
+        self.packInto(contents, 0, layout)
+        return bytes(contents)
+
+# One bool property per named bit of a bitmask field
+def _bitProperty(bitmaskName: str, mask: int):
+    def getBitValue(self):
+        return (getattr(self, bitmaskName) & mask) != 0
+
+    def setBitValue(self, value: bool):
+        bitmask = getattr(self, bitmaskName)
+        setattr(self, bitmaskName, (bitmask | mask) if value else (bitmask & ~mask))
+
+    return property(getBitValue, setBitValue)
+
+for name, mask in _LINK_FLAGS:
+    setattr(_ShellLinkHeader, name, _bitProperty("LinkFlags", mask))
+for name, mask in _FILE_ATTRIBUTES:
+    setattr(_ShellLinkHeader, name, _bitProperty("FileAttributes", mask))
 
 
 
 class _LinkTargetIDList:
-    itemIdDatas: list[bytes] = []
+    # Data
+    __slots__ = (
+        "itemIdDatas", # list[bytes]; ItemID.Data of each entry, without the ItemIDSize prefix
+    )
+
+    def _snapshot(self):
+        return tuple(self.itemIdDatas)
 
     @property
     def totalSize(self):
@@ -363,6 +405,8 @@ class _LinkTargetIDList:
         return size
 
     def __init__(self, offset: int, contents: bytes):
+        self.itemIdDatas = []
+
         if offset != 0 and contents != None:
             sizeOfIdList = getUshort(contents, offset)
 
@@ -370,83 +414,378 @@ class _LinkTargetIDList:
                 sizeOfItemIdIndex = offset + 2
                 while True:
                     sizeOfItemId = getUshort(contents, sizeOfItemIdIndex)
-                    if sizeOfItemId == 0:
+                    if sizeOfItemId < 2: # TerminalID; 1 cannot even hold ItemIDSize and would crawl byte by byte
                         break
 
                     itemIdDataIndex = sizeOfItemIdIndex + 2
-                    data = contents[itemIdDataIndex:(itemIdDataIndex + sizeOfItemId - 2)]
+                    data = bytes(contents[itemIdDataIndex:(itemIdDataIndex + sizeOfItemId - 2)])
                     self.itemIdDatas.append(data)
 
                     sizeOfItemIdIndex += sizeOfItemId
 
-    def pack(self):
-        contents = b""
+    def _packLayout(self):
+        return None
+
+    def packedSize(self, layout = None):
+        return self.totalSize
+
+    def packInto(self, contents: bytearray, offset: int = 0, layout = None):
+        packUshortInto = _USHORT_STRUCT.pack_into
 
         # IDListSize
-        contents += packUshort(self.sizeOfIdList)
+        packUshortInto(contents, offset, self.sizeOfIdList)
+        offset += 2
 
-        # IDList -> ItemIDList
+        # IDList -> ItemIDList; ItemIDSize counts itself
         for itemIdData in self.itemIdDatas:
-            contents += packUshort(len(itemIdData))
-            contents += itemIdData 
+            end = offset + 2 + len(itemIdData)
+            packUshortInto(contents, offset, end - offset)
+            contents[offset + 2:end] = itemIdData
+            offset = end
 
         # IDList -> TerminalID
-        contents += b"\x00\x00"
+        packUshortInto(contents, offset, 0)
+        return offset + 2
 
-        return contents
+    def pack(self):
+        layout = self._packLayout()
+        contents = bytearray(self.packedSize(layout))
+        self.packInto(contents, 0, layout)
+        return bytes(contents)
+
+    # Decoded shell item of each ItemID, in order; see _decodeShellItem
+    def getShellItems(self):
+        return [_decodeShellItem(itemIdData) for itemIdData in self.itemIdDatas]
+
+    # Filesystem or UNC path the IDList leads to, or None when it goes through items with no path form
+    def getPath(self, pathCache = None):
+        return (pathCache if pathCache != None else LNKPathCache()).resolve(self.itemIdDatas)
+
+
+# Shell items: the Data of one ItemID, told apart by its first byte, the class type indicator
+# Path segments are joined by appendTo(parentPath); None means "no path form" and stops the path there
+
+# Any class type without a decoder below
+class _ShellItem:
+    # Data
+    __slots__ = (
+        "ClassType", # 1 byte
+        "data", # bytes; the whole ItemID.Data, class type included
+    )
+
+    def __init__(self, data: bytes):
+        self.ClassType = data[0] if len(data) != 0 else 0
+        self.data = data
+
+    def appendTo(self, parentPath: str):
+        return None
+
+class _RootFolderShellItem(_ShellItem):
+    # Root folders whose children carry absolute paths of their own (volumes, UNC locations)
+    PATH_ROOTS = frozenset(uuid.UUID(clsid).bytes_le for clsid in (
+        "20D04FE0-3AEA-1069-A2D8-08002B30309D", # My Computer
+        "208D2C60-3AEA-1069-A2D7-08002B30309D", # My Network Places
+        "F02C1A0D-BE21-4350-88B0-7367FC96EF3C", # Network
+        ))
+
+    # Data
+    __slots__ = (
+        "SortIndex", # 1 byte
+        "ShellFolderID", # 16 bytes; CLSID of the shell folder
+    )
+
+    def __init__(self, data: bytes):
+        super().__init__(data)
+        self.SortIndex = data[1]
+        self.ShellFolderID = bytes(data[2:18])
+
+    # Other shell folders are written the way the shell parses them, "::{CLSID}"
+    def appendTo(self, parentPath: str):
+        if self.ShellFolderID in _RootFolderShellItem.PATH_ROOTS:
+            return ""
+        return "::{" + str(uuid.UUID(bytes_le=self.ShellFolderID)).upper() + "}"
+
+class _VolumeShellItem(_ShellItem):
+    # Data
+    __slots__ = (
+        "VolumeName", # e.g. "C:\"; empty when the item has no name (class type bit 0 clear)
+    )
+
+    def __init__(self, data: bytes):
+        super().__init__(data)
+        self.VolumeName = getStringUtf8(data, 1, len(data) - 1) if self.ClassType & 0x01 and len(data) > 1 else ""
+
+    def appendTo(self, parentPath: str):
+        return self.VolumeName or None
+
+class _FileEntryShellItem(_ShellItem):
+    # Data
+    __slots__ = (
+        "FileSize", # 4 bytes
+        "ModificationTime", # 4 bytes; FAT date (low word) and time (high word), local time, as stored
+        "FileAttributes", # 2 bytes; same bits as _ShellLinkHeader.FileAttributes
+        "PrimaryName", # 8.3 name, or the long name on items written without a BEEF0004 block
+        "extensionBlocks", # list[_ExtensionBlock | _FileEntryExtensionBlock]
+    )
+
+    IsDirectory = property(lambda self: (self.ClassType & 0x01) != 0)
+    IsFile = property(lambda self: (self.ClassType & 0x02) != 0)
+    HasUnicodeName = property(lambda self: (self.ClassType & 0x04) != 0)
+
+    def __init__(self, data: bytes):
+        super().__init__(data)
+        self.FileSize, self.ModificationTime, self.FileAttributes = _FILE_ENTRY_SHELL_ITEM_STRUCT.unpack_from(data, 2)
+
+        if self.HasUnicodeName:
+            self.PrimaryName = getStringUtf16Le(data, 12, (len(data) - 12) // 2)
+            extensionOffset = 12 + len(self.PrimaryName) * 2 + 2
+        else:
+            self.PrimaryName = getStringUtf8(data, 12, len(data) - 12)
+            extensionOffset = 12 + len(packStringUtf8(self.PrimaryName)) + 1
+            extensionOffset += extensionOffset & 1 # Padded to 2 bytes
+
+        self.extensionBlocks = _decodeExtensionBlocks(data, extensionOffset)
+
+    # Long name from the BEEF0004 block when there is one
+    @property
+    def Name(self):
+        for extensionBlock in self.extensionBlocks:
+            if isinstance(extensionBlock, _FileEntryExtensionBlock) and extensionBlock.LongName:
+                return extensionBlock.LongName
+        return self.PrimaryName
+
+    def appendTo(self, parentPath: str):
+        if parentPath == None:
+            return None
+        if parentPath == "" or parentPath.endswith("\\"):
+            return parentPath + self.Name
+        return parentPath + "\\" + self.Name
+
+class _NetworkLocationShellItem(_ShellItem):
+    # Data
+    __slots__ = (
+        "Flags", # 1 byte; 0x80 adds Description, 0x40 adds Comments
+        "Location", # e.g. "\\SERVER" or "\\SERVER\share"
+        "Description",
+        "Comments",
+    )
+
+    def __init__(self, data: bytes):
+        super().__init__(data)
+        self.Flags = data[2]
+        self.Location = getStringUtf8(data, 3, len(data) - 3)
+        self.Description = ""
+        self.Comments = ""
+
+        offset = 3 + len(packStringUtf8(self.Location)) + 1
+        if self.Flags & 0x80 and offset < len(data):
+            self.Description = getStringUtf8(data, offset, len(data) - offset)
+            offset += len(packStringUtf8(self.Description)) + 1
+        if self.Flags & 0x40 and offset < len(data):
+            self.Comments = getStringUtf8(data, offset, len(data) - offset)
+
+    # The location is a whole UNC path on its own
+    def appendTo(self, parentPath: str):
+        return self.Location or None
+
+# FileSize, ModificationTime, FileAttributes of a file entry, after the class type and one unknown byte
+_FILE_ENTRY_SHELL_ITEM_STRUCT = struct.Struct("<IIH")
+
+# Extension blocks trail some shell items; each starts with Size (2 bytes), Version (2 bytes), Signature (4 bytes, 0xBEEFxxxx)
+class _ExtensionBlock:
+    # Data
+    __slots__ = (
+        "Version",
+        "Signature",
+        "data", # bytes; the whole block
+    )
+
+    def __init__(self, data: bytes, offset: int, size: int):
+        self.Version = getUshort(data, offset + 2)
+        self.Signature = getUint(data, offset + 4)
+        self.data = bytes(data[offset:offset + size])
+
+class _FileEntryExtensionBlock(_ExtensionBlock):
+    # Data
+    __slots__ = (
+        "CreationTime", # 4 bytes; FAT date and time, as stored
+        "AccessTime", # 4 bytes; FAT date and time, as stored
+        "FileReference", # 8 bytes, version 7 and up; NTFS MFT entry and sequence number, else 0
+        "LongName",
+    )
+
+    def __init__(self, data: bytes, offset: int, size: int):
+        super().__init__(data, offset, size)
+        self.CreationTime = getUint(data, offset + 8)
+        self.AccessTime = getUint(data, offset + 12)
+        self.FileReference = 0
+        self.LongName = ""
+
+        # The fields before LongName grow with the version
+        version = self.Version
+        longNameOffset = 18
+        if version >= 7:
+            self.FileReference = struct.unpack_from("<Q", data, offset + 20)[0]
+            longNameOffset += 18
+        if version >= 3:
+            longNameOffset += 2
+        if version >= 8:
+            longNameOffset += 4
+        if version >= 9:
+            longNameOffset += 4
+        if longNameOffset + 2 <= size:
+            self.LongName = getStringUtf16Le(data, offset + longNameOffset, (size - longNameOffset) // 2)
+
+# Signature -> decoder; anything else is an _ExtensionBlock
+_EXTENSION_BLOCKS = {
+    0xBEEF0004: _FileEntryExtensionBlock,
+}
+
+def _decodeExtensionBlocks(data: bytes, offset: int):
+    extensionBlocks = []
+    while offset + 8 <= len(data):
+        size = getUshort(data, offset)
+        if size < 8 or offset + size > len(data) or (getUint(data, offset + 4) & 0xFFFF0000) != 0xBEEF0000:
+            break
+        extensionBlocks.append(_EXTENSION_BLOCKS.get(getUint(data, offset + 4), _ExtensionBlock)(data, offset, size))
+        offset += size
+    return extensionBlocks
+
+# Class type indicator -> decoder, one entry per byte value; the high nibble picks the item kind
+_SHELL_ITEM_CLASSES = tuple(
+    _RootFolderShellItem if classType == 0x1F else
+    _VolumeShellItem if classType & 0xF0 == 0x20 else
+    _FileEntryShellItem if classType & 0xF0 == 0x30 else
+    _NetworkLocationShellItem if classType & 0xF0 == 0x40 else
+    _ShellItem
+    for classType in range(256)
+)
+
+# Shell item for one ItemID.Data; malformed items come back as plain _ShellItem
+def _decodeShellItem(itemIdData: bytes):
+    if len(itemIdData) == 0:
+        return _ShellItem(itemIdData)
+    try:
+        return _SHELL_ITEM_CLASSES[itemIdData[0]](itemIdData)
+    except (struct.error, IndexError, UnicodeDecodeError):
+        return _ShellItem(itemIdData)
+
+"""
+IDList -> path, shared across many shortcuts (one per batch). Paths of IDList prefixes are kept in a trie keyed by
+ItemID.Data, so a prefix such as My Computer\\C:\\Users\\... is decoded once however many links go through it.
+The last ItemID of an IDList is decoded every time and not kept, so the trie grows with folders, not with links.
+"""
+class LNKPathCache:
+    def __init__(self):
+        self.root = {} # ItemID.Data -> (path or None, children)
+
+    def resolve(self, itemIdDatas: list):
+        if len(itemIdDatas) == 0:
+            return None
+
+        path = ""
+        children = self.root
+        for itemIdData in itemIdDatas[:-1]:
+            node = children.get(itemIdData)
+            if node == None:
+                node = children.setdefault(itemIdData, (_decodeShellItem(itemIdData).appendTo(path), {}))
+            path, children = node
+            if path == None:
+                return None
+
+        return _decodeShellItem(itemIdDatas[-1]).appendTo(path) or None
 
 
 class _LinkInfo:
-    LinkInfoSize: int = 0
-    LinkInfoHeaderSize: int = 0
-    OffsetsToOptionalFieldsPresent: bool = False
-    LinkInfoFlags = 0
-    VolumeIDAndLocalBasePathPresent: bool = False
-    CommonNetworkRelativeLinkAndPathSuffixPresent: bool = False
-    VolumeIdSize = 0
-    VolumeIdDriveType = 0 # 0=Unknown,1=NoRootDir,2=Removable,3=Fixed,4=Remote,5=CD,6=RAM
-    VolumeIdDriveSerialNumber = 0
-    VolumeIdLabelOffset = 0
-    VolumeIdLabelOffsetUnicode = 0
-    VolumeIdData = b""
-    LocalBasePath: str = None
-    CommonNetworkRelativeLinkSize: int
-    CommonNetworkRelativeLinkFlags: int
-    CommonNetworkRelativeLinkValidDevice = False
-    CommonNetworkRelativeLinkValidNetType = False
-    NetNameOffset: int = 0
-    NetNameOffsetUnicode: int = 0
-    NetNameUnicode: str = ""
-    NetName: str = ""
-    DeviceNameOffset: int = 0
-    DeviceNameOffsetUnicode: int = 0
-    DeviceNameUnicode: str = ""
-    DeviceName:str = ""
-    NetworkProviderType: int = 0
-    CommonPathSuffix: str = ""
-    LocalBasePathUnicode: str = ""
-    CommonPathSuffixUnicode: str = ""
+    # Data; the *Present and CommonNetworkRelativeLinkValid* flags are properties over LinkInfoFlags / CommonNetworkRelativeLinkFlags
+    __slots__ = (
+        "LinkInfoSize",
+        "LinkInfoHeaderSize",
+        "LinkInfoFlags",
+        "VolumeIDOffset",
+        "LocalBasePathOffset",
+        "CommonNetworkRelativeLinkOffset",
+        "CommonPathSuffixOffset",
+        "LocalBasePathOffsetUnicode",
+        "CommonPathSuffixOffsetUnicode",
+        "VolumeIdSize",
+        "VolumeIdDriveType", # 0=Unknown,1=NoRootDir,2=Removable,3=Fixed,4=Remote,5=CD,6=RAM
+        "VolumeIdDriveSerialNumber",
+        "VolumeIdLabelOffset",
+        "VolumeIdLabelOffsetUnicode",
+        "VolumeIdData",
+        "LocalBasePath",
+        "CommonNetworkRelativeLinkSize",
+        "CommonNetworkRelativeLinkFlags",
+        "NetNameOffset",
+        "NetNameOffsetUnicode",
+        "NetNameUnicode",
+        "NetName",
+        "DeviceNameOffset",
+        "DeviceNameOffsetUnicode",
+        "DeviceNameUnicode",
+        "DeviceName",
+        "NetworkProviderType",
+        "CommonPathSuffix",
+        "LocalBasePathUnicode",
+        "CommonPathSuffixUnicode",
+    )
+
+    _SNAPSHOT_FIELDS = operator.attrgetter(*__slots__)
+
+    def _snapshot(self):
+        return _LinkInfo._SNAPSHOT_FIELDS(self)
+
+    @property
+    def OffsetsToOptionalFieldsPresent(self):
+        return self.LinkInfoHeaderSize >= 0x24
+
+    VolumeIDAndLocalBasePathPresent = _bitProperty("LinkInfoFlags", 1 << 0)
+    CommonNetworkRelativeLinkAndPathSuffixPresent = _bitProperty("LinkInfoFlags", 1 << 1)
+    CommonNetworkRelativeLinkValidDevice = _bitProperty("CommonNetworkRelativeLinkFlags", 1 << 0)
+    CommonNetworkRelativeLinkValidNetType = _bitProperty("CommonNetworkRelativeLinkFlags", 1 << 1)
 
     def __init__(self, offset: int, contents: bytes):
+        self.LinkInfoSize = 0
+        self.LinkInfoHeaderSize = 0
+        self.LinkInfoFlags = 0
+        self.VolumeIDOffset = 0
+        self.LocalBasePathOffset = 0
+        self.CommonNetworkRelativeLinkOffset = 0
+        self.CommonPathSuffixOffset = 0
+        self.LocalBasePathOffsetUnicode = 0
+        self.CommonPathSuffixOffsetUnicode = 0
+        self.VolumeIdSize = 0
+        self.VolumeIdDriveType = 0
+        self.VolumeIdDriveSerialNumber = 0
+        self.VolumeIdLabelOffset = 0
+        self.VolumeIdLabelOffsetUnicode = 0
+        self.VolumeIdData = b""
+        self.LocalBasePath = None
+        self.CommonNetworkRelativeLinkSize = 0
+        self.CommonNetworkRelativeLinkFlags = 0
+        self.NetNameOffset = 0
+        self.NetNameOffsetUnicode = 0
+        self.NetNameUnicode = ""
+        self.NetName = ""
+        self.DeviceNameOffset = 0
+        self.DeviceNameOffsetUnicode = 0
+        self.DeviceNameUnicode = ""
+        self.DeviceName = ""
+        self.NetworkProviderType = 0
+        self.CommonPathSuffix = ""
+        self.LocalBasePathUnicode = ""
+        self.CommonPathSuffixUnicode = ""
+
         if offset != 0 and contents != None:
             self.LinkInfoSize = getUint(contents, offset)
 
             if self.LinkInfoSize != 0:
                 # LinkInfoHeaderSize
                 self.LinkInfoHeaderSize = getUint(contents, offset + 4)
-                if self.LinkInfoHeaderSize >= 0x24:
-                    self.OffsetsToOptionalFieldsPresent = True
 
                 # LinkInfoFlags
                 self.LinkInfoFlags = getUint(contents, offset + 8)
-                if self.LinkInfoFlags != 0:
-                    if self.LinkInfoFlags == 1:
-                        self.VolumeIDAndLocalBasePathPresent = True
-                    elif self.LinkInfoFlags == 2:
-                        self.CommonNetworkRelativeLinkAndPathSuffixPresent = True
-                    else:
-                        self.VolumeIDAndLocalBasePathPresent = True
-                        self.CommonNetworkRelativeLinkAndPathSuffixPresent = True
 
                 # VolumeIDOffset
                 self.VolumeIDOffset = getUint(contents, offset + 12)
@@ -475,9 +814,12 @@ class _LinkInfo:
                     self.VolumeIdDriveSerialNumber = getUint(contents, offset + self.VolumeIDOffset + 8)
                     self.VolumeIdLabelOffset = getUint(contents, offset + self.VolumeIDOffset + 12)
 
+                    # Data follows the fixed fields, up to VolumeIDSize; it holds the volume label
+                    volumeIdDataOffset = 0x10
                     if self.VolumeIdLabelOffset == 0x14:
                         self.VolumeIdLabelOffsetUnicode = getUint(contents, offset + self.VolumeIDOffset + 16)
-                    self.VolumeIdData = contents[offset + self.VolumeIDOffset + 20:offset + self.VolumeIDOffset + 20 + self.VolumeIdSize]
+                        volumeIdDataOffset = 0x14
+                    self.VolumeIdData = bytes(contents[offset + self.VolumeIDOffset + volumeIdDataOffset:offset + self.VolumeIDOffset + max(volumeIdDataOffset, self.VolumeIdSize)])
 
                 # LocalBasePath
                 if self.VolumeIDAndLocalBasePathPresent and self.LocalBasePathOffset != 0:
@@ -488,30 +830,20 @@ class _LinkInfo:
                     self.CommonNetworkRelativeLinkSize = getUint(contents, offset + self.CommonNetworkRelativeLinkOffset)
                     self.CommonNetworkRelativeLinkFlags = getUint(contents, offset + self.CommonNetworkRelativeLinkOffset + 4)
 
-                    if self.CommonNetworkRelativeLinkFlags != 0:
-                        if self.CommonNetworkRelativeLinkFlags == 1:
-                            self.CommonNetworkRelativeLinkValidDevice = True
-                        elif self.CommonNetworkRelativeLinkFlags == 2:
-                            self.CommonNetworkRelativeLinkValidNetType = True
-                        else:
-                            self.CommonNetworkRelativeLinkValidDevice = True
-                            self.CommonNetworkRelativeLinkValidNetType = True
-
                     self.NetNameOffset = getUint(contents, offset + self.CommonNetworkRelativeLinkOffset + 8)
+                    # NetName and DeviceName are always there; NetNameOffset > 0x14 adds the unicode copies after them
                     if self.NetNameOffset != 0:
+                        self.NetName = getStringUtf8(contents, offset + self.CommonNetworkRelativeLinkOffset + self.NetNameOffset)
                         if self.NetNameOffset > 0x14:
                             self.NetNameOffsetUnicode = getUint(contents, offset + self.CommonNetworkRelativeLinkOffset + 20)
                             self.NetNameUnicode = getStringUtf16Le(contents, offset + self.CommonNetworkRelativeLinkOffset + self.NetNameOffsetUnicode)
-                        else:
-                            self.NetName = getStringUtf8(contents, offset + self.CommonNetworkRelativeLinkOffset + self.NetNameOffset)
 
                     self.DeviceNameOffset = getUint(contents, offset + self.CommonNetworkRelativeLinkOffset + 12)
                     if self.CommonNetworkRelativeLinkValidDevice and self.DeviceNameOffset != 0:
+                        self.DeviceName = getStringUtf8(contents, offset + self.CommonNetworkRelativeLinkOffset + self.DeviceNameOffset)
                         if self.NetNameOffset > 0x14:
                             self.DeviceNameOffsetUnicode = getUint(contents, offset + self.CommonNetworkRelativeLinkOffset + 24)
                             self.DeviceNameUnicode = getStringUtf16Le(contents, offset + self.CommonNetworkRelativeLinkOffset + self.DeviceNameOffsetUnicode)
-                        else:
-                            self.DeviceName = getStringUtf8(contents, offset + self.CommonNetworkRelativeLinkOffset + self.DeviceNameOffset)
 
                     if self.CommonNetworkRelativeLinkValidNetType:
                         self.NetworkProviderType = getUint(contents, offset + self.CommonNetworkRelativeLinkOffset + 16)
@@ -527,271 +859,1137 @@ class _LinkInfo:
                 if self.LinkInfoHeaderSize >= 0x24 and self.CommonPathSuffixOffsetUnicode != 0:
                     self.CommonPathSuffixUnicode = getStringUtf16Le(contents, offset + self.CommonPathSuffixOffsetUnicode)
 
-    def pack(self):
-        # Pack all the required variable data individually
-
-        ## VolumeID
-        contentsVolumeId = b""
-        if self.VolumeIDAndLocalBasePathPresent:
-            ### VolumeIDSize
-            contentsVolumeId += packUint(
-                (5 * 4)
-                + len(self.VolumeIdData) + 1
-                + ((len(self.VolumeIdData) + 1) * 2)
-            )
-
-            ### DriveType
-            contentsVolumeId += packUint(self.VolumeIdDriveType)
-
-            ### DriveSerialNumber
-            contentsVolumeId += packUint(self.VolumeIdDriveSerialNumber)
-            
-            ### VolumeLabelOffset
-            contentsVolumeId += packUint(20)
-
-            ### VolumeLabelOffsetUnicode
-            contentsVolumeId += packUint(20 + len(self.VolumeIdData) + 1)
-
-            ### Data
-            contentsVolumeId += self.VolumeIdData + (b"\x00" if self.VolumeIdData[-1] != b"\x00" else b"")
-            contentsVolumeId += self.VolumeIdData + (b"\x00\x00" if (self.VolumeIdData[-1] != b"\x00" or self.VolumeIdData[-2] != b"\x00") else b"")
-
-        ## LinkInfoFlags
-        contentsLinkInfoFlags = b""
-        if self.VolumeIDAndLocalBasePathPresent:
-            contentsLinkInfoFlags = packUint(1)
-        elif self.CommonNetworkRelativeLinkAndPathSuffixPresent:
-            contentsLinkInfoFlags = packUint(2)
-        elif self.VolumeIDAndLocalBasePathPresent and self.CommonNetworkRelativeLinkAndPathSuffixPresent:
-            contentsLinkInfoFlags = packUint(3)
-        else:
-            contentsLinkInfoFlags = packUint(0)
-
-        ## LocalBasePath
-        contentsLocalBasePath = packStringUtf8(self.LocalBasePath)
-
-        ## CommonPathSuffix
-        contentsCommonPathSuffix = packStringUtf8(self.CommonPathSuffix)
-
-        ## LocalBasePathUnicode
-        contentsLocalBasePathUnicode = packStringUtf16Le(self.LocalBasePathUnicode)
-
-        ## CommonPathSuffixUnicode
-        contentsCommonPathSuffixUnicode = packStringUtf16Le(self.CommonPathSuffixUnicode)
-
-        ## CommonNetworkRelativeLink
-        contentsCommonNetworkRelativeLinkFlags = packUint(0)
-        if self.CommonNetworkRelativeLinkValidDevice and not self.CommonNetworkRelativeLinkValidNetType:
-            contentsCommonNetworkRelativeLinkFlags = packUint(1)
-        elif not self.CommonNetworkRelativeLinkValidDevice and self.CommonNetworkRelativeLinkValidNetType:
-            contentsCommonNetworkRelativeLinkFlags = packUint(2)
-        elif self.CommonNetworkRelativeLinkValidDevice and self.CommonNetworkRelativeLinkValidNetType:
-            contentsCommonNetworkRelativeLinkFlags = packUint(3)
-        contentsNetName = packStringUtf8(self.NetName)
-        contentsNetNameUnicode = packStringUtf16Le(self.NetNameUnicode)
-        contentsDeviceName = packStringUtf8(self.DeviceName)
-        contentsDeviceNameUnicode = packStringUtf16Le(self.DeviceNameUnicode)
-        contentsNetworkProviderType = packUint(self.NetworkProviderType)
-        
-        contentsCommonNetworkRelativeLink = b""
-
-        ### CommonNetworkRelativeLinkSize
-        contentsCommonNetworkRelativeLink += packUint(
-            (7 * 4)
-            + len(contentsNetName) + 1
-            + 2 * (len(contentsNetNameUnicode) + 1)
-            + len(contentsDeviceName)
-            + 2 * (len(contentsDeviceNameUnicode) + 1)
-            )
-        ### CommonNetworkRelativeLinkFlags
-        contentsCommonNetworkRelativeLink += contentsCommonNetworkRelativeLinkFlags
-        ### NetNameOffset
-        contentsCommonNetworkRelativeLink += packUint(28)
-        ### DeviceNameOffset
-        contentsCommonNetworkRelativeLink += packUint(28 + len(contentsNetName) + 1)
-        ### NetworkProviderType
-        contentsCommonNetworkRelativeLink += contentsNetworkProviderType
-        ### NetNameOffsetUnicode
-        contentsCommonNetworkRelativeLink += packUint(28 + len(contentsNetName) + 1 + len(contentsDeviceName) + 1)
-        ### DeviceNameOffsetUnicode
-        contentsCommonNetworkRelativeLink += packUint(28 + len(contentsNetName) + 1 + len(contentsDeviceName) + 1 + ((2 * len(contentsNetNameUnicode)) + 2))
-        ### NetName
-        contentsCommonNetworkRelativeLink += contentsNetName + b"\x00"
-        ### DeviceName
-        contentsCommonNetworkRelativeLink += contentsDeviceName + b"\x00"
-        ### NetNameUnicode
-        contentsCommonNetworkRelativeLink += contentsNetNameUnicode + b"\x00\x00"
-        ### DeviceNameUnicode
-        contentsCommonNetworkRelativeLink += contentsDeviceNameUnicode + b"\x00\x00"
-
-        # Pack all data, combining individual packings
-        contents = b""
-
-        ## LinkInfoSize
-        contents += packUint(
-            (9 * 4)
-            + len(contentsVolumeId)
-            + len(contentsLocalBasePath)
-            + len(contentsCommonNetworkRelativeLink)
-            + len(contentsCommonPathSuffix)
-            + len(contentsLocalBasePathUnicode)
-            + len(contentsCommonPathSuffixUnicode)
-        )
-
-        ## LinkInfoHeaderSize
-        contents += packUint(
-            (9 * 4)
+    # Sizes of the fixed parts, then the encoded, NULL-terminated strings in file order; absent parts are 0 / empty
+    # The optional unicode copies are written when LinkInfo / CommonNetworkRelativeLink already had them, or they are set
+    def _packLayout(self):
+        isVolumeIdPresent = self.VolumeIDAndLocalBasePathPresent
+        isNetworkPresent = self.CommonNetworkRelativeLinkAndPathSuffixPresent
+        isDevicePresent = isNetworkPresent and self.CommonNetworkRelativeLinkValidDevice
+        hasUnicode = self.LinkInfoHeaderSize >= 0x24 or bool(self.LocalBasePathUnicode) or bool(self.CommonPathSuffixUnicode)
+        hasNetworkUnicode = self.NetNameOffset > 0x14 or bool(self.NetNameUnicode) or bool(self.DeviceNameUnicode)
+
+        return (
+            0x24 if hasUnicode else 0x1C, # LinkInfoHeaderSize
+            (0x14 if self.VolumeIdLabelOffset == 0x14 else 0x10) if isVolumeIdPresent else 0, # VolumeID up to Data
+            (0x1C if hasNetworkUnicode else 0x14) if isNetworkPresent else 0, # CommonNetworkRelativeLink up to NetName
+            (self.VolumeIdData or b"\x00") if isVolumeIdPresent else b"",
+            packStringUtf8(self.LocalBasePath or "") + b"\x00" if isVolumeIdPresent else b"",
+            packStringUtf8(self.NetName) + b"\x00" if isNetworkPresent else b"",
+            packStringUtf8(self.DeviceName) + b"\x00" if isDevicePresent else b"",
+            packStringUtf16Le(self.NetNameUnicode) + b"\x00\x00" if isNetworkPresent and hasNetworkUnicode else b"",
+            packStringUtf16Le(self.DeviceNameUnicode) + b"\x00\x00" if isDevicePresent and hasNetworkUnicode else b"",
+            packStringUtf8(self.CommonPathSuffix) + b"\x00",
+            packStringUtf16Le(self.LocalBasePathUnicode) + b"\x00\x00" if isVolumeIdPresent and hasUnicode else b"",
+            packStringUtf16Le(self.CommonPathSuffixUnicode) + b"\x00\x00" if hasUnicode else b"",
         )
 
-        ## LinkInfoFlags
-        contents += contentsLinkInfoFlags
-
-        ## VolumeIDOffset
-        contents += packUint(36)
-
-        ## LocalBasePathOffset
-        contents += packUint(36 + len(contentsVolumeId))
-
-        ## CommonNetworkRelativeLinkOffset
-        contents += packUint(36 + len(contentsVolumeId) + len(contentsLocalBasePath))
-
-        ## CommonPathSuffixOffset
-        contents += packUint(36 + len(contentsVolumeId) + len(contentsLocalBasePath) + len(contentsCommonNetworkRelativeLink))
-
-        ## LocalBasePathOffsetUnicode
-        contents += packUint(36 + len(contentsVolumeId) + len(contentsLocalBasePath) + len(contentsCommonNetworkRelativeLink) + len(contentsCommonPathSuffix))
-
-        ## CommonPathSuffixOffsetUnicode
-        contents += packUint(36 + len(contentsVolumeId) + len(contentsLocalBasePath) + len(contentsCommonNetworkRelativeLink) + len(contentsCommonPathSuffix) + len(contentsLocalBasePathUnicode))
-
-        ## VolumeID
-        contents += contentsVolumeId
+    def packedSize(self, layout = None):
+        if layout == None:
+            layout = self._packLayout()
+        return layout[0] + layout[1] + layout[2] + sum(map(len, layout[3:]))
+
+    def packInto(self, contents: bytearray, offset: int = 0, layout = None):
+        (
+            linkInfoHeaderSize,
+            volumeIdHeaderSize,
+            commonNetworkRelativeLinkHeaderSize,
+            volumeIdData,
+            localBasePath,
+            netName,
+            deviceName,
+            netNameUnicode,
+            deviceNameUnicode,
+            commonPathSuffix,
+            localBasePathUnicode,
+            commonPathSuffixUnicode
+        ) = layout if layout != None else self._packLayout()
+
+        # Offsets, relative to the start of LinkInfo
+        volumeIdOffset = linkInfoHeaderSize
+        localBasePathOffset = volumeIdOffset + volumeIdHeaderSize + len(volumeIdData)
+        commonNetworkRelativeLinkOffset = localBasePathOffset + len(localBasePath)
+        commonNetworkRelativeLinkSize = commonNetworkRelativeLinkHeaderSize + len(netName) + len(deviceName) + len(netNameUnicode) + len(deviceNameUnicode)
+        commonPathSuffixOffset = commonNetworkRelativeLinkOffset + commonNetworkRelativeLinkSize
+        localBasePathOffsetUnicode = commonPathSuffixOffset + len(commonPathSuffix)
+        commonPathSuffixOffsetUnicode = localBasePathOffsetUnicode + len(localBasePathUnicode)
+        linkInfoSize = commonPathSuffixOffsetUnicode + len(commonPathSuffixUnicode)
+
+        ## LinkInfo header; an absent part gets offset 0, and the unicode offsets only exist in the 0x24 form
+        _UINT_STRUCTS[linkInfoHeaderSize // 4].pack_into(
+            contents,
+            offset,
+            linkInfoSize,
+            linkInfoHeaderSize,
+            self.LinkInfoFlags,
+            volumeIdOffset if volumeIdHeaderSize != 0 else 0,
+            localBasePathOffset if volumeIdHeaderSize != 0 else 0,
+            commonNetworkRelativeLinkOffset if commonNetworkRelativeLinkHeaderSize != 0 else 0,
+            commonPathSuffixOffset,
+            *((localBasePathOffsetUnicode if len(localBasePathUnicode) != 0 else 0, commonPathSuffixOffsetUnicode) if linkInfoHeaderSize == 0x24 else ())
+            )
+        offset += linkInfoHeaderSize
+
+        ## VolumeID; VolumeLabelOffset 0x14 means "see VolumeLabelOffsetUnicode"
+        if volumeIdHeaderSize != 0:
+            _UINT_STRUCTS[volumeIdHeaderSize // 4].pack_into(
+                contents,
+                offset,
+                volumeIdHeaderSize + len(volumeIdData),
+                self.VolumeIdDriveType,
+                self.VolumeIdDriveSerialNumber,
+                volumeIdHeaderSize,
+                *((volumeIdHeaderSize,) if volumeIdHeaderSize == 0x14 else ())
+                )
+            offset = packBytesInto(contents, offset + volumeIdHeaderSize, volumeIdData)
 
         ## LocalBasePath
-        contents += contentsLocalBasePath
-
-        ## CommonNetworkRelativeLink
-        contents += contentsCommonNetworkRelativeLink
-
-        ## CommonPathSuffix
-        contents += contentsCommonPathSuffix
-
-        ## LocalBasePathUnicode
-        contents += contentsLocalBasePathUnicode
-
-        ## CommonPathSuffixUnicode
-        contents += contentsCommonPathSuffixUnicode
+        offset = packBytesInto(contents, offset, localBasePath)
+
+        ## CommonNetworkRelativeLink; NetName first, then DeviceName, then the unicode copies
+        if commonNetworkRelativeLinkHeaderSize != 0:
+            netNameOffsetUnicode = commonNetworkRelativeLinkHeaderSize + len(netName) + len(deviceName)
+            _UINT_STRUCTS[commonNetworkRelativeLinkHeaderSize // 4].pack_into(
+                contents,
+                offset,
+                commonNetworkRelativeLinkSize,
+                self.CommonNetworkRelativeLinkFlags,
+                commonNetworkRelativeLinkHeaderSize,
+                commonNetworkRelativeLinkHeaderSize + len(netName) if len(deviceName) != 0 else 0,
+                self.NetworkProviderType if self.CommonNetworkRelativeLinkValidNetType else 0,
+                *((netNameOffsetUnicode, netNameOffsetUnicode + len(netNameUnicode) if len(deviceNameUnicode) != 0 else 0) if commonNetworkRelativeLinkHeaderSize == 0x1C else ())
+                )
+            offset = packBytesInto(contents, offset + commonNetworkRelativeLinkHeaderSize, netName)
+            offset = packBytesInto(contents, offset, deviceName)
+            offset = packBytesInto(contents, offset, netNameUnicode)
+            offset = packBytesInto(contents, offset, deviceNameUnicode)
+
+        ## CommonPathSuffix, LocalBasePathUnicode, CommonPathSuffixUnicode
+        offset = packBytesInto(contents, offset, commonPathSuffix)
+        offset = packBytesInto(contents, offset, localBasePathUnicode)
+        return packBytesInto(contents, offset, commonPathSuffixUnicode)
 
-        # Return final packed data
-        return contents 
+    def pack(self):
+        layout = self._packLayout()
+        contents = bytearray(self.packedSize(layout))
+        self.packInto(contents, 0, layout)
+        return bytes(contents)
     
 
 class _StringData:
-    shellLinkHeader: _ShellLinkHeader
-    NAME_STRING: str = ""
-    RELATIVE_PATH: str = ""
-    WORKING_DIR: str = ""
-    COMMAND_LINE_ARGUMENTS: str = ""
-    ICON_LOCATION: str = ""
-    NAME_STRING_IS_UNICODE: bool = False
-    RELATIVE_PATH_IS_UNICODE: bool = False
-    WORKING_DIR_IS_UNICODE: bool = False
-    COMMAND_LINE_ARGUMENTS_IS_UNICODE: bool = False
-    ICON_LOCATION_IS_UNICODE: bool = False
-    sizeOfStringData = 0
-
-    def parseString(self, contents: bytes, offset: int):        
+    # Data
+    __slots__ = (
+        "shellLinkHeader",
+        "NAME_STRING",
+        "RELATIVE_PATH",
+        "WORKING_DIR",
+        "COMMAND_LINE_ARGUMENTS",
+        "ICON_LOCATION",
+        "sizeOfStringData",
+    )
+
+    # The header's LinkFlags decide which strings are written, so they are part of the state too
+    _SNAPSHOT_FIELDS = operator.attrgetter(*(name for name in __slots__ if name not in ("shellLinkHeader", "sizeOfStringData")))
+
+    def _snapshot(self):
+        return (_StringData._SNAPSHOT_FIELDS(self), self.shellLinkHeader.LinkFlags)
+
+    # (size, string) of the string at offset; exactly CountCharacters characters, no terminator
+    def parseString(self, contents: bytes, offset: int, isUnicode: bool):
         countCharacters = getUshort(contents, offset)
-        if countCharacters == 0:
-            self.sizeOfStringData += 2
-            return (2, "", False)
-
-        stringData = getStringUtf8(contents, offset + 2, countCharacters)
-        stringDataUnicode = getStringUtf16Le(contents, offset + 2, countCharacters)
-
-        if len(stringData) > len(stringDataUnicode):
-            self.sizeOfStringData += 2 + countCharacters
-            return (2 + countCharacters, stringData, False)
-        elif len(stringData) < len(stringDataUnicode):
-            self.sizeOfStringData += (2 + (countCharacters * 2))
-            return (2 + (countCharacters * 2), stringDataUnicode, True)
-        elif len(stringData) == len(stringDataUnicode) == 0:
-            self.sizeOfStringData += 2
-            return (2, "", False)
-        else:
-            self.sizeOfStringData += 2
-            return (2, "", False)
+        size = 2 + (countCharacters * 2 if isUnicode else countCharacters)
+        if offset + size > len(contents):
+            raise IndexError(f"String at offset {offset} runs past the end of the buffer")
+
+        self.sizeOfStringData += size
+        return (size, str(contents[offset + 2:offset + size], "utf-16le" if isUnicode else "utf-8"))
+
+    # Size of the StringData at offset, from the CountCharacters fields alone; nothing is decoded
+    @staticmethod
+    def measure(shellLinkHeader: _ShellLinkHeader, offset: int, contents: bytes):
+        size = 0
+        characterSize = 2 if shellLinkHeader.IsUnicode else 1
+        for present in (shellLinkHeader.HasName, shellLinkHeader.HasRelativePath, shellLinkHeader.HasWorkingDir, shellLinkHeader.HasArguments, shellLinkHeader.HasIconLocation):
+            if present:
+                size += 2 + (getUshort(contents, offset + size) * characterSize)
+        return size
 
     def __init__(self, shellLinkHeader: _ShellLinkHeader, offset: int, contents: bytes):
+        self.shellLinkHeader = shellLinkHeader
+        self.NAME_STRING = ""
+        self.RELATIVE_PATH = ""
+        self.WORKING_DIR = ""
+        self.COMMAND_LINE_ARGUMENTS = ""
+        self.ICON_LOCATION = ""
+        self.sizeOfStringData = 0
         if offset != 0 and contents != None:
             offsetLocal = 0
-            self.shellLinkHeader = shellLinkHeader
 
             # NAME_STRING
             if shellLinkHeader.HasName:
-                offsetLocalIncrement, self.NAME_STRING, isUnicode = self.parseString(contents, offset + offsetLocal)
-                self.NAME_STRING_IS_UNICODE = isUnicode
+                offsetLocalIncrement, self.NAME_STRING = self.parseString(contents, offset + offsetLocal, shellLinkHeader.IsUnicode)
                 offsetLocal += offsetLocalIncrement
 
             # RELATIVE_PATH
             if shellLinkHeader.HasRelativePath:
-                offsetLocalIncrement, self.RELATIVE_PATH, isUnicode = self.parseString(contents, offset + offsetLocal)
-                self.RELATIVE_PATH_IS_UNICODE = isUnicode
+                offsetLocalIncrement, self.RELATIVE_PATH = self.parseString(contents, offset + offsetLocal, shellLinkHeader.IsUnicode)
                 offsetLocal += offsetLocalIncrement
 
             # WORKING_DIR
             if shellLinkHeader.HasWorkingDir:
-                offsetLocalIncrement, self.WORKING_DIR, isUnicode = self.parseString(contents, offset + offsetLocal)
-                self.WORKING_DIR_IS_UNICODE = isUnicode
+                offsetLocalIncrement, self.WORKING_DIR = self.parseString(contents, offset + offsetLocal, shellLinkHeader.IsUnicode)
                 offsetLocal += offsetLocalIncrement
 
             # COMMAND_LINE_ARGUMENTS
             if shellLinkHeader.HasArguments:
-                offsetLocalIncrement, self.COMMAND_LINE_ARGUMENTS, isUnicode = self.parseString(contents, offset + offsetLocal)
-                self.COMMAND_LINE_ARGUMENTS_IS_UNICODE = isUnicode
+                offsetLocalIncrement, self.COMMAND_LINE_ARGUMENTS = self.parseString(contents, offset + offsetLocal, shellLinkHeader.IsUnicode)
                 offsetLocal += offsetLocalIncrement
 
             # ICON_LOCATION
             if shellLinkHeader.HasIconLocation:
-                offsetLocalIncrement, self.ICON_LOCATION, isUnicode = self.parseString(contents, offset + offsetLocal)
-                self.ICON_LOCATION_IS_UNICODE = isUnicode
+                offsetLocalIncrement, self.ICON_LOCATION = self.parseString(contents, offset + offsetLocal, shellLinkHeader.IsUnicode)
                 offsetLocal += offsetLocalIncrement
 
+    # (CountCharacters, encoded string) of each present string, in file order
+    # The header's IsUnicode decides the encoding of every string, as it does when parsing
+    def _packLayout(self):
+        linkFlags = self.shellLinkHeader.LinkFlags
+        isUnicode = self.shellLinkHeader.IsUnicode
+        layout = []
+        for string, mask in (
+            (self.NAME_STRING, 1 << 2), # HasName
+            (self.RELATIVE_PATH, 1 << 3), # HasRelativePath
+            (self.WORKING_DIR, 1 << 4), # HasWorkingDir
+            (self.COMMAND_LINE_ARGUMENTS, 1 << 5), # HasArguments
+            (self.ICON_LOCATION, 1 << 6) # HasIconLocation
+            ):
+            if linkFlags & mask:
+                if isUnicode:
+                    encoded = packStringUtf16Le(string)
+                    layout.append((len(encoded) >> 1, encoded))
+                else:
+                    encoded = packStringUtf8(string)
+                    layout.append((len(encoded), encoded))
+        return layout
+
+    def packedSize(self, layout = None):
+        if layout == None:
+            layout = self._packLayout()
+        return sum(2 + len(encoded) for countCharacters, encoded in layout)
+
+    def packInto(self, contents: bytearray, offset: int = 0, layout = None):
+        packUshortInto = _USHORT_STRUCT.pack_into
+        for countCharacters, encoded in (layout if layout != None else self._packLayout()):
+            packUshortInto(contents, offset, countCharacters)
+            end = offset + 2 + len(encoded)
+            contents[offset + 2:end] = encoded
+            offset = end
+        return offset
+
     def pack(self):
-        contents = b""
+        layout = self._packLayout()
+        contents = bytearray(self.packedSize(layout))
+        self.packInto(contents, 0, layout)
+        return bytes(contents)
 
-        # NAME_STRING
-        if self.shellLinkHeader.HasName:
-            contents += packUshort(len(self.NAME_STRING))
-            contents += (packStringUtf16Le(self.NAME_STRING) if self.NAME_STRING_IS_UNICODE else packStringUtf8(self.NAME_STRING))
 
-        # RELATIVE_PATH
-        if self.shellLinkHeader.HasRelativePath:
-            contents += packUshort(len(self.RELATIVE_PATH))
-            contents += (packStringUtf16Le(self.RELATIVE_PATH) if self.RELATIVE_PATH_IS_UNICODE else packStringUtf8(self.RELATIVE_PATH))
+# ExtraData blocks; each starts with BlockSize (4 bytes) and BlockSignature (4 bytes), see [MS-SHLLINK] 2.5
+# contents/offset point at BlockSize; pack() returns the whole block
 
-        # WORKING_DIR
-        if self.shellLinkHeader.HasWorkingDir:
-            contents += packUshort(len(self.WORKING_DIR))
-            contents += (packStringUtf16Le(self.WORKING_DIR) if self.WORKING_DIR_IS_UNICODE else packStringUtf8(self.WORKING_DIR))
+# Any block without a decoder below, kept byte-for-byte
+class _ExtraDataBlock:
+    # Data
+    __slots__ = (
+        "BlockSignature",
+        "BlockData", # bytes; everything after BlockSignature
+    )
+
+    def __init__(self, contents: bytes = None, offset: int = 0, blockSignature: int = 0):
+        self.BlockSignature = blockSignature
+        self.BlockData = b""
+        if contents != None:
+            blockSize = getUint(contents, offset)
+            self.BlockSignature = getUint(contents, offset + 4)
+            self.BlockData = bytes(contents[offset + 8:offset + blockSize])
 
-        # COMMAND_LINE_ARGUMENTS
-        if self.shellLinkHeader.HasArguments:
-            contents += packUshort(len(self.COMMAND_LINE_ARGUMENTS))
-            contents += (packStringUtf16Le(self.COMMAND_LINE_ARGUMENTS) if self.COMMAND_LINE_ARGUMENTS_IS_UNICODE else packStringUtf8(self.COMMAND_LINE_ARGUMENTS))
+    def pack(self):
+        return struct.pack("<II", 8 + len(self.BlockData), self.BlockSignature) + self.BlockData
 
-        # ICON_LOCATION
-        if self.shellLinkHeader.HasIconLocation:
-            contents += packUshort(len(self.ICON_LOCATION))
-            contents += (packStringUtf16Le(self.ICON_LOCATION) if self.ICON_LOCATION_IS_UNICODE else packStringUtf8(self.ICON_LOCATION))
+class _EnvironmentVariableDataBlock:
+    BlockSignature = 0xA0000001
+    _STRUCT = struct.Struct("<II260s520s")
 
-        return contents
+    # Data
+    __slots__ = (
+        "TargetAnsi", # 260 bytes; NULL-terminated path to environment variable information
+        "TargetUnicode", # 520 bytes; the same, unicode
+    )
+
+    def __init__(self, contents: bytes = None, offset: int = 0):
+        self.TargetAnsi = ""
+        self.TargetUnicode = ""
+        if contents != None:
+            self.TargetAnsi = getStringUtf8(contents, offset + 8, 260)
+            self.TargetUnicode = getStringUtf16Le(contents, offset + 268, 260)
+
+    def pack(self):
+        return self._STRUCT.pack(self._STRUCT.size, self.BlockSignature, packStringUtf8(self.TargetAnsi)[:259], packStringUtf16Le(self.TargetUnicode)[:518])
+
+# Same layout; TargetAnsi / TargetUnicode hold the icon path
+class _IconEnvironmentDataBlock(_EnvironmentVariableDataBlock):
+    BlockSignature = 0xA0000007
+    __slots__ = ()
+
+# Same layout; TargetAnsi / TargetUnicode hold the application identifier (DarwinDataAnsi / DarwinDataUnicode)
+class _DarwinDataBlock(_EnvironmentVariableDataBlock):
+    BlockSignature = 0xA0000006
+    __slots__ = ()
+
+class _ConsoleDataBlock:
+    BlockSignature = 0xA0000002
+    _STRUCT = struct.Struct("<IIHHhhhhhhIIIII64sIIIIIIII16I")
+
+    # Data
+    __slots__ = (
+        "FillAttributes", # 2 bytes; foreground and background text colors
+        "PopupFillAttributes", # 2 bytes; colors of the console window popup
+        "ScreenBufferSizeX",
+        "ScreenBufferSizeY",
+        "WindowSizeX",
+        "WindowSizeY",
+        "WindowOriginX",
+        "WindowOriginY",
+        "Unused1",
+        "Unused2",
+        "FontSize",
+        "FontFamily",
+        "FontWeight",
+        "FaceName", # 64 bytes; unicode font face name
+        "CursorSize", # percentage of the character cell
+        "FullScreen",
+        "QuickEdit",
+        "InsertMode",
+        "AutoPosition",
+        "HistoryBufferSize",
+        "NumberOfHistoryBuffers",
+        "HistoryNoDup",
+        "ColorTable", # list of 16 RGB values
+    )
+
+    def __init__(self, contents: bytes = None, offset: int = 0):
+        values = self._STRUCT.unpack_from(contents, offset) if contents != None else (self._STRUCT.size, self.BlockSignature) + (0,) * 13 + (b"",) + (0,) * 24
+        (
+            self.FillAttributes,
+            self.PopupFillAttributes,
+            self.ScreenBufferSizeX,
+            self.ScreenBufferSizeY,
+            self.WindowSizeX,
+            self.WindowSizeY,
+            self.WindowOriginX,
+            self.WindowOriginY,
+            self.Unused1,
+            self.Unused2,
+            self.FontSize,
+            self.FontFamily,
+            self.FontWeight,
+            faceName,
+            self.CursorSize,
+            self.FullScreen,
+            self.QuickEdit,
+            self.InsertMode,
+            self.AutoPosition,
+            self.HistoryBufferSize,
+            self.NumberOfHistoryBuffers,
+            self.HistoryNoDup
+        ) = values[2:24]
+        self.FaceName = getStringUtf16Le(faceName, 0, 32) if len(faceName) != 0 else ""
+        self.ColorTable = list(values[24:])
+
+    def pack(self):
+        return self._STRUCT.pack(
+            self._STRUCT.size,
+            self.BlockSignature,
+            self.FillAttributes,
+            self.PopupFillAttributes,
+            self.ScreenBufferSizeX,
+            self.ScreenBufferSizeY,
+            self.WindowSizeX,
+            self.WindowSizeY,
+            self.WindowOriginX,
+            self.WindowOriginY,
+            self.Unused1,
+            self.Unused2,
+            self.FontSize,
+            self.FontFamily,
+            self.FontWeight,
+            packStringUtf16Le(self.FaceName)[:62],
+            self.CursorSize,
+            self.FullScreen,
+            self.QuickEdit,
+            self.InsertMode,
+            self.AutoPosition,
+            self.HistoryBufferSize,
+            self.NumberOfHistoryBuffers,
+            self.HistoryNoDup,
+            *self.ColorTable
+            )
+
+class _TrackerDataBlock:
+    BlockSignature = 0xA0000003
+    _STRUCT = struct.Struct("<IIII16s16s16s16s16s")
+
+    # Data
+    __slots__ = (
+        "Length", # 4 bytes; 0x58
+        "Version", # 4 bytes; 0
+        "MachineID", # 16 bytes; NULL-terminated NetBIOS name of the machine where the link target was last known to reside
+        "DroidVolumeId", # 16 bytes; GUID, Droid part 1
+        "DroidFileId", # 16 bytes; GUID, Droid part 2
+        "BirthDroidVolumeId", # 16 bytes; GUID, DroidBirth part 1
+        "BirthDroidFileId", # 16 bytes; GUID, DroidBirth part 2
+    )
+
+    def __init__(self, contents: bytes = None, offset: int = 0):
+        self.Length = 0x58
+        self.Version = 0
+        self.MachineID = ""
+        self.DroidVolumeId = bytes(16)
+        self.DroidFileId = bytes(16)
+        self.BirthDroidVolumeId = bytes(16)
+        self.BirthDroidFileId = bytes(16)
+        if contents != None:
+            (
+                blockSize,
+                blockSignature,
+                self.Length,
+                self.Version,
+                machineId,
+                self.DroidVolumeId,
+                self.DroidFileId,
+                self.BirthDroidVolumeId,
+                self.BirthDroidFileId
+            ) = self._STRUCT.unpack_from(contents, offset)
+            self.MachineID = getStringUtf8(machineId, 0, 16)
+
+    def pack(self):
+        return self._STRUCT.pack(
+            self._STRUCT.size,
+            self.BlockSignature,
+            self.Length,
+            self.Version,
+            packStringUtf8(self.MachineID)[:15],
+            self.DroidVolumeId,
+            self.DroidFileId,
+            self.BirthDroidVolumeId,
+            self.BirthDroidFileId
+            )
+
+class _ConsoleFEDataBlock:
+    BlockSignature = 0xA0000004
+    _STRUCT = struct.Struct("<III")
+
+    # Data
+    __slots__ = (
+        "CodePage", # 4 bytes; code page used for displaying text in the console
+    )
+
+    def __init__(self, contents: bytes = None, offset: int = 0):
+        self.CodePage = self._STRUCT.unpack_from(contents, offset)[2] if contents != None else 0
+
+    def pack(self):
+        return self._STRUCT.pack(self._STRUCT.size, self.BlockSignature, self.CodePage)
+
+class _SpecialFolderDataBlock:
+    BlockSignature = 0xA0000005
+    _STRUCT = struct.Struct("<IIII")
+
+    # Data
+    __slots__ = (
+        "SpecialFolderID", # 4 bytes; CSIDL of the folder
+        "Offset", # 4 bytes; offset into the LinkTargetIDList of the first child segment of the folder
+    )
+
+    def __init__(self, contents: bytes = None, offset: int = 0):
+        self.SpecialFolderID = 0
+        self.Offset = 0
+        if contents != None:
+            blockSize, blockSignature, self.SpecialFolderID, self.Offset = self._STRUCT.unpack_from(contents, offset)
+
+    def pack(self):
+        return self._STRUCT.pack(self._STRUCT.size, self.BlockSignature, self.SpecialFolderID, self.Offset)
+
+class _KnownFolderDataBlock:
+    BlockSignature = 0xA000000B
+    _STRUCT = struct.Struct("<II16sI")
+
+    # Data
+    __slots__ = (
+        "KnownFolderID", # 16 bytes; GUID of the known folder
+        "Offset", # 4 bytes; offset into the LinkTargetIDList of the first child segment of the folder
+    )
+
+    def __init__(self, contents: bytes = None, offset: int = 0):
+        self.KnownFolderID = bytes(16)
+        self.Offset = 0
+        if contents != None:
+            blockSize, blockSignature, self.KnownFolderID, self.Offset = self._STRUCT.unpack_from(contents, offset)
+
+    def pack(self):
+        return self._STRUCT.pack(self._STRUCT.size, self.BlockSignature, self.KnownFolderID, self.Offset)
+
+class _ShimDataBlock:
+    BlockSignature = 0xA0000008
+
+    # Data
+    __slots__ = (
+        "LayerName", # unicode name of the shim layer; the block is at least 0x88 bytes
+    )
+
+    def __init__(self, contents: bytes = None, offset: int = 0):
+        self.LayerName = ""
+        if contents != None:
+            blockSize = getUint(contents, offset)
+            self.LayerName = getStringUtf16Le(contents, offset + 8, (blockSize - 8) // 2)
+
+    def pack(self):
+        layerName = packStringUtf16Le(self.LayerName).ljust(0x80, b"\x00")
+        return struct.pack("<II", 8 + len(layerName), self.BlockSignature) + layerName
+
+class _VistaAndAboveIDListDataBlock:
+    BlockSignature = 0xA000000C
+
+    # Data
+    __slots__ = (
+        "itemIdDatas", # list[bytes]; alternate IDList, same form as _LinkTargetIDList.itemIdDatas
+    )
+
+    def __init__(self, contents: bytes = None, offset: int = 0):
+        self.itemIdDatas = []
+        if contents != None:
+            end = offset + getUint(contents, offset)
+            itemIdOffset = offset + 8
+            while itemIdOffset + 2 <= end:
+                itemIdSize = getUshort(contents, itemIdOffset)
+                if itemIdSize < 2:
+                    break
+                self.itemIdDatas.append(bytes(contents[itemIdOffset + 2:itemIdOffset + itemIdSize]))
+                itemIdOffset += itemIdSize
+
+    def pack(self):
+        idList = b"".join(packUshort(2 + len(itemIdData)) + itemIdData for itemIdData in self.itemIdDatas) + b"\x00\x00" # TerminalID
+        return struct.pack("<II", 8 + len(idList), self.BlockSignature) + idList
+
+# Well-known property keys, name -> (FormatID, PropertyID); see propkey.h
+_PROPERTY_KEYS = {
+    "System.ItemFolderNameDisplay": ("B725F130-47EF-101A-A5F1-02608C9EEBAC", 2),
+    "System.ItemTypeText": ("B725F130-47EF-101A-A5F1-02608C9EEBAC", 4),
+    "System.ItemNameDisplay": ("B725F130-47EF-101A-A5F1-02608C9EEBAC", 10),
+    "System.Size": ("B725F130-47EF-101A-A5F1-02608C9EEBAC", 12),
+    "System.FileAttributes": ("B725F130-47EF-101A-A5F1-02608C9EEBAC", 13),
+    "System.DateModified": ("B725F130-47EF-101A-A5F1-02608C9EEBAC", 14),
+    "System.DateCreated": ("B725F130-47EF-101A-A5F1-02608C9EEBAC", 15),
+    "System.DateAccessed": ("B725F130-47EF-101A-A5F1-02608C9EEBAC", 16),
+    "System.Title": ("F29F85E0-4FF9-1068-AB91-08002B27B3D9", 2),
+    "System.ItemType": ("28636AA6-953D-11D2-B5D6-00C04FD918D0", 11),
+    "System.ParsingPath": ("28636AA6-953D-11D2-B5D6-00C04FD918D0", 30),
+    "System.VolumeId": ("446D16B1-8DAD-4870-A748-402EA43D788C", 104),
+    "System.Link.TargetParsingPath": ("B9B4B3FC-2B51-4A42-B5D8-324146AFCF25", 2),
+    "System.Link.TargetSFGAOFlags": ("B9B4B3FC-2B51-4A42-B5D8-324146AFCF25", 8),
+    "System.Link.TargetExtension": ("7A7D76F4-B630-4BD7-95FF-37CC51A975C9", 2),
+    "System.Link.Arguments": ("436F2667-14E2-4FEB-B30A-146C53B5B674", 100),
+    "System.AppUserModel.RelaunchCommand": ("9F4C2855-9F79-4B39-A8D0-E1D42DE1D5F3", 2),
+    "System.AppUserModel.RelaunchIconResource": ("9F4C2855-9F79-4B39-A8D0-E1D42DE1D5F3", 3),
+    "System.AppUserModel.RelaunchDisplayNameResource": ("9F4C2855-9F79-4B39-A8D0-E1D42DE1D5F3", 4),
+    "System.AppUserModel.ID": ("9F4C2855-9F79-4B39-A8D0-E1D42DE1D5F3", 5),
+}
+
+# name -> (FormatID as stored, PropertyID), prebuilt so lookups never touch uuid
+_PROPERTY_KEY_IDS = {name: (uuid.UUID(formatId).bytes_le, propertyId) for name, (formatId, propertyId) in _PROPERTY_KEYS.items()}
+
+# Storages with this FormatID hold string-named values; every other storage holds integer-named ones
+_PROPERTY_STORAGE_NAMED_FORMAT_ID = uuid.UUID("D5CDD505-2E9C-101B-9397-08002B2CF9AE").bytes_le
+
+# (FormatID as stored, PropertyID or Name) for a property name like "System.Link.TargetParsingPath", or a
+# (FormatID, PropertyID or Name) pair, FormatID being a GUID string or the 16 stored bytes
+def _propertyKey(key):
+    if isinstance(key, str):
+        propertyKey = _PROPERTY_KEY_IDS.get(key)
+        if propertyKey == None:
+            raise ValueError(f"Unknown property: {key}")
+        return propertyKey
+
+    formatId, propertyId = key
+    if isinstance(formatId, str):
+        formatId = uuid.UUID(formatId).bytes_le
+    return (bytes(formatId), propertyId)
+
+# VARTYPE -> struct of a fixed-size TypedPropertyValue, [MS-OLEPS] 2.15; VT_BOOL, VT_CLSID and the strings are handled apart
+_PROPERTY_VALUE_STRUCTS = {
+    0x0002: struct.Struct("<h"), # VT_I2
+    0x0003: struct.Struct("<i"), # VT_I4
+    0x0004: struct.Struct("<f"), # VT_R4
+    0x0005: struct.Struct("<d"), # VT_R8
+    0x0006: struct.Struct("<q"), # VT_CY; currency, in units of 1/10000
+    0x0007: struct.Struct("<d"), # VT_DATE; OLE automation date
+    0x000A: struct.Struct("<I"), # VT_ERROR; HRESULT
+    0x0010: struct.Struct("<b"), # VT_I1
+    0x0011: struct.Struct("<B"), # VT_UI1
+    0x0012: struct.Struct("<H"), # VT_UI2
+    0x0013: struct.Struct("<I"), # VT_UI4
+    0x0014: struct.Struct("<q"), # VT_I8
+    0x0015: struct.Struct("<Q"), # VT_UI8
+    0x0016: struct.Struct("<i"), # VT_INT
+    0x0017: struct.Struct("<I"), # VT_UINT
+    0x0040: struct.Struct("<Q"), # VT_FILETIME; kept as the raw FILETIME, see filetimeToUtcSeconds
+}
+
+# One value of type vtType at offset; returns (value, offset just past it, padded to 4 for the variable-size types)
+def _decodePropertyScalar(vtType: int, contents: bytes, offset: int):
+    valueStruct = _PROPERTY_VALUE_STRUCTS.get(vtType)
+    if valueStruct != None:
+        return (valueStruct.unpack_from(contents, offset)[0], offset + valueStruct.size)
+
+    if vtType == 0x000B: # VT_BOOL; VARIANT_TRUE is 0xFFFF
+        return (getUshort(contents, offset) != 0, offset + 2)
+    if vtType == 0x0048: # VT_CLSID
+        return (bytes(contents[offset:offset + 16]), offset + 16)
+    if vtType in (0x0008, 0x001E): # VT_BSTR, VT_LPSTR; CodePageString, Size counts the NULL
+        size = getUint(contents, offset)
+        value = str(contents[offset + 4:offset + 4 + size], "utf-8").rstrip("\x00")
+        return (value, offset + 4 + ((size + 3) & ~3))
+    if vtType == 0x001F: # VT_LPWSTR; UnicodeString, Length in characters, NULL included
+        size = getUint(contents, offset) * 2
+        value = str(contents[offset + 4:offset + 4 + size], "utf-16le").rstrip("\x00")
+        return (value, offset + 4 + ((size + 3) & ~3))
+    if vtType == 0x0041: # VT_BLOB
+        size = getUint(contents, offset)
+        return (bytes(contents[offset + 4:offset + 4 + size]), offset + 4 + ((size + 3) & ~3))
+    raise _UnsupportedPropertyType(f"Unsupported property type: {vtType:#06x}")
+
+class _UnsupportedPropertyType(ValueError):
+    pass
+
+# TypedPropertyValue (Type, 2 bytes of padding, Value) between offset and end; VT_VECTOR values come back as lists,
+# VT_EMPTY / VT_NULL as None, and types without a decoder as the raw Value bytes
+# A malformed Value comes back as raw bytes too, or in strict mode raises LNKParseError
+def _decodeTypedPropertyValue(contents: bytes, offset: int, end: int, strict: bool = False):
+    vtType = getUshort(contents, offset)
+    offset += 4
+    try:
+        if vtType in (0x0000, 0x0001): # VT_EMPTY, VT_NULL
+            return None
+        if vtType & 0x1000: # VT_VECTOR; Length, then the elements
+            values = []
+            elementOffset = offset + 4
+            for i in range(getUint(contents, offset)):
+                value, elementOffset = _decodePropertyScalar(vtType & 0x0FFF, contents, elementOffset)
+                values.append(value)
+            return values
+        return _decodePropertyScalar(vtType, contents, offset)[0]
+    except _UnsupportedPropertyType:
+        return bytes(contents[offset:end])
+    except (struct.error, IndexError, UnicodeDecodeError, ValueError) as e:
+        if strict:
+            raise LNKParseError(f"PropertyStoreDataBlock value of type {vtType:#06x}: {_describeError(e)}", "extraData") from e
+        return bytes(contents[offset:end])
+
+"""
+PROPERTY_STORE = *SERIALIZED_PROPERTY_STORAGE TERMINAL ([MS-PROPSTORE] 2.2)
+
+Indexed in two levels, each on first need: storages by FormatID, then the values of one storage by PropertyID (or
+Name); a value is decoded the first time it is asked for. Storages and values never asked about are only skipped over.
+"""
+class _PropertyStore:
+    # Data
+    __slots__ = (
+        "contents", # bytes; the serialized property storages, TerminalStorage included
+        "storageSpans", # {FormatID: (offset of its first value, end)}, or None until first needed
+        "valueSpans", # {FormatID: {PropertyID or Name: (offset of its TypedPropertyValue, end)}}, per storage indexed so far
+        "values", # {(FormatID, PropertyID or Name): decoded value}
+        "strict", # bool; malformed values raise LNKParseError instead of coming back as raw bytes
+    )
+
+    def __init__(self, contents: bytes = b""):
+        self.contents = bytes(contents)
+        self.storageSpans = None
+        self.valueSpans = {}
+        self.values = {}
+        self.strict = False
+
+    def _indexStorages(self):
+        contents = self.contents
+        storageSpans = {}
+        offset = 0
+        while offset + 24 <= len(contents):
+            storageSize = getUint(contents, offset) # StorageSize; 0 is the TerminalStorage
+            if storageSize < 24 or offset + storageSize > len(contents):
+                break
+            storageSpans.setdefault(contents[offset + 8:offset + 24], (offset + 24, offset + storageSize))
+            offset += storageSize
+        self.storageSpans = storageSpans
+        return storageSpans
+
+    def _indexValues(self, formatId: bytes):
+        storageSpans = self.storageSpans if self.storageSpans != None else self._indexStorages()
+        valueSpans = {}
+        if formatId in storageSpans:
+            contents = self.contents
+            isNamed = formatId == _PROPERTY_STORAGE_NAMED_FORMAT_ID
+            offset, end = storageSpans[formatId]
+            while offset + 9 <= end:
+                valueSize = getUint(contents, offset) # ValueSize; 0 ends the storage
+                if valueSize < 9 or offset + valueSize > end:
+                    break
+                if isNamed:
+                    nameSize = getUint(contents, offset + 4)
+                    name = str(contents[offset + 9:offset + 9 + nameSize], "utf-16le").rstrip("\x00")
+                    valueSpans.setdefault(name, (offset + 9 + nameSize, offset + valueSize))
+                else:
+                    valueSpans.setdefault(getUint(contents, offset + 4), (offset + 9, offset + valueSize))
+                offset += valueSize
+        self.valueSpans[formatId] = valueSpans
+        return valueSpans
+
+    # FormatIDs of the storages, as stored
+    def formatIds(self):
+        return list(self.storageSpans if self.storageSpans != None else self._indexStorages())
+
+    # (FormatID, PropertyID or Name) of every value, in file order; indexes every storage
+    def keys(self):
+        return [(formatId, propertyId) for formatId in self.formatIds() for propertyId in self._storageValueSpans(formatId)]
+
+    def _storageValueSpans(self, formatId: bytes):
+        valueSpans = self.valueSpans.get(formatId)
+        return valueSpans if valueSpans != None else self._indexValues(formatId)
+
+    # Decoded value of key (see _propertyKey), or default when the store has no such property
+    def getValue(self, key, default = None):
+        formatId, propertyId = _propertyKey(key)
+        values = self.values
+        if (formatId, propertyId) in values:
+            return values[(formatId, propertyId)]
+
+        span = self._storageValueSpans(formatId).get(propertyId)
+        if span == None:
+            return default
+        value = _decodeTypedPropertyValue(self.contents, span[0], span[1], self.strict)
+        values[(formatId, propertyId)] = value
+        return value
+
+class _PropertyStoreDataBlock:
+    BlockSignature = 0xA0000009
+
+    # Data
+    __slots__ = (
+        "propertyStore", # _PropertyStore; read-only, written back exactly as parsed
+    )
+
+    def __init__(self, contents: bytes = None, offset: int = 0):
+        self.propertyStore = _PropertyStore(b"\x00\x00\x00\x00") # TerminalStorage only
+        if contents != None:
+            self.propertyStore = _PropertyStore(contents[offset + 8:offset + getUint(contents, offset)])
+
+    def getValue(self, key, default = None):
+        return self.propertyStore.getValue(key, default)
+
+    def pack(self):
+        return struct.pack("<II", 8 + len(self.propertyStore.contents), self.BlockSignature) + self.propertyStore.contents
+
+# BlockSignature -> decoder; anything else is an _ExtraDataBlock
+_EXTRA_DATA_BLOCKS = {
+    blockClass.BlockSignature: blockClass
+    for blockClass in (
+        _EnvironmentVariableDataBlock, _ConsoleDataBlock, _TrackerDataBlock, _ConsoleFEDataBlock, _SpecialFolderDataBlock,
+        _DarwinDataBlock, _IconEnvironmentDataBlock, _ShimDataBlock, _PropertyStoreDataBlock, _KnownFolderDataBlock, _VistaAndAboveIDListDataBlock
+        )
+}
+
+# Block name, as in [MS-SHLLINK], -> BlockSignature
+_EXTRA_DATA_BLOCK_SIGNATURES = {
+    "EnvironmentVariableDataBlock": 0xA0000001,
+    "ConsoleDataBlock": 0xA0000002,
+    "TrackerDataBlock": 0xA0000003,
+    "ConsoleFEDataBlock": 0xA0000004,
+    "SpecialFolderDataBlock": 0xA0000005,
+    "DarwinDataBlock": 0xA0000006,
+    "IconEnvironmentDataBlock": 0xA0000007,
+    "ShimDataBlock": 0xA0000008,
+    "PropertyStoreDataBlock": 0xA0000009,
+    "KnownFolderDataBlock": 0xA000000B,
+    "VistaAndAboveIDListDataBlock": 0xA000000C,
+}
+
+# One block of an ExtraData, in file order
+class _ExtraDataEntry:
+    # Data
+    __slots__ = (
+        "signature", # BlockSignature
+        "offset", # offset in the ExtraData's contents, or None for a block added by setBlock
+        "block", # decoded block, or None until asked for
+        "packedWhenDecoded", # block.pack() when it was decoded from contents, or None for an added block
+    )
+
+    def __init__(self, signature: int, offset: int = None, block = None):
+        self.signature = signature
+        self.offset = offset
+        self.block = block
+        self.packedWhenDecoded = None
+
+"""
+EXTRA_DATA = *EXTRA_DATA_BLOCK TERMINAL_BLOCK
+
+The BlockSize / BlockSignature chain is walked once, into entries; a block is decoded only when asked for through
+getBlock. pack() writes blocks nobody changed as the exact bytes they were parsed from, duplicates and unknown
+signatures included. A block too small to hold its signature (BlockSize 4 to 7) ends the walk: it and everything after
+it are kept as an opaque tail, written back as they are (and rejected in strict mode).
+"""
+class _ExtraData:
+    # Data
+    __slots__ = (
+        "contents", # bytes; the ExtraData as parsed, TerminalBlock included
+        "entries", # _ExtraDataEntry of every block, in file order; [MS-SHLLINK] 2.5 allows a signature once, but a duplicate is kept as it is
+        "offset", # offset of the ExtraData in the source buffer, for strict mode's errors
+        "strict", # bool; blocks that fail to decode raise LNKParseError, as the eagerly decoded sections do
+        "tail", # bytes after the last indexed block: the TerminalBlock, or everything from a malformed block on
+    )
+
+    TERMINAL_BLOCK_SIZE = 4 # A BlockSize below this is the TerminalBlock
+    MIN_BLOCK_SIZE = 8 # BlockSize + BlockSignature; a BlockSize from TERMINAL_BLOCK_SIZE up to this is malformed
+
+    # Size of the ExtraData at offset: whole blocks up to and including the TerminalBlock
+    # maxBlocks: stop after that many blocks and one more, enough for strict mode to tell the limit was passed
+    @staticmethod
+    def measure(offset: int, contents: bytes, maxBlocks: int = -1):
+        size = 0
+        count = 0
+        available = len(contents) - offset
+        while size + 4 <= available and (maxBlocks < 0 or count <= maxBlocks):
+            blockSize = getUint(contents, offset + size)
+            if blockSize < _ExtraData.TERMINAL_BLOCK_SIZE:
+                return size + 4
+            if size + blockSize > available:
+                break # Truncated block; stop at the last whole one
+            size += blockSize
+            count += 1
+        return size
+
+    def __init__(self, offset: int, contents: bytes):
+        self.contents = b""
+        self.entries = []
+        self.offset = offset
+        self.strict = False
+        self.tail = b"\x00\x00\x00\x00" # TerminalBlock
+        if offset != 0 and contents != None:
+            size = _ExtraData.measure(offset, contents)
+            if size <= 4:
+                return # TerminalBlock only; pack() always writes one
+
+            self.contents = bytes(contents[offset:offset + size])
+
+            blockOffset = 0
+            while blockOffset + _ExtraData.MIN_BLOCK_SIZE <= size:
+                blockSize = getUint(self.contents, blockOffset)
+                if blockSize < _ExtraData.MIN_BLOCK_SIZE:
+                    break # The TerminalBlock, or a malformed block
+                self.entries.append(_ExtraDataEntry(getUint(self.contents, blockOffset + 4), blockOffset))
+                blockOffset += blockSize
+            if blockOffset < size:
+                self.tail = self.contents[blockOffset:]
+
+    @staticmethod
+    def _signature(signature):
+        return _EXTRA_DATA_BLOCK_SIGNATURES[signature] if isinstance(signature, str) else signature
+
+    def _decodeEntry(self, entry: _ExtraDataEntry):
+        if entry.block == None:
+            blockClass = _EXTRA_DATA_BLOCKS.get(entry.signature, _ExtraDataBlock)
+            try:
+                block = blockClass(self.contents, entry.offset)
+            except (struct.error, IndexError, UnicodeDecodeError, ValueError) as e:
+                if not self.strict or isinstance(e, LNKParseError):
+                    raise
+                raise LNKParseError(f"{blockClass.__name__.lstrip('_')}: {_describeError(e)}", "extraData", self.offset + entry.offset) from e
+            if isinstance(block, _PropertyStoreDataBlock):
+                block.propertyStore.strict = self.strict
+            entry.packedWhenDecoded = block.pack()
+            entry.block = block
+        return entry.block
+
+    # Decoded block by BlockSignature or name (e.g. "TrackerDataBlock"), or None when the link has no such block;
+    # the first one, should the link hold several
+    def getBlock(self, signature):
+        signature = _ExtraData._signature(signature)
+        for entry in self.entries:
+            if entry.signature == signature:
+                return self._decodeEntry(entry)
+        return None
+
+    # Every block, decoded, in file order
+    def getBlocks(self):
+        return [self._decodeEntry(entry) for entry in self.entries]
+
+    # Add a block, or replace the (first) block with its signature
+    def setBlock(self, block):
+        for index, entry in enumerate(self.entries):
+            if entry.signature == block.BlockSignature:
+                self.entries[index] = _ExtraDataEntry(block.BlockSignature, None, block)
+                return
+        self.entries.append(_ExtraDataEntry(block.BlockSignature, None, block))
+
+    # Remove every block with the signature
+    def removeBlock(self, signature):
+        signature = _ExtraData._signature(signature)
+        self.entries = [entry for entry in self.entries if entry.signature != signature]
+
+    # Merely decoding a block leaves the state unchanged; only blocks that no longer pack as they did count
+    def _snapshot(self):
+        state = []
+        for entry in self.entries:
+            packed = entry.block.pack() if entry.block != None else None
+            state.append((entry.signature, entry.offset, packed if packed != entry.packedWhenDecoded else None))
+        return tuple(state)
+
+    # Each block's bytes, in file order, then the tail; decoded blocks that still pack as they did when decoded are written as parsed
+    def _packLayout(self):
+        layout = []
+        for entry in self.entries:
+            packed = entry.block.pack() if entry.block != None else None
+            if entry.offset != None and (packed == None or packed == entry.packedWhenDecoded):
+                layout.append(memoryview(self.contents)[entry.offset:entry.offset + getUint(self.contents, entry.offset)])
+            else:
+                layout.append(packed)
+        layout.append(self.tail)
+        return layout
+
+    def packedSize(self, layout = None):
+        if layout == None:
+            layout = self._packLayout()
+        return sum(map(len, layout))
+
+    def packInto(self, contents: bytearray, offset: int = 0, layout = None):
+        for part in (layout if layout != None else self._packLayout()):
+            offset = packBytesInto(contents, offset, part)
+        return offset
+
+    def pack(self):
+        layout = self._packLayout()
+        contents = bytearray(self.packedSize(layout))
+        self.packInto(contents, 0, layout)
+        return bytes(contents)
 
 
 
 # SUB-STRUCTURES CLASSES END
 # ----------------------------------------------------------------------------------
 
+
+
+# ----------------------------------------------------------------------------------
+# STRICT MODE
+
+# Malformed or over-limit input, raised in strict mode; section and offset say where (offset in the source buffer)
+class LNKParseError(ValueError):
+    def __init__(self, reason: str, section: str = None, offset: int = None):
+        self.reason = reason
+        self.section = section
+        self.offset = offset
+        message = reason if section == None else f"{section}: {reason}"
+        super().__init__(message if offset == None else f"{message} (offset {offset})")
+
+# Limits of strict mode, see LNK(limits=...); every count and size read from the file is checked against them or
+# against the buffer before it is used, so a crafted file costs at most this much
+class LNKLimits:
+    __slots__ = (
+        "maxFileSize", # bytes; larger files are refused before they are read
+        "maxItemIds", # ItemIDs in the LinkTargetIDList
+        "maxExtraDataBlocks", # blocks in the ExtraData
+        "timeout", # seconds per file; enforced by scan() where the platform has interval timers, else None
+    )
+
+    def __init__(self, maxFileSize: int = 4 * 1024 * 1024, maxItemIds: int = 256, maxExtraDataBlocks: int = 64, timeout: float = None):
+        self.maxFileSize = maxFileSize
+        self.maxItemIds = maxItemIds
+        self.maxExtraDataBlocks = maxExtraDataBlocks
+        self.timeout = timeout
+
+# Raise LNKParseError in this thread once timeout seconds have passed; a no-op without a timeout, off the main
+# thread, or on platforms without setitimer (Windows), where the size and count limits alone bound the work
+@contextlib.contextmanager
+def _timeBudget(timeout: float = None):
+    if timeout == None or not hasattr(signal, "setitimer") or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def expire(signalNumber, frame):
+        raise LNKParseError(f"time budget of {timeout} s exceeded")
+
+    previousHandler = signal.signal(signal.SIGALRM, expire)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previousHandler)
+
+# STRICT MODE END
+# ----------------------------------------------------------------------------------
+
+
+
+# ----------------------------------------------------------------------------------
+# INSTRUMENTATION
+
+# Totals for one (operation, section) pair of an LNKMetrics registry
+class LNKMetricsEntry:
+    __slots__ = (
+        "count", # times recorded
+        "nanoseconds", # total wall time
+        "maxNanoseconds", # slowest single time
+        "bytes", # total bytes read, decoded or written
+        "allocatedBlocks", # total net change in the interpreter's allocated memory blocks (sys.getallocatedblocks)
+    )
+
+    def __init__(self):
+        self.count = 0
+        self.nanoseconds = 0
+        self.maxNanoseconds = 0
+        self.bytes = 0
+        self.allocatedBlocks = 0
+
+    def add(self, nanoseconds: int, size: int, allocatedBlocks: int):
+        self.count += 1
+        self.nanoseconds += nanoseconds
+        self.maxNanoseconds = max(self.maxNanoseconds, nanoseconds)
+        self.bytes += size
+        self.allocatedBlocks += allocatedBlocks
+
+    def toDict(self):
+        return {name: getattr(self, name) for name in LNKMetricsEntry.__slots__}
+
+"""
+Registry of per-section timings, sizes and allocations, filled in while it is enabled:
+  ("read", "file"): reading a file in LNK(path) and the batch functions
+  ("parse", "shellLinkHeader"); ("locate", "sections"): finding every other section's span from the size fields
+  ("parse", section): lazily decoding a section
+  ("pack", section): serializing a section; ("copy", section): copying a clean one from the source or the pack cache
+Process pools (scan(), extractProperties(), verify()) enable a registry in each worker and merge it back into the
+enabled one. Allocation counts are process-wide, so with several threads parsing at once they include each other's.
+When no registry is enabled, instrumented code pays one global lookup and comparison per section.
+"""
+class LNKMetrics:
+    def __init__(self):
+        self.entries = {} # (operation, section) -> LNKMetricsEntry
+        self._lock = threading.Lock()
+        self._previous = [] # Registries enabled before this one, restored by __exit__
+
+    # Picklable, so worker processes can send theirs back
+    def __getstate__(self):
+        return self.entries
+
+    def __setstate__(self, entries):
+        self.entries = entries
+        self._lock = threading.Lock()
+        self._previous = []
+
+    # Make metrics (or a new registry) the one being recorded into; returns it
+    @staticmethod
+    def enable(metrics = None):
+        global _activeMetrics
+        _activeMetrics = metrics if metrics != None else LNKMetrics()
+        return _activeMetrics
+
+    # Stop recording; returns the registry that was enabled, if any
+    @staticmethod
+    def disable():
+        global _activeMetrics
+        metrics, _activeMetrics = _activeMetrics, None
+        return metrics
+
+    @staticmethod
+    def active():
+        return _activeMetrics
+
+    # with LNKMetrics() as metrics: ... records into metrics for the block only
+    def __enter__(self):
+        self._previous.append(_activeMetrics)
+        return LNKMetrics.enable(self)
+
+    def __exit__(self, exceptionType, exception, traceback):
+        global _activeMetrics
+        _activeMetrics = self._previous.pop()
+
+    # Finish a measurement begun with _startMeasure()
+    def record(self, operation: str, section: str, start: tuple, size: int = 0):
+        nanoseconds = time.perf_counter_ns() - start[0]
+        allocatedBlocks = sys.getallocatedblocks() - start[1]
+        with self._lock:
+            entry = self.entries.get((operation, section))
+            if entry == None:
+                entry = self.entries[(operation, section)] = LNKMetricsEntry()
+            entry.add(nanoseconds, size, allocatedBlocks)
+
+    def get(self, operation: str, section: str):
+        return self.entries.get((operation, section))
+
+    # Combine with a registry filled elsewhere (a worker process, another run)
+    def merge(self, other):
+        with self._lock:
+            for key, otherEntry in other.entries.items():
+                entry = self.entries.get(key)
+                if entry == None:
+                    entry = self.entries[key] = LNKMetricsEntry()
+                entry.count += otherEntry.count
+                entry.nanoseconds += otherEntry.nanoseconds
+                entry.maxNanoseconds = max(entry.maxNanoseconds, otherEntry.maxNanoseconds)
+                entry.bytes += otherEntry.bytes
+                entry.allocatedBlocks += otherEntry.allocatedBlocks
+        return self
+
+    def reset(self):
+        with self._lock:
+            self.entries = {}
+
+    # {"operation/section": {count, nanoseconds, ...}}; JSON-serializable, for comparing runs
+    def toDict(self):
+        return {f"{operation}/{section}": entry.toDict() for (operation, section), entry in sorted(self.entries.items())}
+
+    # Text table, slowest total first
+    def summary(self):
+        totalNanoseconds = sum(entry.nanoseconds for entry in self.entries.values()) or 1
+        lines = [f"{'operation/section':<28} {'count':>10} {'total ms':>10} {'share':>6} {'mean us':>9} {'max us':>9} {'MB/s':>8} {'blocks/op':>9}"]
+        for (operation, section), entry in sorted(self.entries.items(), key = lambda item: -item[1].nanoseconds):
+            megabytesPerSecond = entry.bytes / entry.nanoseconds * 1e3 if entry.nanoseconds != 0 else 0.0
+            lines.append(
+                f"{operation + '/' + section:<28} {entry.count:>10,} {entry.nanoseconds / 1e6:>10.2f} {entry.nanoseconds / totalNanoseconds:>6.1%}"
+                f" {entry.nanoseconds / entry.count / 1e3:>9.2f} {entry.maxNanoseconds / 1e3:>9.2f} {megabytesPerSecond:>8.1f} {entry.allocatedBlocks / entry.count:>9.1f}"
+            )
+        return "\n".join(lines)
+
+# The registry being recorded into, or None; instrumented code checks this before measuring anything
+_activeMetrics = None
+
+# Opaque start of a measurement, for LNKMetrics.record()
+def _startMeasure():
+    return (time.perf_counter_ns(), sys.getallocatedblocks())
+
+# INSTRUMENTATION END
+# ----------------------------------------------------------------------------------
+
+
+# Held while a decoded section is published on its LNK and the LNK's decode bookkeeping updated; never while decoding
+_sectionLock = threading.Lock()
+
+# A section of LNK decoded on first access (see LNK._decodeSection) and then stored in the instance's __dict__, which
+# hides this non-data descriptor from then on. Unlike functools.cached_property it takes no lock of its own, so
+# decodes on different LNKs never wait on each other
+class _LazySection:
+    def __set_name__(self, owner, name: str):
+        self.name = name
+
+    def __get__(self, instance, owner = None):
+        if instance == None:
+            return self
+        return instance._decodeSection(self.name)
+
 """
 SHELL_LINK = SHELL_LINK_HEADER [LINKTARGET_IDLIST] [LINKINFO]
               [STRING_DATA] *EXTRA_DATA
@@ -799,77 +1997,1631 @@ SHELL_LINK = SHELL_LINK_HEADER [LINKTARGET_IDLIST] [LINKINFO]
 class LNK:
     # Data
     shellLinkHeader: _ShellLinkHeader = None
-    linkTargetIdList: _LinkTargetIDList = None
-    linkInfo: _LinkInfo = None
-    stringData: _StringData = None
+    totalSize: int = 0 # Bytes consumed from the source buffer
+    _contents = None # Source buffer, kept only while some section is still undecoded
+    _skippedSections = frozenset() # Sections excluded through fields=; never decoded
+    _sourceLinkFlags = 0 # LinkFlags as parsed; they decide how the source's sections are laid out
+    _limits = None # LNKLimits when parsed in strict mode
+
+    # Sections after the header; decoded on first access, see _decodeSection
+    SECTIONS = ("linkTargetIdList", "linkInfo", "stringData", "extraData")
+
+    # Columns of toRecord(), in output order; path and error are filled in by export()
+    RECORD_FIELDS = (
+        "path", "error",
+        "CreationTime", "AccessTime", "WriteTime", "FileSize", "IconIndex", "ShowCommand", "HotkeyFlags", "LinkFlags", "FileAttributes",
+        "TargetPath", "LocalBasePath", "CommonPathSuffix", "NetName", "DeviceName", "VolumeIdDriveType", "VolumeIdDriveSerialNumber", "VolumeIdData",
+        "NAME_STRING", "RELATIVE_PATH", "WORKING_DIR", "COMMAND_LINE_ARGUMENTS", "ICON_LOCATION",
+        "MachineID",
+    )
 
     # ----------------------------------------------------------------------------------
     # FUNCTIONS
 
     # Constructor
-    def __init__(self, lnkFilePath: str = None):
+    # limits: an LNKLimits to parse in strict mode; every section is then bounds-checked and decoded up front, and
+    # anything malformed raises LNKParseError
+    def __init__(self, lnkFilePath: str = None, useMmap: bool = False, fields = None, limits: LNKLimits = None):
         if lnkFilePath != None:
-            nextOffset = 0
             with open(lnkFilePath, "rb") as lnkFile:
-                contents = lnkFile.read()
-                self.shellLinkHeader = _ShellLinkHeader(
-                    contents=contents
-                    )
-                nextOffset += self.shellLinkHeader.HeaderSize
-                
-                if self.shellLinkHeader.HasLinkTargetIDList:
-                    self.linkTargetIdList = _LinkTargetIDList(
-                        offset = nextOffset,
-                        contents = contents
-                        )
-                    nextOffset += self.linkTargetIdList.totalSize
-                else:
-                    self.linkTargetIdList = _LinkTargetIDList(offset = 0, contents = None)
-
-                if self.shellLinkHeader.HasLinkInfo:
-                    self.linkInfo = _LinkInfo(
-                        offset = nextOffset,
-                        contents = contents
-                        )
-                    nextOffset += self.linkInfo.LinkInfoSize
+                if limits != None and os.fstat(lnkFile.fileno()).st_size > limits.maxFileSize:
+                    raise LNKParseError(f"file is larger than {limits.maxFileSize} bytes")
+                if useMmap:
+                    # Parse straight out of the page cache; values that outlive the map are copied out by the parsers
+                    with mmap.mmap(lnkFile.fileno(), 0, access=mmap.ACCESS_READ) as lnkFileMap:
+                        with memoryview(lnkFileMap) as contents:
+                            self._parse(contents, 0, fields, limits)
                 else:
-                    self.linkInfo = _LinkInfo(offset = 0, contents = None)
-
-                self.stringData = _StringData(
-                    shellLinkHeader = self.shellLinkHeader,
-                    offset = nextOffset,
-                    contents = contents
-                    )
-                nextOffset += self.stringData.sizeOfStringData
-                
-                # self.extraData TODO (not required; shortcut works without it)
+                    metrics = _activeMetrics
+                    if metrics != None:
+                        start = _startMeasure()
+                    contents = lnkFile.read()
+                    if metrics != None:
+                        metrics.record("read", "file", start, len(contents))
+                    self._parse(contents, 0, fields, limits)
 
         else:
             self.shellLinkHeader = _ShellLinkHeader()
             self.linkTargetIdList = _LinkTargetIDList(offset = 0, contents = None)
             self.linkInfo = _LinkInfo(offset = 0, contents = None)
             self.stringData = _StringData(shellLinkHeader=self.shellLinkHeader, offset = 0, contents = None)
+            self.extraData = _ExtraData(offset = 0, contents = None)
+            self._sectionSpans = {}
+            self._pendingSections = set()
+            self._packCache = {}
+
+    # Parse from a caller-supplied buffer (bytes, bytearray, memoryview, mmap) starting at offset, without copying it
+    @classmethod
+    def fromBytes(cls, buffer, offset: int = 0, fields = None, limits: LNKLimits = None):
+        lnk = cls.__new__(cls)
+        lnk._parse(buffer, offset, fields, limits)
+        return lnk
+
+    # Parse from a readable binary file object (ZIP member, email attachment, ...), from its current position to its end
+    @classmethod
+    def fromStream(cls, stream, fields = None, limits: LNKLimits = None):
+        contents = stream.read() if limits == None else stream.read(limits.maxFileSize + 1)
+        if not isinstance(contents, bytes):
+            contents = bytes(contents) # Owned bytes decode lazily; borrowed buffers are decoded up front
+        if limits != None and len(contents) > limits.maxFileSize:
+            raise LNKParseError(f"stream is larger than {limits.maxFileSize} bytes")
+        return cls.fromBytes(contents, 0, fields, limits)
+
+    # Rebuild from sections decoded earlier (see LNKCache); sections: {name: section}, the header included
+    # fields: as for LNK(); sections outside them are left out
+    # packed: {name: contents} of sections that pack() should copy rather than re-serialize while they are unchanged
+    @classmethod
+    def _fromSections(cls, sections: dict, totalSize: int, fields = None, packed = None):
+        lnk = cls.__new__(cls)
+        if fields != None:
+            lnk._skippedSections = frozenset(LNK.SECTIONS).difference(fields)
+        lnk.shellLinkHeader = sections["shellLinkHeader"]
+        lnk._sourceLinkFlags = lnk.shellLinkHeader.LinkFlags
+        lnk.totalSize = totalSize
+        for name in LNK.SECTIONS:
+            if name in sections and name not in lnk._skippedSections:
+                lnk.__dict__[name] = sections[name]
+        if "stringData" in lnk.__dict__:
+            lnk.stringData.shellLinkHeader = lnk.shellLinkHeader
+        lnk._sectionSpans = {}
+        lnk._pendingSections = set()
+        lnk._packCache = {}
+        for name, contents in (packed or {}).items():
+            if name == "shellLinkHeader" or name in lnk.__dict__:
+                lnk._packCache[name] = (getattr(lnk, name)._snapshot(), contents)
+        return lnk
+
+    # Decode the header and locate every other section from its size field; sections themselves are decoded lazily
+    # fields: section names (see SECTIONS) to keep; the rest are skipped entirely
+    def _parse(self, contents, offset: int = 0, fields = None, limits: LNKLimits = None):
+        if fields != None:
+            fields = set(fields)
+            fields.discard("shellLinkHeader")
+            if not fields.issubset(LNK.SECTIONS):
+                raise ValueError(f"Unknown LNK sections: {', '.join(sorted(fields.difference(LNK.SECTIONS)))}")
+            self._skippedSections = frozenset(LNK.SECTIONS).difference(fields)
+
+        self._limits = limits
+        if limits != None:
+            if len(contents) - offset > limits.maxFileSize:
+                raise LNKParseError(f"buffer is larger than {limits.maxFileSize} bytes")
+            if len(contents) - offset < _ShellLinkHeader.HEADER_SIZE:
+                raise LNKParseError("truncated", "shellLinkHeader", offset)
+
+        metrics = _activeMetrics
+        if metrics != None:
+            measureStart = _startMeasure()
+        nextOffset = offset
+        self.shellLinkHeader = _ShellLinkHeader(
+            contents = contents,
+            offset = nextOffset
+            )
+        nextOffset += self.shellLinkHeader.HeaderSize
+        if metrics != None:
+            metrics.record("parse", "shellLinkHeader", measureStart, nextOffset - offset)
+            measureStart = _startMeasure()
+        self._sourceLinkFlags = self.shellLinkHeader.LinkFlags
+
+        if limits != None and (self.shellLinkHeader.HeaderSize != _ShellLinkHeader.HEADER_SIZE or self.shellLinkHeader.LinkCLSID != _ShellLinkHeader.LINK_CLSID):
+            raise LNKParseError("bad HeaderSize or LinkCLSID", "shellLinkHeader", offset)
+
+        # (start, end) of each section in the source buffer
+        self._sectionSpans = {"shellLinkHeader": (offset, nextOffset)}
+        name = start = None # Section being located, for strict mode's errors
+        try:
+            if self.shellLinkHeader.HasLinkTargetIDList:
+                name, start = "linkTargetIdList", nextOffset
+                nextOffset += 2 + getUshort(contents, nextOffset) # IDListSize + IDList
+                self._sectionSpans[name] = (start, nextOffset)
+
+            if self.shellLinkHeader.HasLinkInfo:
+                name, start = "linkInfo", nextOffset
+                nextOffset += getUint(contents, nextOffset) # LinkInfoSize
+                self._sectionSpans[name] = (start, nextOffset)
+
+            name, start = "stringData", nextOffset
+            nextOffset += _StringData.measure(self.shellLinkHeader, nextOffset, contents)
+            self._sectionSpans[name] = (start, nextOffset)
+
+            name, start = "extraData", nextOffset
+            nextOffset += _ExtraData.measure(nextOffset, contents, limits.maxExtraDataBlocks if limits != None else -1)
+            self._sectionSpans[name] = (start, nextOffset)
+        except (struct.error, IndexError) as e:
+            if limits == None:
+                raise
+            raise LNKParseError("size field past the end of the buffer", name, start) from e
+
+        self.totalSize = nextOffset - offset
+
+        if limits != None:
+            self._checkSpans(contents, limits)
+        if metrics != None:
+            metrics.record("locate", "sections", measureStart, nextOffset - self._sectionSpans["shellLinkHeader"][1])
+
+        self._pendingSections = set(self._sectionSpans).difference(self._skippedSections, ("shellLinkHeader",))
+        self._contents = contents
+
+        # Packed form of each section as of its last parse or pack: {name: (snapshot, contents)}; contents None means
+        # "the section's span in the source buffer", and is turned into a copy of that span when the buffer is let go
+        self._packCache = {"shellLinkHeader": (self.shellLinkHeader._snapshot(), None)}
+
+        # A borrowed buffer (memoryview, mmap, bytearray) may be released or mutated by the caller; decode now
+        # Strict mode decodes now too, so whatever is malformed is reported by the constructor
+        if not isinstance(contents, bytes) or limits != None:
+            for name in list(self._pendingSections):
+                getattr(self, name)
+        if len(self._pendingSections) == 0:
+            self._releaseSource() # Nothing left to decode (fields=()); keep no reference to the buffer
+
+    # Let go of the source buffer; the sections in the pack cache keep a copy of their span of it, so pack() goes on
+    # copying them (reserved and non-canonical bytes included) for as long as they are left unchanged
+    def _releaseSource(self):
+        source = self._contents
+        packCache = {}
+        for cachedName, (snapshot, contents) in self._packCache.items():
+            if contents == None:
+                start, end = self._sectionSpans[cachedName]
+                contents = bytes(source[start:end])
+            packCache[cachedName] = (snapshot, contents)
+        self._packCache = packCache
+        self._contents = None
+        self._sectionSpans = {}
+
+    # Strict mode: every section span inside the buffer, and the counts the decoders will loop over within limits
+    def _checkSpans(self, contents, limits: LNKLimits):
+        for name, (start, end) in self._sectionSpans.items():
+            if end > len(contents):
+                raise LNKParseError(f"runs past the end of the buffer ({end} > {len(contents)})", name, start)
+
+        if "linkTargetIdList" in self._sectionSpans:
+            start, end = self._sectionSpans["linkTargetIdList"]
+            count = 0
+            itemIdOffset = start + 2
+            while itemIdOffset + 2 <= end:
+                itemIdSize = getUshort(contents, itemIdOffset)
+                if itemIdSize == 0:
+                    break
+                if itemIdSize < 2 or itemIdOffset + itemIdSize > end - 2:
+                    raise LNKParseError(f"bad ItemIDSize {itemIdSize}", "linkTargetIdList", itemIdOffset)
+                count += 1
+                if count > limits.maxItemIds:
+                    raise LNKParseError(f"more than {limits.maxItemIds} ItemIDs", "linkTargetIdList", start)
+                itemIdOffset += itemIdSize
+            if itemIdOffset + 2 != end:
+                raise LNKParseError("TerminalID is not at the end of the IDList", "linkTargetIdList", itemIdOffset)
+
+        if "linkInfo" in self._sectionSpans:
+            start, end = self._sectionSpans["linkInfo"]
+            if end - start < 0x1C:
+                raise LNKParseError(f"LinkInfoSize {end - start} is smaller than its header", "linkInfo", start)
+
+        start, end = self._sectionSpans["extraData"]
+        count = 0
+        blockOffset = start
+        while blockOffset + 4 <= end:
+            blockSize = getUint(contents, blockOffset)
+            if blockSize < _ExtraData.TERMINAL_BLOCK_SIZE:
+                break
+            if blockSize < _ExtraData.MIN_BLOCK_SIZE:
+                raise LNKParseError(f"BlockSize {blockSize} is too small for a block", "extraData", blockOffset)
+            count += 1
+            if count > limits.maxExtraDataBlocks:
+                raise LNKParseError(f"more than {limits.maxExtraDataBlocks} ExtraData blocks", "extraData", start)
+            blockOffset += blockSize
+        if blockOffset == end and blockOffset + 4 <= len(contents): # measure() stopped short of a block that does not fit
+            raise LNKParseError(f"BlockSize {getUint(contents, blockOffset)} runs past the end of the buffer", "extraData", blockOffset)
+
+    # Build one section from the source buffer; absent and skipped sections come back empty
+    # Safe to race from several threads on the same LNK: threads that decode the same section at once each build it,
+    # but only the first one published is kept and all of them return that one. The buffer is let go only once every
+    # pending section is published, so a thread that finds the buffer gone picks up the published section instead
+    # In strict mode the decoder sees the buffer cut at the section's end, so no read can stray into the next section
+    def _decodeSection(self, name: str):
+        sectionSpans = self._sectionSpans # Before the buffer; both are let go together, buffer first
+        source = self._contents
+        contents = source
+        offset = sectionSpans[name][0] if name in sectionSpans and name not in self._skippedSections else 0
+        if contents == None:
+            section = self.__dict__.get(name)
+            if section != None:
+                return section
+            offset = 0
+        elif self._limits != None and offset != 0:
+            contents = memoryview(contents)[:sectionSpans[name][1]]
+
+        metrics = _activeMetrics
+        if metrics != None:
+            start = _startMeasure()
+        try:
+            section = self._buildSection(name, offset, contents)
+        except (struct.error, IndexError, UnicodeDecodeError, ValueError) as e:
+            if self._limits == None or isinstance(e, LNKParseError):
+                raise
+            raise LNKParseError(f"{_describeError(e)}", name, offset) from e
+        if metrics != None:
+            metrics.record("parse", name, start, sectionSpans[name][1] - offset if offset != 0 else 0)
+
+        snapshot = section._snapshot() if offset != 0 else None
+        with _sectionLock:
+            published = self.__dict__.setdefault(name, section)
+            if published is section and name in self._pendingSections:
+                if snapshot != None:
+                    self._packCache[name] = (snapshot, None)
+                self._pendingSections.discard(name)
+                if len(self._pendingSections) == 0:
+                    self._releaseSource() # Everything decoded
+        return published
+
+    def _buildSection(self, name: str, offset: int, contents):
+        if name == "linkTargetIdList":
+            return _LinkTargetIDList(offset = offset, contents = contents)
+        if name == "linkInfo":
+            return _LinkInfo(offset = offset, contents = contents)
+        if name == "extraData":
+            extraData = _ExtraData(offset = offset, contents = contents)
+            extraData.strict = self._limits != None
+            return extraData
+
+        # The source's strings are laid out by the LinkFlags they were saved with, even if the header was edited since
+        shellLinkHeader = self.shellLinkHeader
+        if shellLinkHeader.LinkFlags != self._sourceLinkFlags:
+            shellLinkHeader = copy.copy(shellLinkHeader)
+            shellLinkHeader.LinkFlags = self._sourceLinkFlags
+        section = _StringData(shellLinkHeader = shellLinkHeader, offset = offset, contents = contents)
+        section.shellLinkHeader = self.shellLinkHeader
+        return section
+
+    linkTargetIdList: _LinkTargetIDList = _LazySection()
+    linkInfo: _LinkInfo = _LazySection()
+    stringData: _StringData = _LazySection()
+    extraData: _ExtraData = _LazySection()
+
+    # Names of the sections written by pack(), in file order; which ones are present is up to the header's LinkFlags
+    @staticmethod
+    def _packSectionNames(shellLinkHeader: _ShellLinkHeader):
+        names = ["shellLinkHeader"]
+        if shellLinkHeader.HasLinkTargetIDList:
+            names.append("linkTargetIdList")
+        if shellLinkHeader.HasLinkInfo:
+            names.append("linkInfo")
+        names.append("stringData")
+        names.append("extraData")
+        return names
+
+    # Sections written by pack(), in file order
+    def _packSections(self):
+        if len(self._skippedSections) != 0:
+            raise ValueError(f"Cannot pack a LNK parsed without {', '.join(sorted(self._skippedSections))}")
+
+        return [getattr(self, name) for name in LNK._packSectionNames(self.shellLinkHeader)]
+
+    # Packed bytes of a section that pack() can copy instead of re-serializing, or None
+    # Undecoded sections come straight from the source buffer; decoded ones from the pack cache, if unchanged since
+    def _cachedSectionContents(self, name: str):
+        sectionSpans = self._sectionSpans # Before the buffer; both are let go together, buffer first
+        source = self._contents
+        if name in self._pendingSections and source != None:
+            # StringData's layout follows LinkFlags; an edited header means decoding it and writing it out again
+            if name != "stringData" or self.shellLinkHeader.LinkFlags == self._sourceLinkFlags:
+                start, end = sectionSpans[name]
+                return memoryview(source)[start:end]
+
+        cached = self._packCache.get(name)
+        if cached == None or name in self._pendingSections:
+            return None
+
+        snapshot, contents = cached
+        if contents == None:
+            if source == None:
+                return None
+            start, end = sectionSpans[name]
+            contents = memoryview(source)[start:end]
+        return contents if getattr(self, name)._snapshot() == snapshot else None
+
+    # Names of the sections pack() will re-serialize rather than copy: edited since they were parsed or last packed,
+    # or built in memory
+    def dirtySections(self):
+        return [name for name in LNK._packSectionNames(self.shellLinkHeader) if self._cachedSectionContents(name) == None]
+
+    # Pack into one preallocated buffer (or contents, from offset); every section is sized first, then written in place
+    # Clean sections are copied from the source buffer or the pack cache; dirty ones are serialized and cached
+    def packInto(self, contents: bytearray = None, offset: int = 0):
+        if len(self._skippedSections) != 0:
+            raise ValueError(f"Cannot pack a LNK parsed without {', '.join(sorted(self._skippedSections))}")
+
+        parts = []
+        for name in LNK._packSectionNames(self.shellLinkHeader):
+            sectionContents = self._cachedSectionContents(name)
+            if sectionContents != None:
+                parts.append((name, None, None, sectionContents))
+            else:
+                section = getattr(self, name)
+                layout = section._packLayout()
+                parts.append((name, section, layout, section.packedSize(layout)))
+
+        if contents == None:
+            contents = bytearray(sum(len(part) if section == None else part for name, section, layout, part in parts))
+
+        metrics = _activeMetrics
+        for name, section, layout, part in parts:
+            if metrics != None:
+                measureStart = _startMeasure()
+            if section == None:
+                offset = packBytesInto(contents, offset, part)
+                if metrics != None:
+                    metrics.record("copy", name, measureStart, len(part))
+            else:
+                start = offset
+                offset = section.packInto(contents, offset, layout)
+                self._packCache[name] = (section._snapshot(), bytes(contents[start:offset]))
+                if metrics != None:
+                    metrics.record("pack", name, measureStart, offset - start)
+        return contents
 
     # Pack into LNK
     def pack(self):
-        shellLinkHeaderContents = self.shellLinkHeader.pack()
-        linkTargetIdListContents = self.linkTargetIdList.pack() if self.shellLinkHeader.HasLinkTargetIDList else b""
-        linkInfoContents = self.linkInfo.pack() if self.shellLinkHeader.HasLinkInfo else b""
-        stringDataContents = self.stringData.pack()
-
-        contents = shellLinkHeaderContents + linkTargetIdListContents + linkInfoContents + stringDataContents
-        return contents
+        return bytes(self.packInto())
     
     # Pack into LNK and write out the file
     def packAndSave(self, filePath: str):
-        contents = self.pack()
+        contents = self.packInto()
         with open(filePath, "wb") as fileToWrite:
             fileToWrite.write(contents)
+        return contents
+
+    # LinkInfo's (local path, network path) of the target, either one "" when absent; the network path is the UNC path
+    # (CommonNetworkRelativeLink NetName + CommonPathSuffix)
+    def getLinkInfoPaths(self):
+        linkInfo = self.linkInfo
+        commonPathSuffix = linkInfo.CommonPathSuffixUnicode or linkInfo.CommonPathSuffix
+
+        localBasePath = linkInfo.LocalBasePathUnicode or linkInfo.LocalBasePath
+        localPath = localBasePath + commonPathSuffix if localBasePath else ""
+
+        netName = linkInfo.NetNameUnicode or linkInfo.NetName
+        networkPath = (netName + "\\" + commonPathSuffix if commonPathSuffix else netName) if netName else ""
+        return (localPath, networkPath)
+
+    # Best-effort target path; LinkInfo local path, then network path, then the path the IDList leads to, then the
+    # relative path string. pathCache: an LNKPathCache shared over a batch, so common IDList prefixes are decoded once
+    def getTargetPath(self, pathCache = None):
+        localPath, networkPath = self.getLinkInfoPaths()
+        if localPath or networkPath:
+            return localPath or networkPath
+
+        idListPath = self.linkTargetIdList.getPath(pathCache)
+        if idListPath:
+            return idListPath
+
+        return self.stringData.RELATIVE_PATH
+
+    # Value of a property from the PropertyStoreDataBlock (see _propertyKey for the key forms), or default
+    def getProperty(self, key, default = None):
+        propertyStoreDataBlock = self.extraData.getBlock(_PropertyStoreDataBlock.BlockSignature)
+        if propertyStoreDataBlock == None:
+            return default
+        return propertyStoreDataBlock.getValue(key, default)
+
+    # Flat, JSON/CSV-ready view of the commonly used fields (see RECORD_FIELDS)
+    def toRecord(self, path: str = None, error: str = None, pathCache = None):
+        shellLinkHeader = self.shellLinkHeader
+        linkInfo = self.linkInfo
+        stringData = self.stringData
+        trackerDataBlock = self.extraData.getBlock(_TrackerDataBlock.BlockSignature)
+        return {
+            "path": path,
+            "error": error,
+            "CreationTime": shellLinkHeader.CreationTime,
+            "AccessTime": shellLinkHeader.AccessTime,
+            "WriteTime": shellLinkHeader.WriteTime,
+            "FileSize": shellLinkHeader.FileSize,
+            "IconIndex": shellLinkHeader.IconIndex,
+            "ShowCommand": shellLinkHeader.ShowCommand,
+            "HotkeyFlags": (shellLinkHeader.HotkeyFlags[1] << 8) | shellLinkHeader.HotkeyFlags[0],
+            "LinkFlags": "|".join(name for name, mask in _LINK_FLAGS if getattr(shellLinkHeader, name)),
+            "FileAttributes": "|".join(name for name, mask in _FILE_ATTRIBUTES if getattr(shellLinkHeader, name)),
+            "TargetPath": self.getTargetPath(pathCache),
+            "LocalBasePath": linkInfo.LocalBasePathUnicode or linkInfo.LocalBasePath or "",
+            "CommonPathSuffix": linkInfo.CommonPathSuffixUnicode or linkInfo.CommonPathSuffix,
+            "NetName": linkInfo.NetNameUnicode or linkInfo.NetName,
+            "DeviceName": linkInfo.DeviceNameUnicode or linkInfo.DeviceName,
+            "VolumeIdDriveType": linkInfo.VolumeIdDriveType,
+            "VolumeIdDriveSerialNumber": linkInfo.VolumeIdDriveSerialNumber,
+            "VolumeIdData": linkInfo.VolumeIdData.hex(),
+            "NAME_STRING": stringData.NAME_STRING,
+            "RELATIVE_PATH": stringData.RELATIVE_PATH,
+            "WORKING_DIR": stringData.WORKING_DIR,
+            "COMMAND_LINE_ARGUMENTS": stringData.COMMAND_LINE_ARGUMENTS,
+            "ICON_LOCATION": stringData.ICON_LOCATION,
+            "MachineID": trackerDataBlock.MachineID if trackerDataBlock != None else "",
+        }
+
+    # Stream records to a JSON Lines or CSV file, one per LNK, flushing every bufferRecords records
+    # results: LNK objects or (lnkFilePath, lnk, error) tuples as yielded by scan(); returns the number of records written
+    @staticmethod
+    def export(results, outFile, format: str = "jsonl", bufferRecords: int = 1024):
+        if format not in ("jsonl", "csv"):
+            raise ValueError(f"Unknown export format: {format}")
+
+        if isinstance(outFile, (str, os.PathLike)):
+            with open(outFile, "w", encoding="utf-8", newline="") as outFileOpened:
+                return LNK.export(results, outFileOpened, format, bufferRecords)
+
+        buffer = io.StringIO()
+        csvWriter = None
+        if format == "csv":
+            csvWriter = csv.DictWriter(buffer, fieldnames=LNK.RECORD_FIELDS)
+            csvWriter.writeheader()
+
+        pathCache = LNKPathCache()
+        count = 0
+        for result in results:
+            if isinstance(result, LNK):
+                record = result.toRecord(pathCache = pathCache)
+            else:
+                lnkFilePath, lnk, error = result
+                if lnk != None:
+                    record = lnk.toRecord(lnkFilePath, error, pathCache)
+                else:
+                    record = {"path": lnkFilePath, "error": error}
+
+            if csvWriter != None:
+                csvWriter.writerow(record)
+            else:
+                buffer.write(json.dumps(record, ensure_ascii=False))
+                buffer.write("\n")
+
+            count += 1
+            if count % bufferRecords == 0:
+                outFile.write(buffer.getvalue())
+                buffer.seek(0)
+                buffer.truncate()
+
+        outFile.write(buffer.getvalue())
+        return count
+
+    # Parse many LNK files across a process pool; yields (lnkFilePath, lnk, error) as results come in
+    # cachePath: an LNKCache file to go through, so unchanged files are not parsed again
+    # limits: an LNKLimits to parse every file in strict mode, with limits.timeout as the time budget of each
+    @staticmethod
+    def scan(pathsOrDir, workers: int = None, chunkSize: int = 64, recursive: bool = True, fields = None, cachePath: str = None, limits: LNKLimits = None):
+        lnkFilePaths = _iterLnkFilePaths(pathsOrDir, recursive)
+
+        # Single worker; parse inline, no pool
+        if workers == 1:
+            lnkCache = LNKCache(cachePath) if cachePath != None else None
+            try:
+                for lnkFilePath in lnkFilePaths:
+                    yield _scanOne(lnkFilePath, fields, lnkCache, limits)
+            finally:
+                if lnkCache != None:
+                    lnkCache.close()
+            return
+
+        yield from _iterPooled(_scanChunk, lnkFilePaths, workers, chunkSize, fields, cachePath, limits)
+
+    # Read on a worker thread, then parse from the bytes read; on slow storage, await many of these at once
+    @staticmethod
+    async def loadAsync(lnkFilePath: str, fields = None, limits: LNKLimits = None):
+        contents = await asyncio.to_thread(_readFile, lnkFilePath)
+        return LNK.fromBytes(contents, 0, fields, limits)
+
+    # scan() for high-latency storage (SMB/NFS mounts): up to concurrency reads in flight on a thread pool, each file
+    # parsed on the event loop as soon as it lands; yields (lnkFilePath, lnk, error) in completion order
+    @staticmethod
+    async def scanAsync(pathsOrDir, concurrency: int = 64, recursive: bool = True, fields = None, limits: LNKLimits = None):
+        loop = asyncio.get_running_loop()
+        # Own pool: the default executor would cap the reads in flight at a few dozen
+        executor = ThreadPoolExecutor(max_workers=concurrency + 1) # One more for the directory walk
+        lnkFilePaths = _iterLnkFilePaths(pathsOrDir, recursive)
+
+        def parse(lnkFilePath, contents):
+            try:
+                lnk = LNK.fromBytes(contents, 0, fields, limits)
+                for name in LNK.SECTIONS:
+                    getattr(lnk, name)
+                return (lnkFilePath, lnk, None)
+            except Exception as e:
+                return (lnkFilePath, None, f"{_describeError(e)}")
+
+        try:
+            pending = {}
+            isWalkDone = False
+            while True:
+                # Directory listing is blocking I/O on a share too; it goes through the pool one entry at a time
+                while not isWalkDone and len(pending) < concurrency:
+                    lnkFilePath = await loop.run_in_executor(executor, next, lnkFilePaths, None)
+                    if lnkFilePath == None:
+                        isWalkDone = True
+                    else:
+                        pending[loop.run_in_executor(executor, _readFile, lnkFilePath)] = lnkFilePath
+
+                if len(pending) == 0:
+                    break
+
+                done = (await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED))[0]
+                for future in done:
+                    lnkFilePath = pending.pop(future)
+                    try:
+                        contents = future.result()
+                    except OSError as e:
+                        yield (lnkFilePath, None, f"{_describeError(e)}")
+                        continue
+                    yield parse(lnkFilePath, contents)
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    # Pull a few properties out of many LNK files across a process pool; only the ExtraData is located, and of the
+    # PropertyStoreDataBlock only the storages and values holding the keys are walked and decoded
+    # keys: property names or (FormatID, PropertyID or Name) pairs; yields (lnkFilePath, {key: value or None}, error)
+    @staticmethod
+    def extractProperties(pathsOrDir, keys, workers: int = None, chunkSize: int = 64, recursive: bool = True):
+        propertyKeys = [(key, _propertyKey(key)) for key in keys] # Bad keys fail here, not once per file
+        lnkFilePaths = _iterLnkFilePaths(pathsOrDir, recursive)
+
+        if workers == 1:
+            for lnkFilePath in lnkFilePaths:
+                yield _extractPropertiesOne(lnkFilePath, propertyKeys)
+            return
+
+        yield from _iterPooled(_extractPropertiesChunk, lnkFilePaths, workers, chunkSize, propertyKeys)
+
+    # Check that many LNK files survive parse -> pack -> parse, across a process pool; every section is re-serialized
+    # from its decoded fields and compared with the file byte for byte (see LNKVerifyReport to aggregate)
+    # Yields (lnkFilePath, {section: LNKSectionDiff} of the sections that differ, error)
+    @staticmethod
+    def verify(pathsOrDir, workers: int = None, chunkSize: int = 64, recursive: bool = True):
+        lnkFilePaths = _iterLnkFilePaths(pathsOrDir, recursive)
+
+        if workers == 1:
+            for lnkFilePath in lnkFilePaths:
+                yield _verifyOne(lnkFilePath)
+            return
+
+        yield from _iterPooled(_verifyChunk, lnkFilePaths, workers, chunkSize)
+
+    # Find and parse shell links embedded in a large blob (file path or buffer); yields (offset, lnk)
+    @staticmethod
+    def carve(source, chunkSize: int = 64 * 1024 * 1024):
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, "rb") as sourceFile:
+                if os.fstat(sourceFile.fileno()).st_size == 0:
+                    return
+                with mmap.mmap(sourceFile.fileno(), 0, access=mmap.ACCESS_READ) as sourceMap:
+                    yield from _carveBuffer(sourceMap, chunkSize)
+        else:
+            yield from _carveBuffer(source, chunkSize)
 
     # FUNCTIONS END
     # ----------------------------------------------------------------------------------
 
-    
+
+
+# ----------------------------------------------------------------------------------
+# COLUMNAR OUTPUT
+
+"""
+Columnar file layout (all integers little-endian):
+  MAGIC; RowCount (uint64); ColumnCount (uint32)
+  per column: NameSize (uint16), Name (utf-8), TypeCode (1 byte; array typecode, or "s" for strings)
+    numeric: DataSize (uint64), Data
+    strings: OffsetsSize (uint64), Offsets (uint64 x (RowCount + 1)), DataSize (uint64), Data (utf-8, concatenated)
+"""
+class LNKColumns:
+    MAGIC = b"LNKCOL1\x00"
+
+    # (column, array typecode or "s"); FILETIMEs stay exact int64, flags stay bitmasks
+    COLUMNS = (
+        ("path", "s"),
+        ("error", "s"),
+        ("CreationFiletime", "q"),
+        ("AccessFiletime", "q"),
+        ("WriteFiletime", "q"),
+        ("FileSize", "I"),
+        ("IconIndex", "i"),
+        ("ShowCommand", "I"),
+        ("HotkeyFlags", "H"),
+        ("LinkFlags", "I"),
+        ("FileAttributes", "I"),
+        ("VolumeIdDriveType", "I"),
+        ("VolumeIdDriveSerialNumber", "I"),
+        ("TargetPath", "s"),
+        ("LocalBasePath", "s"),
+        ("CommonPathSuffix", "s"),
+        ("NetName", "s"),
+        ("NAME_STRING", "s"),
+        ("RELATIVE_PATH", "s"),
+        ("WORKING_DIR", "s"),
+        ("COMMAND_LINE_ARGUMENTS", "s"),
+        ("ICON_LOCATION", "s"),
+    )
+
+    def __init__(self):
+        self.rowCount = 0
+        self.pathCache = LNKPathCache() # TargetPath of every appended LNK goes through it
+        self.columns = {} # name -> array, or (offsets array, bytearray) for strings
+        for name, typeCode in LNKColumns.COLUMNS:
+            if typeCode == "s":
+                self.columns[name] = (array.array("Q", [0]), bytearray())
+            else:
+                self.columns[name] = array.array(typeCode)
+
+    # Build from LNK objects or scan() tuples; each LNK can be dropped as soon as it is appended
+    @classmethod
+    def fromResults(cls, results):
+        lnkColumns = cls()
+        for result in results:
+            if isinstance(result, LNK):
+                lnkColumns.append(result)
+            else:
+                lnkColumns.append(result[1], result[0], result[2])
+        return lnkColumns
+
+    def append(self, lnk: LNK, path: str = None, error: str = None):
+        columns = self.columns
+        self._appendString("path", path)
+        self._appendString("error", error)
+
+        if lnk == None:
+            for name, typeCode in LNKColumns.COLUMNS[2:]:
+                if typeCode == "s":
+                    self._appendString(name, None)
+                else:
+                    columns[name].append(0)
+            self.rowCount += 1
+            return
+
+        shellLinkHeader = lnk.shellLinkHeader
+        linkInfo = lnk.linkInfo
+        stringData = lnk.stringData
+
+        columns["CreationFiletime"].append(shellLinkHeader.CreationFiletime)
+        columns["AccessFiletime"].append(shellLinkHeader.AccessFiletime)
+        columns["WriteFiletime"].append(shellLinkHeader.WriteFiletime)
+        columns["FileSize"].append(shellLinkHeader.FileSize)
+        columns["IconIndex"].append(shellLinkHeader.IconIndex)
+        columns["ShowCommand"].append(shellLinkHeader.ShowCommand)
+        columns["HotkeyFlags"].append((shellLinkHeader.HotkeyFlags[1] << 8) | shellLinkHeader.HotkeyFlags[0])
+        columns["LinkFlags"].append(shellLinkHeader.LinkFlags)
+        columns["FileAttributes"].append(shellLinkHeader.FileAttributes)
+        columns["VolumeIdDriveType"].append(linkInfo.VolumeIdDriveType)
+        columns["VolumeIdDriveSerialNumber"].append(linkInfo.VolumeIdDriveSerialNumber)
+        self._appendString("TargetPath", lnk.getTargetPath(self.pathCache))
+        self._appendString("LocalBasePath", linkInfo.LocalBasePathUnicode or linkInfo.LocalBasePath)
+        self._appendString("CommonPathSuffix", linkInfo.CommonPathSuffixUnicode or linkInfo.CommonPathSuffix)
+        self._appendString("NetName", linkInfo.NetNameUnicode or linkInfo.NetName)
+        self._appendString("NAME_STRING", stringData.NAME_STRING)
+        self._appendString("RELATIVE_PATH", stringData.RELATIVE_PATH)
+        self._appendString("WORKING_DIR", stringData.WORKING_DIR)
+        self._appendString("COMMAND_LINE_ARGUMENTS", stringData.COMMAND_LINE_ARGUMENTS)
+        self._appendString("ICON_LOCATION", stringData.ICON_LOCATION)
+        self.rowCount += 1
+
+    def _appendString(self, name: str, value: str):
+        offsets, data = self.columns[name]
+        if value:
+            data += value.encode("utf-8", "surrogatepass")
+        offsets.append(len(data))
+
+    # Column values; numeric columns come back as the array itself, string columns as a list
+    def getColumn(self, name: str):
+        column = self.columns[name]
+        if isinstance(column, array.array):
+            return column
+
+        offsets, data = column
+        return [str(data[offsets[i]:offsets[i + 1]], "utf-8", "surrogatepass") for i in range(self.rowCount)]
+
+    def save(self, filePath: str):
+        with open(filePath, "wb") as fileToWrite:
+            fileToWrite.write(LNKColumns.MAGIC)
+            fileToWrite.write(struct.pack("<QI", self.rowCount, len(LNKColumns.COLUMNS)))
+            for name, typeCode in LNKColumns.COLUMNS:
+                nameEncoded = name.encode("utf-8")
+                fileToWrite.write(packUshort(len(nameEncoded)) + nameEncoded + typeCode.encode("ascii"))
+
+                column = self.columns[name]
+                if typeCode == "s":
+                    offsets, data = column
+                    _writeColumnArray(fileToWrite, offsets)
+                    fileToWrite.write(struct.pack("<Q", len(data)))
+                    fileToWrite.write(data)
+                else:
+                    _writeColumnArray(fileToWrite, column)
+
+    @classmethod
+    def load(cls, filePath: str):
+        with open(filePath, "rb") as fileToRead:
+            contents = fileToRead.read()
+
+        if contents[0:len(LNKColumns.MAGIC)] != LNKColumns.MAGIC:
+            raise ValueError(f"Not a LNK columnar file: {filePath}")
+
+        lnkColumns = cls()
+        offset = len(LNKColumns.MAGIC)
+        lnkColumns.rowCount, columnCount = struct.unpack_from("<QI", contents, offset)
+        offset += 12
+        for i in range(columnCount):
+            nameSize = getUshort(contents, offset)
+            name = str(contents[offset + 2:offset + 2 + nameSize], "utf-8")
+            typeCode = chr(contents[offset + 2 + nameSize])
+            offset += 2 + nameSize + 1
+
+            if typeCode == "s":
+                offsets, offset = _readColumnArray(contents, offset, "Q")
+                dataSize = struct.unpack_from("<Q", contents, offset)[0]
+                data = bytearray(contents[offset + 8:offset + 8 + dataSize])
+                offset += 8 + dataSize
+                lnkColumns.columns[name] = (offsets, data)
+            else:
+                lnkColumns.columns[name], offset = _readColumnArray(contents, offset, typeCode)
+
+        return lnkColumns
+
+def _writeColumnArray(fileToWrite, column: array.array):
+    if sys.byteorder == "big":
+        column = array.array(column.typecode, column)
+        column.byteswap()
+    fileToWrite.write(struct.pack("<Q", len(column) * column.itemsize))
+    fileToWrite.write(memoryview(column))
+
+def _readColumnArray(contents: bytes, offset: int, typeCode: str):
+    dataSize = struct.unpack_from("<Q", contents, offset)[0]
+    column = array.array(typeCode)
+    column.frombytes(contents[offset + 8:offset + 8 + dataSize])
+    if sys.byteorder == "big":
+        column.byteswap()
+    return (column, offset + 8 + dataSize)
+
+# COLUMNAR OUTPUT END
+# ----------------------------------------------------------------------------------
+
+
+
+# ----------------------------------------------------------------------------------
+# GENERATION
+
+# Overridable field -> section holding it; every slot and writable property of the section classes
+_FIELD_SECTIONS = {
+    field: name
+    for name, sectionClass in (("shellLinkHeader", _ShellLinkHeader), ("linkTargetIdList", _LinkTargetIDList), ("linkInfo", _LinkInfo), ("stringData", _StringData))
+    for field, value in vars(sectionClass).items()
+    if (isinstance(value, types.MemberDescriptorType) or (isinstance(value, property) and value.fset != None)) and field not in ("shellLinkHeader", "sizeOfStringData")
+}
+
+"""
+Many variants of one shortcut. The template is packed once, section by section; a variant copies and repacks only
+the sections its overrides touch (plus StringData when LinkFlags change, since they decide its layout) and copies
+the template's bytes for the rest.
+"""
+class LNKTemplate:
+    def __init__(self, lnk: LNK):
+        lnk._packSections() # Refuses LNKs parsed with fields=
+
+        self.lnk = lnk
+        self.sections = {name: getattr(lnk, name) for name in ("shellLinkHeader",) + LNK.SECTIONS}
+        self.sectionContents = {name: section.pack() for name, section in self.sections.items()}
+
+    # Packed template with overrides applied; overrides: {field: value}, field being any attribute of the header,
+    # IDList (itemIdDatas), LinkInfo or StringData, e.g. COMMAND_LINE_ARGUMENTS, LocalBasePath, CreationTime, IsUnicode
+    def render(self, overrides: dict = None):
+        sections = self.sections
+        dirtySections = {}
+        for field, value in (overrides or {}).items():
+            name = _FIELD_SECTIONS.get(field)
+            if name == None:
+                raise ValueError(f"Unknown LNK field: {field}")
+            if name not in dirtySections:
+                dirtySections[name] = copy.copy(sections[name])
+            setattr(dirtySections[name], field, value)
+
+        shellLinkHeader = dirtySections.get("shellLinkHeader", sections["shellLinkHeader"])
+        if "stringData" in dirtySections or shellLinkHeader.LinkFlags != sections["shellLinkHeader"].LinkFlags:
+            stringData = dirtySections.get("stringData") or copy.copy(sections["stringData"])
+            stringData.shellLinkHeader = shellLinkHeader
+            dirtySections["stringData"] = stringData
+
+        names = LNK._packSectionNames(shellLinkHeader)
+        layouts = {name: dirtySections[name]._packLayout() for name in names if name in dirtySections}
+        contents = bytearray(sum(
+            dirtySections[name].packedSize(layouts[name]) if name in dirtySections else len(self.sectionContents[name])
+            for name in names
+            ))
+
+        offset = 0
+        for name in names:
+            if name in dirtySections:
+                offset = dirtySections[name].packInto(contents, offset, layouts[name])
+            else:
+                offset = packBytesInto(contents, offset, self.sectionContents[name])
+        return bytes(contents)
+
+    # Render and write many variants on a thread pool; variants: (filePath, overrides) pairs
+    # Yields (filePath, error) as writes complete, error being None or "ExceptionType: message"
+    def generate(self, variants, workers: int = None):
+        workers = workers or min(32, (os.cpu_count() or 1) + 4)
+        maxPending = workers * 4 # Variants in flight; the variant stream itself may be unbounded
+
+        executor = ThreadPoolExecutor(max_workers=workers)
+        try:
+            pending = set()
+            for filePath, overrides in variants:
+                pending.add(executor.submit(self._renderAndSave, filePath, overrides))
+                if len(pending) >= maxPending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _renderAndSave(self, filePath: str, overrides: dict):
+        try:
+            contents = self.render(overrides)
+            with open(filePath, "wb") as fileToWrite:
+                fileToWrite.write(contents)
+            return (filePath, None)
+        except Exception as e:
+            return (filePath, f"{_describeError(e)}")
+
+# GENERATION END
+# ----------------------------------------------------------------------------------
+
+
+
+# ----------------------------------------------------------------------------------
+# INDEX
+
+class _PathTrieNode:
+    __slots__ = (
+        "children", # {path component: _PathTrieNode}
+        "entries", # list of entry numbers of the links pointing exactly here, or None
+    )
+
+    def __init__(self):
+        self.children = {}
+        self.entries = None
+
+"""
+Which shortcuts point at a path, under a path, at a volume or from a machine. Paths are matched case-insensitively,
+by whole components, "/" and "\\" alike; a UNC server (\\\\SERVER) is one component. Links are added one at a time
+and every index is updated in place, so adding never rebuilds anything.
+"""
+class LNKIndex:
+    def __init__(self):
+        self.entries = [] # Entry number -> what add() was given to return for the link (its path, or the LNK)
+        self.pathTrie = _PathTrieNode()
+        self.volumeSerialNumbers = {} # VolumeIdDriveSerialNumber -> entry numbers
+        self.machineIds = {} # TrackerDataBlock MachineID, lowercased -> entry numbers
+        self.pathCache = LNKPathCache()
+
+    # Build from LNK objects or scan() tuples; links that failed to parse are left out
+    @classmethod
+    def fromResults(cls, results):
+        lnkIndex = cls()
+        for result in results:
+            if isinstance(result, LNK):
+                lnkIndex.add(result)
+            elif result[1] != None:
+                lnkIndex.add(result[1], result[0])
+        return lnkIndex
+
+    # Path components, as matched: lowercased, separators unified, empty components dropped
+    @staticmethod
+    def _pathComponents(path: str):
+        path = path.replace("/", "\\").lower()
+        components = [component for component in path.split("\\") if component]
+        if path.startswith("\\\\") and len(components) != 0:
+            components[0] = "\\\\" + components[0]
+        return components
+
+    # Every path the link can be said to point at: LinkInfo's local and network paths, or else getTargetPath()'s
+    def _targetPaths(self, lnk: LNK):
+        targetPaths = [targetPath for targetPath in lnk.getLinkInfoPaths() if targetPath]
+        if len(targetPaths) == 0:
+            targetPath = lnk.getTargetPath(self.pathCache)
+            if targetPath:
+                targetPaths.append(targetPath)
+        return targetPaths
+
+    # Index a link; item is what queries return for it (defaults to the LNK itself). Returns its entry number
+    def add(self, lnk: LNK, item = None):
+        entry = len(self.entries)
+        self.entries.append(item if item != None else lnk)
+
+        for targetPath in self._targetPaths(lnk):
+            node = self.pathTrie
+            for component in LNKIndex._pathComponents(targetPath):
+                child = node.children.get(component)
+                if child == None:
+                    child = node.children[component] = _PathTrieNode()
+                node = child
+            if node.entries == None:
+                node.entries = []
+            if len(node.entries) == 0 or node.entries[-1] != entry: # Local and network paths may be the same
+                node.entries.append(entry)
+
+        linkInfo = lnk.linkInfo
+        if linkInfo.VolumeIDAndLocalBasePathPresent:
+            self.volumeSerialNumbers.setdefault(linkInfo.VolumeIdDriveSerialNumber, []).append(entry)
+
+        trackerDataBlock = lnk.extraData.getBlock(_TrackerDataBlock.BlockSignature)
+        if trackerDataBlock != None and trackerDataBlock.MachineID:
+            self.machineIds.setdefault(trackerDataBlock.MachineID.lower(), []).append(entry)
+
+        return entry
+
+    def _findNode(self, path: str):
+        node = self.pathTrie
+        for component in LNKIndex._pathComponents(path):
+            node = node.children.get(component)
+            if node == None:
+                return None
+        return node
+
+    # Links pointing exactly at path
+    def pointingAt(self, path: str):
+        node = self._findNode(path)
+        if node == None or node.entries == None:
+            return []
+        return [self.entries[entry] for entry in node.entries]
+
+    # Links pointing at path or anywhere below it, in the order they were added
+    def pointingUnder(self, path: str):
+        node = self._findNode(path)
+        if node == None:
+            return []
+
+        found = []
+        nodes = [node]
+        while nodes:
+            node = nodes.pop()
+            if node.entries != None:
+                found.extend(node.entries)
+            nodes.extend(node.children.values())
+        found.sort()
+        return [self.entries[entry] for entry in found]
+
+    def onVolume(self, volumeSerialNumber: int):
+        return [self.entries[entry] for entry in self.volumeSerialNumbers.get(volumeSerialNumber, ())]
+
+    def fromMachine(self, machineId: str):
+        return [self.entries[entry] for entry in self.machineIds.get(machineId.lower(), ())]
+
+    def __len__(self):
+        return len(self.entries)
+
+# INDEX END
+# ----------------------------------------------------------------------------------
+
+
+
+# ----------------------------------------------------------------------------------
+# TIMELINE
+
+"""
+MAC timeline of the header times (CreationFiletime, AccessFiletime, WriteFiletime) of many links. Events are
+(FILETIME, kind, entry number) tuples of plain ints, so they compare exactly and cheaply; FILETIMEs are only turned
+into datetimes or text on the way out. Added events are sorted in runs of up to runSize, and reading k-way merges the
+runs with a heap, streaming events in time order without ever sorting the corpus as a whole. An unset (zero) time
+is not an event. Only the header is needed: LNKTimeline.fromResults(LNK.scan(directory, fields = ())).
+"""
+class LNKTimeline:
+    KINDS = ("created", "accessed", "modified") # Kind -> name
+    _KIND_FILETIMES = operator.attrgetter("CreationFiletime", "AccessFiletime", "WriteFiletime") # In kind order
+
+    def __init__(self, runSize: int = 1 << 20):
+        self.entries = [] # Entry number -> what add() was given to return for the link (its path, or the LNK)
+        self.runs = [] # Sorted lists of (FILETIME, kind, entry number)
+        self.runSize = runSize
+        self._run = [] # Events not yet sorted into a run
+        self.skippedEvents = 0 # Events iterDatetimes() left out, their FILETIME being past the year 9999
+
+    # Build from LNK objects or scan() tuples; links that failed to parse are left out
+    @classmethod
+    def fromResults(cls, results, runSize: int = 1 << 20):
+        lnkTimeline = cls(runSize)
+        for result in results:
+            if isinstance(result, LNK):
+                lnkTimeline.add(result)
+            elif result[1] != None:
+                lnkTimeline.add(result[1], result[0])
+        return lnkTimeline
+
+    def add(self, lnk: LNK, item = None):
+        entry = len(self.entries)
+        self.entries.append(item if item != None else lnk)
+
+        run = self._run
+        for kind, filetime in enumerate(LNKTimeline._KIND_FILETIMES(lnk.shellLinkHeader)):
+            if filetime != 0:
+                run.append((filetime, kind, entry))
+        if len(run) >= self.runSize:
+            self._sealRun()
+        return entry
+
+    def _sealRun(self):
+        if len(self._run) != 0:
+            self._run.sort()
+            self.runs.append(self._run)
+            self._run = []
+
+    # Take in another timeline's events (another corpus, another worker); its entries are numbered after this one's
+    def merge(self, other):
+        self._sealRun()
+        other._sealRun()
+        base = len(self.entries)
+        self.entries.extend(other.entries)
+        for run in other.runs:
+            self.runs.append([(filetime, kind, entry + base) for filetime, kind, entry in run]) # Still sorted
+        return self
+
+    def __len__(self):
+        return sum(map(len, self.runs)) + len(self._run)
+
+    # (FILETIME, kind, entry number) in time order, from start (inclusive) to end (exclusive); start and end are
+    # FILETIMEs or datetimes, and each run is entered and left by binary search
+    def events(self, start = None, end = None):
+        self._sealRun()
+        if isinstance(start, datetime.datetime):
+            start = datetimeToFiletime(start)
+        if isinstance(end, datetime.datetime):
+            end = datetimeToFiletime(end)
+
+        runs = []
+        for run in self.runs:
+            runStart = bisect.bisect_left(run, (start,)) if start != None else 0
+            runEnd = bisect.bisect_left(run, (end,)) if end != None else len(run)
+            if runStart < runEnd:
+                runs.append(run if runStart == 0 and runEnd == len(run) else map(run.__getitem__, range(runStart, runEnd)))
+        return heapq.merge(*runs)
+
+    # (datetime, kind name, item) in time order; datetimes stop at microseconds, see filetimeToDatetime
+    # A FILETIME past the year 9999 (a crafted file can store one) has no datetime; its event is skipped and counted in skippedEvents
+    def iterDatetimes(self, start = None, end = None):
+        entries = self.entries
+        for filetime, kind, entry in self.events(start, end):
+            try:
+                eventDatetime = filetimeToDatetime(filetime)
+            except OverflowError:
+                self.skippedEvents += 1
+                continue
+            yield (eventDatetime, LNKTimeline.KINDS[kind], entries[entry])
+
+    # Write CSV (time, filetime, kind, path) in time order; time is exact ISO 8601 UTC, filetime the raw integer
+    def export(self, outFile, start = None, end = None, bufferRecords: int = 1024):
+        if isinstance(outFile, (str, os.PathLike)):
+            with open(outFile, "w", encoding="utf-8", newline="") as outFileOpened:
+                return self.export(outFileOpened, start, end, bufferRecords)
+
+        buffer = io.StringIO()
+        csvWriter = csv.writer(buffer)
+        csvWriter.writerow(("time", "filetime", "kind", "path"))
+
+        entries = self.entries
+        count = 0
+        for filetime, kind, entry in self.events(start, end):
+            item = entries[entry]
+            csvWriter.writerow((filetimeToIso(filetime), filetime, LNKTimeline.KINDS[kind], item if not isinstance(item, LNK) else ""))
+            count += 1
+            if count % bufferRecords == 0:
+                outFile.write(buffer.getvalue())
+                buffer.seek(0)
+                buffer.truncate()
+        outFile.write(buffer.getvalue())
+        return count
+
+# TIMELINE END
+# ----------------------------------------------------------------------------------
+
+
+
+# ----------------------------------------------------------------------------------
+# CACHE
+
+"""
+On-disk parse cache in front of LNK(lnkFilePath), in one SQLite file that several processes can share.
+
+A file is looked up by path and checked against its (size, mtime, ctime); when they all match, the cached link is
+used and the file is never read. Otherwise the file is read and hashed: content seen before (a copied or merely
+touched shortcut) reuses its cached entry, anything else is parsed and stored. What is stored is every section
+already decoded, as the plain values of its fields in one marshal record, so a hit rebuilds the sections asked for
+without parsing anything.
+Entries are shared by content hash and evicted least recently used first once they pass maxBytes; the byte total
+and the recency timestamps live in the database, so every process sharing it evicts by the same numbers.
+"""
+class LNKCache:
+    _SECTION_CLASSES = (("shellLinkHeader", _ShellLinkHeader), ("linkTargetIdList", _LinkTargetIDList), ("linkInfo", _LinkInfo), ("stringData", _StringData))
+
+    def __init__(self, cachePath: str, maxBytes: int = 256 * 1024 * 1024, commitEvery: int = 1024):
+        self.maxBytes = maxBytes
+        self.commitEvery = commitEvery # Changes per transaction; a crash loses at most these, never consistency
+        self.hits = 0 # Served on (size, mtime, ctime) alone
+        self.contentHits = 0 # File read, but its content was cached already
+        self.misses = 0
+        self._pendingChanges = 0
+        self._touched = {} # Content hash -> lastUsed not yet written
+
+        self.connection = sqlite3.connect(cachePath, timeout=60, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, ctime INTEGER, hash BLOB)")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS records (hash BLOB PRIMARY KEY, itemIds INTEGER, blocks INTEGER, strict INTEGER, record BLOB, size INTEGER, lastUsed INTEGER)")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS totals (id INTEGER PRIMARY KEY CHECK (id = 0), bytes INTEGER)")
+        self.connection.execute("INSERT OR IGNORE INTO totals SELECT 0, COALESCE(SUM(size), 0) FROM records")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS recordsByLastUsed ON records (lastUsed)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS filesByHash ON files (hash)")
+        self.connection.commit()
+        if self._totalBytes() > self.maxBytes: # Opened with a smaller maxBytes than it was filled with
+            self._evict()
+            self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excInfo):
+        self.close()
+
+    # Same as LNK(lnkFilePath, fields = fields, limits = limits), through the cache
+    # In strict mode only records stored by a strict parse are used, and their counts are checked against limits
+    def load(self, lnkFilePath: str, fields = None, limits: LNKLimits = None):
+        fileStat = os.stat(lnkFilePath)
+        fileKey = (fileStat.st_size, fileStat.st_mtime_ns, fileStat.st_ctime_ns)
+        if limits != None and fileStat.st_size > limits.maxFileSize:
+            raise LNKParseError(f"file is larger than {limits.maxFileSize} bytes")
+        skippedSections = frozenset(LNK.SECTIONS).difference(fields) if fields != None else frozenset()
+
+        row = self.connection.execute(
+            "SELECT files.size, files.mtime, files.ctime, files.hash, records.itemIds, records.blocks, records.strict, records.record FROM files JOIN records ON records.hash = files.hash WHERE files.path = ?",
+            (lnkFilePath,)
+            ).fetchone()
+        if row != None and row[0:3] == fileKey and (limits == None or row[6]):
+            self.hits += 1
+            self._touch(row[3])
+            return LNKCache._restore(row[4:], skippedSections, fields, limits)
+
+        with open(lnkFilePath, "rb") as lnkFile:
+            contents = lnkFile.read()
+        contentHash = hashlib.blake2b(contents, digest_size=16).digest()
+
+        row = self.connection.execute("SELECT itemIds, blocks, strict, record FROM records WHERE hash = ?", (contentHash,)).fetchone()
+        if row != None and (limits == None or row[2]):
+            self.contentHits += 1
+            self._touch(contentHash)
+            lnk = LNKCache._restore(row, skippedSections, fields, limits)
+        else:
+            self.misses += 1
+            lnk = LNK.fromBytes(contents, 0, None, limits) # Files that do not parse are never cached
+            self._putRecord(contentHash, lnk, limits != None)
+            if fields != None:
+                lnk = LNK._fromSections(
+                    {name: getattr(lnk, name) for name in ("shellLinkHeader",) + LNK.SECTIONS if name not in skippedSections},
+                    lnk.totalSize, fields, {name: contents for name, (snapshot, contents) in lnk._packCache.items()}
+                    )
+
+        self.connection.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)", (lnkFilePath, *fileKey, contentHash))
+        self._changed()
+        return lnk
+
+    # Fields of a freshly parsed link, as plain values: (totalSize, slot values of each section but ExtraData,
+    # (ExtraData contents, (signature, offset) of each block, ExtraData tail), ((name, contents), ...)); the StringData's header slot
+    # is left out. The last item holds the source bytes of the sections that packing their fields would not give back
+    # (reserved bits set, non-canonical layouts), so a restored link packs exactly as a freshly parsed one
+    @staticmethod
+    def _record(lnk: LNK):
+        record = [lnk.totalSize]
+        for name, sectionClass in LNKCache._SECTION_CLASSES:
+            section = getattr(lnk, name)
+            record.append(tuple(getattr(section, slot) if slot != "shellLinkHeader" else None for slot in sectionClass.__slots__))
+        extraData = lnk.extraData
+        record.append((extraData.contents, tuple((entry.signature, entry.offset) for entry in extraData.entries), extraData.tail))
+        packed = []
+        for name in LNK._packSectionNames(lnk.shellLinkHeader):
+            contents = lnk._cachedSectionContents(name)
+            if contents != None and contents != getattr(lnk, name).pack():
+                packed.append((name, bytes(contents)))
+        record.append(tuple(packed))
+        return marshal.dumps(tuple(record))
+
+    @staticmethod
+    def _restore(row: tuple, skippedSections: frozenset, fields, limits: LNKLimits):
+        itemIds, blocks, strict, record = row
+        if limits != None:
+            if itemIds > limits.maxItemIds:
+                raise LNKParseError(f"more than {limits.maxItemIds} ItemIDs", "linkTargetIdList")
+            if blocks > limits.maxExtraDataBlocks:
+                raise LNKParseError(f"more than {limits.maxExtraDataBlocks} ExtraData blocks", "extraData")
+
+        record = marshal.loads(record)
+        sections = {}
+        for (name, sectionClass), state in zip(LNKCache._SECTION_CLASSES, record[1:]):
+            if name not in skippedSections:
+                section = sections[name] = sectionClass.__new__(sectionClass)
+                for slot, value in zip(sectionClass.__slots__, state):
+                    setattr(section, slot, value)
+        if "extraData" not in skippedSections:
+            contents, entries, tail = record[5]
+            extraData = sections["extraData"] = _ExtraData(offset = 0, contents = None)
+            extraData.contents = contents
+            extraData.tail = tail
+            extraData.strict = limits != None
+            extraData.entries = [_ExtraDataEntry(signature, offset) for signature, offset in entries]
+        return LNK._fromSections(sections, record[0], fields, dict(record[6]))
+
+    # Recency is kept in memory and written with the next commit, so a hit costs one SELECT; wall-clock time, so
+    # processes sharing the cache agree on what was used last
+    def _touch(self, contentHash: bytes):
+        self._touched[contentHash] = time.time_ns()
+        self._changed()
+
+    def _putRecord(self, contentHash: bytes, lnk: LNK, strict: bool):
+        record = LNKCache._record(lnk)
+        size = len(record)
+
+        previous = self.connection.execute("SELECT size FROM records WHERE hash = ?", (contentHash,)).fetchone()
+        self.connection.execute(
+            "INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (contentHash, len(lnk.linkTargetIdList.itemIdDatas), len(lnk.extraData.entries), strict, record, size, time.time_ns())
+            )
+        self.connection.execute("UPDATE totals SET bytes = bytes + ?", (size - (previous[0] if previous != None else 0),))
+        if self._totalBytes() > self.maxBytes:
+            self._evict()
+
+    def _totalBytes(self):
+        return self.connection.execute("SELECT bytes FROM totals").fetchone()[0]
+
+    # Drop least recently used records down to 3/4 of maxBytes, and the files that pointed at them
+    def _evict(self):
+        self._writeTouched()
+        totalBytes = self._totalBytes()
+        target = self.maxBytes * 3 // 4
+        evicted = []
+        for contentHash, size in self.connection.execute("SELECT hash, size FROM records ORDER BY lastUsed"):
+            if totalBytes <= target:
+                break
+            evicted.append((contentHash,))
+            totalBytes -= size
+        self.connection.executemany("DELETE FROM records WHERE hash = ?", evicted)
+        self.connection.executemany("DELETE FROM files WHERE hash = ?", evicted)
+        self.connection.execute("UPDATE totals SET bytes = ?", (totalBytes,))
+
+    def _changed(self):
+        self._pendingChanges += 1
+        if self._pendingChanges >= self.commitEvery:
+            self.flush()
+
+    def _writeTouched(self):
+        self.connection.executemany("UPDATE records SET lastUsed = ? WHERE hash = ?", ((lastUsed, contentHash) for contentHash, lastUsed in self._touched.items()))
+        self._touched = {}
+
+    def flush(self):
+        self._writeTouched()
+        self.connection.commit()
+        self._pendingChanges = 0
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+# CACHE END
+# ----------------------------------------------------------------------------------
+
+
+
+# ----------------------------------------------------------------------------------
+# ROUND-TRIP VERIFICATION
+
+# How one section of one file came back from parse -> pack -> parse; offsets are relative to the section's start
+class LNKSectionDiff:
+    MAX_OFFSETS = 64 # Differing offsets kept per section per file; differingBytes still counts them all
+
+    __slots__ = (
+        "sourceSize", # bytes of the section in the file
+        "packedSize", # bytes the section packed to
+        "differingBytes", # bytes that differ over the common length
+        "offsets", # first MAX_OFFSETS differing offsets
+        "stable", # whether the packed section, parsed again, packs to the same bytes
+    )
+
+    def __init__(self, source, packed, stable: bool):
+        self.sourceSize = len(source)
+        self.packedSize = len(packed)
+        self.offsets = []
+        self.differingBytes = 0
+        for offset, (sourceByte, packedByte) in enumerate(zip(source, packed)):
+            if sourceByte != packedByte:
+                self.differingBytes += 1
+                if len(self.offsets) < LNKSectionDiff.MAX_OFFSETS:
+                    self.offsets.append(offset)
+        self.stable = stable
+
+# Every section re-serialized from its decoded fields; unlike pack(), which copies clean sections from the source,
+# so each serializer is exercised. ExtraData blocks are all decoded and packed one by one for the same reason
+def _repackSections(lnk: LNK):
+    packedSections = {}
+    for name in LNK._packSectionNames(lnk.shellLinkHeader):
+        section = getattr(lnk, name)
+        if name == "extraData":
+            packedSections[name] = b"".join(block.pack() for block in section.getBlocks()) + b"\x00\x00\x00\x00"
+        else:
+            packedSections[name] = section.pack()
+    return packedSections
+
+# {section: LNKSectionDiff} of the sections that do not come back byte for byte; bytes after the link are reported
+# as "trailing", since pack() never writes them
+def _verifyRoundTrip(contents: bytes):
+    lnk = LNK.fromBytes(contents)
+    sectionSpans = dict(lnk._sectionSpans) # Let go once every section is decoded
+    packedSections = _repackSections(lnk)
+
+    reparsed = LNK.fromBytes(b"".join(packedSections.values()))
+    repackedSections = _repackSections(reparsed)
+
+    diffs = {}
+    for name, packed in packedSections.items():
+        start, end = sectionSpans[name]
+        source = contents[start:end]
+        stable = repackedSections.get(name) == packed
+        if source != packed or not stable:
+            diffs[name] = LNKSectionDiff(source, packed, stable)
+    if lnk.totalSize < len(contents):
+        diffs["trailing"] = LNKSectionDiff(contents[lnk.totalSize:], b"", True)
+    return diffs
+
+"""
+Aggregate of LNK.verify() results: how many files round-trip, and for those that do not, which sections differ and
+at which offsets within them. offsetHistogram[section][offset] counts the files differing at that offset, so a
+serializer that drops or recomputes a field shows up as a few tall bars at the field's offset.
+"""
+class LNKVerifyReport:
+    def __init__(self):
+        self.files = 0
+        self.identical = 0
+        self.errors = {} # Exception type -> files that failed to parse or pack
+        self.sectionMismatches = {} # Section -> files in which it differs
+        self.sizeMismatches = {} # Section -> files in which it packed to a different size
+        self.unstable = {} # Section -> files in which it did not pack the same after being parsed again
+        self.offsetHistogram = {} # Section -> {offset: files}
+
+    # Build from verify() tuples
+    @classmethod
+    def fromResults(cls, results):
+        lnkVerifyReport = cls()
+        for result in results:
+            lnkVerifyReport.add(result[1], result[2])
+        return lnkVerifyReport
+
+    def add(self, diffs: dict, error: str = None):
+        self.files += 1
+        if error != None:
+            errorType = error.split(":", 1)[0]
+            self.errors[errorType] = self.errors.get(errorType, 0) + 1
+            return
+        if len(diffs) == 0:
+            self.identical += 1
+            return
+
+        for name, diff in diffs.items():
+            self.sectionMismatches[name] = self.sectionMismatches.get(name, 0) + 1
+            if diff.sourceSize != diff.packedSize:
+                self.sizeMismatches[name] = self.sizeMismatches.get(name, 0) + 1
+            if not diff.stable:
+                self.unstable[name] = self.unstable.get(name, 0) + 1
+            offsetCounts = self.offsetHistogram.setdefault(name, {})
+            for offset in diff.offsets:
+                offsetCounts[offset] = offsetCounts.get(offset, 0) + 1
+
+    # Combine with a report built elsewhere (another process, another night's run)
+    def merge(self, other):
+        self.files += other.files
+        self.identical += other.identical
+        for mine, theirs in ((self.errors, other.errors), (self.sectionMismatches, other.sectionMismatches), (self.sizeMismatches, other.sizeMismatches), (self.unstable, other.unstable)):
+            for key, count in theirs.items():
+                mine[key] = mine.get(key, 0) + count
+        for name, offsetCounts in other.offsetHistogram.items():
+            mineOffsetCounts = self.offsetHistogram.setdefault(name, {})
+            for offset, count in offsetCounts.items():
+                mineOffsetCounts[offset] = mineOffsetCounts.get(offset, 0) + count
+        return self
+
+    # Text summary; per section, the topOffsets offsets that differ in the most files
+    def summary(self, topOffsets: int = 8):
+        lines = [f"{self.files} files, {self.identical} identical, {self.files - self.identical - sum(self.errors.values())} differing, {sum(self.errors.values())} failed"]
+        for errorType, count in sorted(self.errors.items(), key = lambda item: -item[1]):
+            lines.append(f"  failed with {errorType}: {count}")
+        for name in sorted(self.sectionMismatches, key = lambda name: -self.sectionMismatches[name]):
+            lines.append(f"  {name}: {self.sectionMismatches[name]} files ({self.sizeMismatches.get(name, 0)} resized, {self.unstable.get(name, 0)} unstable)")
+            offsetCounts = self.offsetHistogram.get(name, {})
+            for offset, count in sorted(offsetCounts.items(), key = lambda item: (-item[1], item[0]))[:topOffsets]:
+                lines.append(f"    +0x{offset:04X}: {count}")
+        return "\n".join(lines)
+
+# ROUND-TRIP VERIFICATION END
+# ----------------------------------------------------------------------------------
+
+
+
+# ----------------------------------------------------------------------------------
+# BATCH HELPERS
+
+def _iterLnkFilePaths(pathsOrDir, recursive: bool = True):
+    if isinstance(pathsOrDir, (str, os.PathLike)):
+        pathsOrDir = [pathsOrDir]
+
+    for path in pathsOrDir:
+        if os.path.isdir(path):
+            for dirPath, dirNames, fileNames in os.walk(path):
+                for fileName in fileNames:
+                    if fileName.lower().endswith(".lnk"):
+                        yield os.path.join(dirPath, fileName)
+                if not recursive:
+                    break
+        else:
+            yield path
+
+def _readFile(filePath: str):
+    metrics = _activeMetrics
+    if metrics != None:
+        start = _startMeasure()
+    with open(filePath, "rb") as fileToRead:
+        contents = fileToRead.read()
+    if metrics != None:
+        metrics.record("read", "file", start, len(contents))
+    return contents
+
+def _iterChunks(iterable, chunkSize: int):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == chunkSize:
+            yield chunk
+            chunk = []
+    if len(chunk) != 0:
+        yield chunk
+
+def _scanOne(lnkFilePath: str, fields = None, lnkCache: LNKCache = None, limits: LNKLimits = None):
+    # A bad file must never take the whole run down; report it and move on
+    try:
+        with _timeBudget(limits.timeout if limits != None else None):
+            lnk = lnkCache.load(lnkFilePath, fields, limits) if lnkCache != None else LNK(lnkFilePath, fields = fields, limits = limits)
+            # Decode here so errors surface per file, and results cross the process boundary without the raw file
+            for name in LNK.SECTIONS:
+                getattr(lnk, name)
+        return (lnkFilePath, lnk, None)
+    except Exception as e:
+        return (lnkFilePath, None, f"{_describeError(e)}")
+
+# cachePath -> this worker process's LNKCache, opened by its first chunk and kept for the rest
+_workerCaches = {}
+
+def _scanChunk(lnkFilePaths: list, fields = None, cachePath: str = None, limits: LNKLimits = None):
+    if cachePath == None:
+        return [_scanOne(lnkFilePath, fields, None, limits) for lnkFilePath in lnkFilePaths]
+
+    lnkCache = _workerCaches.get(cachePath)
+    if lnkCache == None:
+        lnkCache = _workerCaches[cachePath] = LNKCache(cachePath)
+    results = [_scanOne(lnkFilePath, fields, lnkCache, limits) for lnkFilePath in lnkFilePaths]
+    lnkCache.flush() # Committed per chunk, so nothing is lost when the pool lets the worker go
+    return results
+
+def _extractPropertiesOne(lnkFilePath: str, propertyKeys: list):
+    try:
+        lnk = LNK(lnkFilePath, fields = ("extraData",))
+        return (lnkFilePath, {key: lnk.getProperty(propertyKey) for key, propertyKey in propertyKeys}, None)
+    except Exception as e:
+        return (lnkFilePath, None, f"{_describeError(e)}")
+
+def _extractPropertiesChunk(lnkFilePaths: list, propertyKeys: list):
+    return [_extractPropertiesOne(lnkFilePath, propertyKeys) for lnkFilePath in lnkFilePaths]
+
+def _verifyOne(lnkFilePath: str):
+    try:
+        return (lnkFilePath, _verifyRoundTrip(_readFile(lnkFilePath)), None)
+    except Exception as e:
+        return (lnkFilePath, None, f"{_describeError(e)}")
+
+def _verifyChunk(lnkFilePaths: list):
+    return [_verifyOne(lnkFilePath) for lnkFilePath in lnkFilePaths]
+
+# Run chunkFunction in a worker with a fresh LNKMetrics registry enabled; returns (results, registry)
+def _measuredChunk(chunkFunction, chunk: list, *args):
+    with LNKMetrics() as metrics:
+        return (chunkFunction(chunk, *args), metrics)
+
+# Run chunkFunction(chunk, *args) over chunks of lnkFilePaths on a process pool; yields each chunk's results as they come in
+# With an LNKMetrics registry enabled, each chunk is measured in its worker and merged into it
+def _iterPooled(chunkFunction, lnkFilePaths, workers: int = None, chunkSize: int = 64, *args):
+    workers = workers or os.cpu_count() or 1
+    maxPending = workers * 2 # Chunks in flight; keeps memory bounded for huge trees
+    metrics = _activeMetrics
+
+    def chunkResults(future):
+        if metrics == None:
+            return future.result()
+        results, chunkMetrics = future.result()
+        metrics.merge(chunkMetrics)
+        return results
+
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        pending = set()
+        for chunk in _iterChunks(lnkFilePaths, chunkSize):
+            if metrics == None:
+                pending.add(executor.submit(chunkFunction, chunk, *args))
+            else:
+                pending.add(executor.submit(_measuredChunk, chunkFunction, chunk, *args))
+            if len(pending) >= maxPending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from chunkResults(future)
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from chunkResults(future)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+# HeaderSize followed by LinkCLSID; searched for in C by the regex engine, which works on any buffer
+_CARVE_SIGNATURE = packUint(_ShellLinkHeader.HEADER_SIZE) + _ShellLinkHeader.LINK_CLSID
+_CARVE_SIGNATURE_PATTERN = re.compile(re.escape(_CARVE_SIGNATURE))
+
+def _carveBuffer(buffer, chunkSize: int):
+    size = len(buffer)
+    isMap = isinstance(buffer, mmap.mmap) and hasattr(mmap, "MADV_DONTNEED")
+    chunkSize = max(mmap.PAGESIZE, chunkSize - (chunkSize % mmap.PAGESIZE))
+
+    for chunkStart in range(0, size, chunkSize):
+        # Matches may straddle the chunk end, but only those starting inside this chunk are taken
+        chunkEnd = min(size, chunkStart + chunkSize + len(_CARVE_SIGNATURE) - 1)
+        for match in _CARVE_SIGNATURE_PATTERN.finditer(buffer, chunkStart, chunkEnd):
+            offset = match.start()
+            try:
+                totalSize = LNK.fromBytes(buffer, offset, fields = ()).totalSize
+                if offset + totalSize > size:
+                    continue
+                # Parse the record on its own, so the LNK holds only its bytes, and decode every section to validate it
+                lnk = LNK.fromBytes(bytes(buffer[offset:offset + totalSize]))
+                for name in LNK.SECTIONS:
+                    getattr(lnk, name)
+            except (struct.error, IndexError, UnicodeDecodeError, ValueError):
+                continue # False positive; the structures behind the signature do not parse
+            yield (offset, lnk)
+
+        # Drop the pages of the chunk just scanned so resident memory stays flat over multi-GB maps
+        if isMap:
+            buffer.madvise(mmap.MADV_DONTNEED, chunkStart, min(chunkSize, size - chunkStart))
+
+# BATCH HELPERS END
+# ----------------------------------------------------------------------------------
+
 
 
 ########### MAIN
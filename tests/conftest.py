@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pytest
+
+# main.py and benchmark.py live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark import synthesizeLnk, synthesizeTrackerDataBlock
+
+# A small tree of shortcuts: {relative path: contents}, written under tmp_path; broken.lnk is cut inside its StringData
+LNK_TREE = {
+    "local.lnk": synthesizeLnk(extraData = synthesizeTrackerDataBlock("host-a")),
+    "sub/network.lnk": synthesizeLnk(isNetwork = True, arguments = "/c echo network"),
+    "sub/ansi.lnk": synthesizeLnk(isUnicode = False, arguments = "/c echo ansi"),
+    "broken.lnk": synthesizeLnk()[:200],
+    "notes.txt": b"not a shortcut",
+}
+
+@pytest.fixture
+def lnkTree(tmp_path):
+    for relativePath, contents in LNK_TREE.items():
+        filePath = tmp_path.joinpath(*relativePath.split("/"))
+        filePath.parent.mkdir(parents=True, exist_ok=True)
+        filePath.write_bytes(contents)
+    return tmp_path
@@ -0,0 +1,59 @@
+import asyncio
+import os
+
+import pytest
+
+from conftest import LNK_TREE
+from main import LNK, LNKLimits, LNKParseError
+
+def relativeResults(lnkTree, results):
+    return {os.path.relpath(lnkFilePath, lnkTree).replace(os.sep, "/"): (lnk, error) for lnkFilePath, lnk, error in results}
+
+async def collect(asyncIterator):
+    return [result async for result in asyncIterator]
+
+def testLoadAsync(lnkTree):
+    async def loadAll():
+        return await asyncio.gather(*(LNK.loadAsync(os.path.join(lnkTree, relativePath)) for relativePath in ("local.lnk", "sub/network.lnk", "sub/ansi.lnk")))
+
+    local, network, ansi = asyncio.run(loadAll())
+    assert local.extraData.getBlock("TrackerDataBlock").MachineID == "host-a"
+    assert network.stringData.COMMAND_LINE_ARGUMENTS == "/c echo network"
+    assert ansi.pack() == LNK_TREE["sub/ansi.lnk"]
+
+    lnk = asyncio.run(LNK.loadAsync(os.path.join(lnkTree, "local.lnk"), fields = ("extraData",)))
+    assert lnk.stringData.COMMAND_LINE_ARGUMENTS == ""
+    with pytest.raises(LNKParseError):
+        asyncio.run(LNK.loadAsync(os.path.join(lnkTree, "local.lnk"), limits = LNKLimits(maxFileSize = 16)))
+
+# scanAsync finds and parses what scan() does, whatever the number of reads in flight
+def testScanAsyncMatchesScan(lnkTree):
+    expected = relativeResults(lnkTree, LNK.scan(lnkTree, workers = 1))
+    for concurrency in (1, 3, 64):
+        results = relativeResults(lnkTree, asyncio.run(collect(LNK.scanAsync(lnkTree, concurrency = concurrency))))
+        assert sorted(results) == sorted(expected)
+        for relativePath, (lnk, error) in results.items():
+            assert error == expected[relativePath][1]
+            if lnk != None:
+                assert lnk.pack() == LNK_TREE[relativePath]
+
+    results = relativeResults(lnkTree, asyncio.run(collect(LNK.scanAsync(lnkTree, recursive = False))))
+    assert sorted(results) == ["broken.lnk", "local.lnk"]
+
+def testScanAsyncErrors(lnkTree):
+    paths = [os.path.join(lnkTree, "local.lnk"), os.path.join(lnkTree, "missing.lnk")]
+    results = relativeResults(lnkTree, asyncio.run(collect(LNK.scanAsync(paths))))
+    assert results["local.lnk"][1] == None
+    assert results["missing.lnk"][0] == None and results["missing.lnk"][1].startswith("FileNotFoundError: ")
+
+    results = relativeResults(lnkTree, asyncio.run(collect(LNK.scanAsync(lnkTree, limits = LNKLimits(maxFileSize = 16)))))
+    assert all(lnk == None and error.startswith("LNKParseError: ") for lnk, error in results.values())
+
+# Breaking out early cancels the reads still in flight rather than waiting for them
+def testScanAsyncEarlyExit(lnkTree):
+    async def first():
+        async for result in LNK.scanAsync(lnkTree, concurrency = 2):
+            return result
+
+    lnkFilePath, lnk, error = asyncio.run(first())
+    assert os.path.relpath(lnkFilePath, lnkTree).replace(os.sep, "/") in LNK_TREE
@@ -0,0 +1,43 @@
+import json
+
+import pytest
+
+from benchmark import CORPUS_OPERATIONS, CORPUS_SHAPES, benchmarkCorpora, compareResults, saveResults
+from main import LNK
+
+# Every corpus is made of valid links that round-trip byte for byte, and no two files in one corpus are the same
+@pytest.mark.parametrize("shape", sorted(CORPUS_SHAPES))
+def testCorpusShapes(shape):
+    corpus = [CORPUS_SHAPES[shape](i) for i in range(4)]
+    assert len(set(corpus)) == len(corpus)
+    for contents in corpus:
+        assert LNK.fromBytes(contents).pack() == contents
+    for operation, (prepare, run) in CORPUS_OPERATIONS.items():
+        for item in prepare(corpus):
+            run(item)
+
+def testBenchmarkCorpora():
+    results = benchmarkCorpora(count = 5, repeat = 1, shapes = ["header-only", "network"], operations = ["parse", "pack"])
+    assert [(result["shape"], result["operation"]) for result in results] == [
+        ("header-only", "parse"), ("header-only", "pack"), ("network", "parse"), ("network", "pack"),
+        ]
+    for result in results:
+        assert result["files"] == 5
+        assert result["bytes"] == sum(len(CORPUS_SHAPES[result["shape"]](i)) for i in range(5))
+        assert result["filesPerSecond"] > 0 and result["bytesPerSecond"] > 0
+        assert result["allocatedBlocksPerFile"] >= 0 and result["peakTracedBytes"] > 0
+
+def testSaveAndCompareResults(tmp_path):
+    results = benchmarkCorpora(count = 3, repeat = 1, shapes = ["header-only"], operations = ["parse"])
+    baselinePath = str(tmp_path / "baseline.json")
+    saveResults(results, baselinePath)
+    with open(baselinePath, encoding="utf-8") as baselineFile:
+        saved = json.load(baselineFile)
+    assert saved["results"] == results and "python" in saved and "platform" in saved
+
+    # Twice the throughput, against a baseline that also has a pair the new run lacks
+    faster = [dict(result, filesPerSecond = result["filesPerSecond"] * 2) for result in results]
+    resultsPath = str(tmp_path / "results.json")
+    saveResults(faster, resultsPath)
+    saveResults(results + [dict(results[0], shape = "network")], baselinePath)
+    assert compareResults(baselinePath, resultsPath) == {("header-only", "parse"): pytest.approx(2.0)}
@@ -0,0 +1,47 @@
+import mmap
+
+from benchmark import synthesizeLnk, synthesizeTrackerDataBlock
+from main import LNK
+
+CONTENTS = synthesizeLnk(arguments = "/c echo buffer", extraData = synthesizeTrackerDataBlock("buffer-host"))
+
+def sectionValues(lnk: LNK):
+    return (
+        lnk.shellLinkHeader.LinkFlags,
+        tuple(lnk.linkTargetIdList.itemIdDatas),
+        lnk.linkInfo.LocalBasePath,
+        lnk.stringData.COMMAND_LINE_ARGUMENTS,
+        lnk.extraData.getBlock("TrackerDataBlock").MachineID,
+    )
+
+# Every buffer type, at an offset inside a larger buffer, gives what parsing the link's own bytes gives
+def testParseAtOffset():
+    expected = sectionValues(LNK.fromBytes(CONTENTS))
+    blob = b"\xFF" * 100 + CONTENTS + b"\xEE" * 100
+    for buffer in (blob, bytearray(blob), memoryview(blob)):
+        lnk = LNK.fromBytes(buffer, 100)
+        assert lnk.totalSize == len(CONTENTS)
+        assert sectionValues(lnk) == expected
+        assert lnk.pack() == CONTENTS
+
+# A borrowed buffer is decoded up front and nothing parsed from it aliases it: changing or releasing it afterwards
+# changes nothing
+def testBorrowedBuffersAreNotAliased(tmp_path):
+    expected = sectionValues(LNK.fromBytes(CONTENTS))
+
+    buffer = bytearray(CONTENTS)
+    lnk = LNK.fromBytes(buffer)
+    buffer[:] = bytes(len(buffer))
+    assert sectionValues(lnk) == expected
+    assert lnk._contents == None
+
+    lnkFilePath = tmp_path / "mapped.lnk"
+    lnkFilePath.write_bytes(CONTENTS)
+    lnk = LNK(str(lnkFilePath), useMmap = True) # The map is closed when the constructor returns
+    assert sectionValues(lnk) == expected
+    assert lnk.pack() == CONTENTS
+
+    with open(lnkFilePath, "rb") as lnkFile:
+        with mmap.mmap(lnkFile.fileno(), 0, access=mmap.ACCESS_READ) as lnkFileMap:
+            lnk = LNK.fromBytes(lnkFileMap)
+    assert sectionValues(lnk) == expected
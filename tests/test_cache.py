@@ -0,0 +1,115 @@
+import os
+
+import pytest
+
+from benchmark import synthesizeLnk, synthesizeTrackerDataBlock
+from main import LNK, LNKCache, LNKLimits, LNKParseError
+
+TRACKER_DATA_BLOCK = synthesizeTrackerDataBlock() # Random droids; made once so equal arguments give equal bytes
+
+def writeLnk(lnkFilePath, arguments: str, mtimeNs: int = None):
+    lnkFilePath.write_bytes(synthesizeLnk(arguments = arguments, extraData = TRACKER_DATA_BLOCK))
+    if mtimeNs != None:
+        os.utime(lnkFilePath, ns = (mtimeNs, mtimeNs))
+    return str(lnkFilePath)
+
+def counts(lnkCache: LNKCache):
+    return (lnkCache.hits, lnkCache.contentHits, lnkCache.misses)
+
+def testHitsAndMisses(tmp_path):
+    lnkFilePath = writeLnk(tmp_path / "a.lnk", "/c echo a")
+    copyFilePath = writeLnk(tmp_path / "copy.lnk", "/c echo a")
+    with LNKCache(str(tmp_path / "cache.sqlite")) as lnkCache:
+        first = lnkCache.load(lnkFilePath)
+        assert counts(lnkCache) == (0, 0, 1)
+        second = lnkCache.load(lnkFilePath)
+        assert counts(lnkCache) == (1, 0, 1)
+        lnkCache.load(copyFilePath) # Same bytes under another path
+        assert counts(lnkCache) == (1, 1, 1)
+
+    # Restored links match a fresh parse, across a reopen too
+    fresh = LNK(lnkFilePath)
+    with LNKCache(str(tmp_path / "cache.sqlite")) as lnkCache:
+        third = lnkCache.load(lnkFilePath)
+        assert counts(lnkCache) == (1, 0, 0)
+    for lnk in (first, second, third):
+        assert lnk.toRecord() == fresh.toRecord()
+        assert lnk.extraData.getBlock("TrackerDataBlock").MachineID == "host"
+        assert lnk.pack() == fresh.pack()
+
+# A rewritten file (new size or mtime) is read again; the same bytes with a new mtime are found by their content
+def testInvalidation(tmp_path):
+    with LNKCache(str(tmp_path / "cache.sqlite")) as lnkCache:
+        lnkFilePath = writeLnk(tmp_path / "a.lnk", "/c echo before", 1_000_000_000_000_000_000)
+        assert lnkCache.load(lnkFilePath).stringData.COMMAND_LINE_ARGUMENTS == "/c echo before"
+
+        writeLnk(tmp_path / "a.lnk", "/c echo after!", 1_000_000_000_000_000_000) # Same size and mtime, new ctime
+        assert lnkCache.load(lnkFilePath).stringData.COMMAND_LINE_ARGUMENTS == "/c echo after!"
+        assert counts(lnkCache) == (0, 0, 2)
+
+        writeLnk(tmp_path / "a.lnk", "/c echo before", 2_000_000_000_000_000_000)
+        assert lnkCache.load(lnkFilePath).stringData.COMMAND_LINE_ARGUMENTS == "/c echo before"
+        assert counts(lnkCache) == (0, 1, 2)
+
+def testEviction(tmp_path):
+    lnkFilePaths = [writeLnk(tmp_path / f"link{i}.lnk", f"/c echo {i}") for i in range(10)]
+    recordSize = len(LNKCache._record(LNK(lnkFilePaths[0])))
+    maxBytes = recordSize * 4
+    with LNKCache(str(tmp_path / "cache.sqlite"), maxBytes = maxBytes) as lnkCache:
+        for lnkFilePath in lnkFilePaths:
+            lnkCache.load(lnkFilePath)
+        assert lnkCache._totalBytes() <= maxBytes
+        assert lnkCache.connection.execute("SELECT COUNT(*) FROM records").fetchone()[0] < 10
+
+        # The oldest record went first; its file row went with it
+        lnkCache.load(lnkFilePaths[-1])
+        lnkCache.load(lnkFilePaths[0])
+        assert counts(lnkCache) == (1, 0, 11)
+
+    # Reopened with a smaller maxBytes, it shrinks right away
+    with LNKCache(str(tmp_path / "cache.sqlite"), maxBytes = recordSize) as lnkCache:
+        assert lnkCache._totalBytes() <= recordSize
+        assert lnkCache.connection.execute("SELECT COALESCE(SUM(size), 0) FROM records").fetchone()[0] == lnkCache._totalBytes()
+
+# Records from a lenient parse are not used in strict mode; strict records are checked against the caller's limits
+def testStrictRecords(tmp_path):
+    lnkFilePath = writeLnk(tmp_path / "a.lnk", "/c echo strict")
+    with LNKCache(str(tmp_path / "cache.sqlite")) as lnkCache:
+        lnkCache.load(lnkFilePath)
+        lnkCache.load(lnkFilePath, limits = LNKLimits())
+        assert counts(lnkCache) == (0, 0, 2)
+        lnk = lnkCache.load(lnkFilePath, limits = LNKLimits())
+        assert counts(lnkCache) == (1, 0, 2)
+        assert lnk.extraData.strict
+
+        with pytest.raises(LNKParseError):
+            lnkCache.load(lnkFilePath, limits = LNKLimits(maxItemIds = 2))
+        with pytest.raises(LNKParseError):
+            lnkCache.load(lnkFilePath, limits = LNKLimits(maxExtraDataBlocks = 0))
+        with pytest.raises(LNKParseError):
+            lnkCache.load(lnkFilePath, limits = LNKLimits(maxFileSize = 16))
+
+        lnkCache.load(lnkFilePath) # Strict records serve lenient loads as well
+        assert counts(lnkCache) == (4, 0, 2)
+
+def testFields(tmp_path):
+    lnkFilePath = writeLnk(tmp_path / "a.lnk", "/c echo fields")
+    with LNKCache(str(tmp_path / "cache.sqlite")) as lnkCache:
+        for i in range(2): # Miss, then hit
+            lnk = lnkCache.load(lnkFilePath, fields = ("stringData",))
+            assert lnk.stringData.COMMAND_LINE_ARGUMENTS == "/c echo fields"
+            assert lnk.linkInfo.LocalBasePath == None
+            with pytest.raises(ValueError):
+                lnk.pack()
+        assert counts(lnkCache) == (1, 0, 1)
+        assert lnkCache.load(lnkFilePath).pack() == LNK(lnkFilePath).pack()
+
+def testUnparsableFilesAreNotCached(tmp_path):
+    lnkFilePath = tmp_path / "broken.lnk"
+    lnkFilePath.write_bytes(b"\x4C\x00\x00")
+    with LNKCache(str(tmp_path / "cache.sqlite")) as lnkCache:
+        for i in range(2):
+            with pytest.raises(Exception):
+                lnkCache.load(str(lnkFilePath))
+        assert counts(lnkCache) == (0, 0, 2)
+        assert lnkCache.connection.execute("SELECT COUNT(*) FROM records").fetchone()[0] == 0
@@ -0,0 +1,48 @@
+import mmap
+
+from benchmark import synthesizeLnk
+from main import LNK
+
+CONTENTS = synthesizeLnk(arguments = "/c echo carved")
+
+# Two links, one straddling the first page boundary, and a header whose structures run into garbage
+def synthesizeBlob():
+    blob = bytearray(b"\xAB" * (4 * mmap.PAGESIZE))
+    blob[1000:1000 + len(CONTENTS)] = CONTENTS
+    straddling = mmap.PAGESIZE - 50
+    blob[straddling:straddling + len(CONTENTS)] = CONTENTS
+    falsePositive = 2 * mmap.PAGESIZE
+    blob[falsePositive:falsePositive + 200] = CONTENTS[:200]
+    return bytes(blob), [1000, straddling]
+
+def carvedOffsets(carved):
+    offsets = []
+    for offset, lnk in carved:
+        assert lnk.pack() == CONTENTS
+        assert lnk.stringData.COMMAND_LINE_ARGUMENTS == "/c echo carved"
+        offsets.append(offset)
+    return offsets
+
+# A blob in memory, borrowed or owned, and the same blob on disk give the same, validated links
+def testCarve(tmp_path):
+    blob, expected = synthesizeBlob()
+    blobPath = tmp_path / "blob.bin"
+    blobPath.write_bytes(blob)
+
+    assert carvedOffsets(LNK.carve(blob, chunkSize = mmap.PAGESIZE)) == expected
+    assert carvedOffsets(LNK.carve(memoryview(blob), chunkSize = mmap.PAGESIZE)) == expected
+    assert carvedOffsets(LNK.carve(str(blobPath), chunkSize = mmap.PAGESIZE)) == expected
+    assert carvedOffsets(LNK.carve(str(blobPath))) == expected
+
+# A carved link holds only its own bytes, not the blob it was found in
+def testCarvedLinkDoesNotHoldBlob():
+    blob, expected = synthesizeBlob()
+    for offset, lnk in LNK.carve(blob):
+        assert lnk._contents == None
+        assert sum(len(contents) for snapshot, contents in lnk._packCache.values()) == len(CONTENTS)
+
+def testCarveEmpty(tmp_path):
+    emptyPath = tmp_path / "empty.bin"
+    emptyPath.write_bytes(b"")
+    assert list(LNK.carve(str(emptyPath))) == []
+    assert list(LNK.carve(b"\x00" * 1000)) == []
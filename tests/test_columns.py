@@ -0,0 +1,37 @@
+import pytest
+
+from benchmark import FILETIME_2020
+from conftest import LNK_TREE
+from main import LNK, LNKColumns
+
+def testColumns(lnkTree):
+    lnkColumns = LNKColumns.fromResults(sorted(LNK.scan(lnkTree, workers = 1), key = lambda result: result[0]))
+    assert lnkColumns.rowCount == 4
+    paths = [path.replace("\\", "/").rsplit("/", 1)[-1] for path in lnkColumns.getColumn("path")]
+    assert paths == ["broken.lnk", "local.lnk", "ansi.lnk", "network.lnk"]
+
+    errors = lnkColumns.getColumn("error")
+    assert errors[0].startswith("StructError: ") and errors[1:] == ["", "", ""]
+    assert list(lnkColumns.getColumn("CreationFiletime")) == [0, FILETIME_2020, FILETIME_2020, FILETIME_2020]
+    assert lnkColumns.getColumn("COMMAND_LINE_ARGUMENTS") == ["", "/c echo hello", "/c echo ansi", "/c echo network"]
+    assert lnkColumns.getColumn("TargetPath")[1] == "C:\\Windows\\System32\\cmd.exe"
+    assert lnkColumns.getColumn("LinkFlags")[1] == LNK.fromBytes(LNK_TREE["local.lnk"]).shellLinkHeader.LinkFlags
+
+# Saved and loaded back, every column is the same
+def testSaveLoad(lnkTree, tmp_path):
+    lnkColumns = LNKColumns.fromResults(LNK.scan(lnkTree, workers = 1))
+    lnkColumns.append(LNK.fromBytes(LNK_TREE["local.lnk"]), "caf\u00e9 \U0001F600.lnk")
+    columnsPath = tmp_path / "links.lnkcol"
+    lnkColumns.save(str(columnsPath))
+
+    loaded = LNKColumns.load(str(columnsPath))
+    assert loaded.rowCount == lnkColumns.rowCount == 5
+    for name, typeCode in LNKColumns.COLUMNS:
+        assert loaded.getColumn(name) == lnkColumns.getColumn(name)
+    assert loaded.getColumn("path")[-1] == "caf\u00e9 \U0001F600.lnk"
+
+def testLoadNotColumnar(tmp_path):
+    notColumnarPath = tmp_path / "links.csv"
+    notColumnarPath.write_bytes(b"path,error\n")
+    with pytest.raises(ValueError):
+        LNKColumns.load(str(notColumnarPath))
@@ -0,0 +1,94 @@
+import threading
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmark import synthesizeLnk, synthesizeTrackerDataBlock
+from main import LNK
+
+THREADS = 8
+
+def sectionValues(lnk: LNK):
+    return (
+        tuple(lnk.linkTargetIdList.itemIdDatas),
+        lnk.linkInfo.LocalBasePath,
+        lnk.stringData.COMMAND_LINE_ARGUMENTS,
+        lnk.extraData.getBlock("TrackerDataBlock").MachineID,
+        lnk.getTargetPath(),
+    )
+
+# Many threads released at once onto the lazy sections of one LNK: each section is decoded to one object that every
+# thread sees, with the values a single-threaded parse gives, and the source buffer is let go at the end
+def testSharedInstanceLazySections():
+    contents = synthesizeLnk(arguments = "/c echo shared", extraData = synthesizeTrackerDataBlock("shared"))
+    expected = sectionValues(LNK.fromBytes(contents))
+
+    for iteration in range(200):
+        lnk = LNK.fromBytes(contents)
+        barrier = threading.Barrier(THREADS)
+
+        def race(index: int):
+            barrier.wait()
+            # Threads walk the sections in different orders, so decodes of different sections overlap too
+            names = LNK.SECTIONS[index % len(LNK.SECTIONS):] + LNK.SECTIONS[:index % len(LNK.SECTIONS)]
+            sections = {name: getattr(lnk, name) for name in names}
+            return ([id(sections[name]) for name in LNK.SECTIONS], sectionValues(lnk))
+
+        with ThreadPoolExecutor(max_workers=THREADS) as executor:
+            results = list(executor.map(race, range(THREADS)))
+
+        assert all(sectionIds == results[0][0] for sectionIds, values in results), "a section was decoded twice"
+        assert all(values == expected for sectionIds, values in results)
+        assert lnk._contents == None
+        assert lnk.pack() == contents
+
+# Every thread is held inside _buildSection until all of them are there, so they all decode the same section at once:
+# they must still get one and the same object (an edit to a second one would be lost at pack time), and decodes on
+# different LNKs must not wait on each other for that to hold
+def testOverlappingDecodesPublishOneSection(monkeypatch):
+    contents = synthesizeLnk(arguments = "/c echo overlap")
+    barrier = threading.Barrier(THREADS, timeout = 10)
+    buildSection = LNK._buildSection
+
+    def overlappingBuildSection(self, name, offset, contents):
+        barrier.wait() # BrokenBarrierError if the decodes are serialized
+        return buildSection(self, name, offset, contents)
+
+    monkeypatch.setattr(LNK, "_buildSection", overlappingBuildSection)
+
+    lnk = LNK.fromBytes(contents)
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        stringDatas = list(executor.map(lambda index: lnk.stringData, range(THREADS)))
+    assert all(stringData is lnk.stringData for stringData in stringDatas)
+
+    lnks = [LNK.fromBytes(contents) for i in range(THREADS)]
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        linkInfos = list(executor.map(lambda lnk: lnk.linkInfo, lnks))
+    assert all(linkInfo is lnk.linkInfo for linkInfo, lnk in zip(linkInfos, lnks))
+
+    monkeypatch.undo()
+    lnk.stringData.COMMAND_LINE_ARGUMENTS = "/c echo edited"
+    assert LNK.fromBytes(lnk.pack()).stringData.COMMAND_LINE_ARGUMENTS == "/c echo edited"
+
+# Parse-and-discard from several threads; retained memory must not grow with the number of links parsed
+def testThreadedParsingMemoryBounded():
+    corpus = [synthesizeLnk(isUnicode = i % 2 == 0, isNetwork = i % 3 == 0, arguments = f"/c echo {i}") for i in range(THREADS)]
+
+    def parseBatch(index: int):
+        for i in range(500):
+            lnk = LNK.fromBytes(corpus[index])
+            for name in LNK.SECTIONS:
+                getattr(lnk, name)
+            lnk.getTargetPath()
+
+    tracemalloc.start()
+    try:
+        with ThreadPoolExecutor(max_workers=THREADS) as executor:
+            list(executor.map(parseBatch, range(THREADS))) # Warm-up: caches, interned strings, thread state
+            retainedBefore = tracemalloc.get_traced_memory()[0]
+            for batch in range(5):
+                list(executor.map(parseBatch, range(THREADS)))
+            retainedAfter = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+    assert retainedAfter - retainedBefore < 64 * 1024, "memory grows with the number of parsed links"
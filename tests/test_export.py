@@ -0,0 +1,43 @@
+import csv
+import io
+import json
+
+import pytest
+
+from conftest import LNK_TREE
+from main import LNK
+
+def testExportJsonLines(lnkTree):
+    outFile = io.StringIO()
+    count = LNK.export(LNK.scan(lnkTree, workers = 1), outFile, bufferRecords = 2)
+    records = {record["path"].replace("\\", "/").rsplit("/", 1)[-1]: record for record in map(json.loads, outFile.getvalue().splitlines())}
+    assert count == len(records) == 4
+
+    assert records["broken.lnk"].keys() == {"path", "error"}
+    assert records["broken.lnk"]["error"].startswith("StructError: ")
+
+    record = records["local.lnk"]
+    assert list(record) == list(LNK.RECORD_FIELDS)
+    assert record["error"] == None
+    assert record["TargetPath"] == "C:\\Windows\\System32\\cmd.exe"
+    assert record["COMMAND_LINE_ARGUMENTS"] == "/c echo hello"
+    assert record["MachineID"] == "host-a"
+    assert record["LinkFlags"].split("|")[:2] == ["HasLinkTargetIDList", "HasLinkInfo"]
+    assert records["network.lnk"]["NetName"] == "\\\\SERVER\\share"
+
+def testExportCsv(lnkTree, tmp_path):
+    csvPath = tmp_path / "links.csv"
+    assert LNK.export(LNK.scan(lnkTree, workers = 1), str(csvPath), format = "csv") == 4
+    with open(csvPath, encoding="utf-8", newline="") as csvFile:
+        rows = list(csv.DictReader(csvFile))
+    assert len(rows) == 4
+    assert list(rows[0]) == list(LNK.RECORD_FIELDS)
+    assert sorted(row["COMMAND_LINE_ARGUMENTS"] for row in rows) == ["", "/c echo ansi", "/c echo hello", "/c echo network"]
+
+def testExportLinks():
+    outFile = io.StringIO()
+    assert LNK.export([LNK.fromBytes(LNK_TREE["local.lnk"])], outFile) == 1
+    assert json.loads(outFile.getvalue())["path"] == None
+
+    with pytest.raises(ValueError):
+        LNK.export([], io.StringIO(), format = "xml")
@@ -0,0 +1,51 @@
+import struct
+
+import pytest
+
+from benchmark import synthesizeLnk, synthesizeTrackerDataBlock
+from main import LNK, LNKLimits, LNKParseError, _ExtraDataBlock, _TrackerDataBlock
+
+UNKNOWN_BLOCK = struct.pack("<II", 12, 0xA00000FF) + b"\x01\x02\x03\x04"
+
+def testBlocksInFileOrder():
+    contents = synthesizeLnk(extraData = synthesizeTrackerDataBlock("first") + UNKNOWN_BLOCK + synthesizeTrackerDataBlock("second"))
+    lnk = LNK.fromBytes(contents)
+    blocks = lnk.extraData.getBlocks()
+    assert [block.BlockSignature for block in blocks] == [0xA0000003, 0xA00000FF, 0xA0000003]
+    assert [blocks[0].MachineID, blocks[2].MachineID] == ["first", "second"]
+    assert lnk.extraData.getBlock("TrackerDataBlock") is blocks[0]
+    assert isinstance(blocks[1], _ExtraDataBlock) and blocks[1].BlockData == b"\x01\x02\x03\x04"
+    assert lnk.extraData.getBlock("ShimDataBlock") == None
+
+# Duplicate signatures and unknown blocks are written back byte for byte, decoded or not
+def testDuplicateAndUnknownBlocksKept():
+    contents = synthesizeLnk(extraData = synthesizeTrackerDataBlock("first") + UNKNOWN_BLOCK + synthesizeTrackerDataBlock("second"))
+    lnk = LNK.fromBytes(contents)
+    lnk.extraData.getBlocks()
+    assert lnk.pack() == contents
+
+def testSetAndRemoveBlock():
+    lnk = LNK.fromBytes(synthesizeLnk(extraData = synthesizeTrackerDataBlock("first") + UNKNOWN_BLOCK + synthesizeTrackerDataBlock("second")))
+    trackerDataBlock = _TrackerDataBlock()
+    trackerDataBlock.MachineID = "replaced"
+    lnk.extraData.setBlock(trackerDataBlock)
+    reparsed = LNK.fromBytes(lnk.pack())
+    assert [block.MachineID for block in reparsed.extraData.getBlocks() if isinstance(block, _TrackerDataBlock)] == ["replaced", "second"]
+
+    lnk.extraData.removeBlock("TrackerDataBlock")
+    reparsed = LNK.fromBytes(lnk.pack())
+    assert [block.BlockSignature for block in reparsed.extraData.getBlocks()] == [0xA00000FF]
+
+# A block too small for its signature (BlockSize 4 to 7) ends the block walk; it and what follows are kept as they are
+def testMalformedBlockKeptAsTail():
+    malformed = struct.pack("<I", 6) + b"\xAA\xBB"
+    contents = synthesizeLnk(extraData = synthesizeTrackerDataBlock() + malformed + UNKNOWN_BLOCK)
+    lnk = LNK.fromBytes(contents)
+    assert [block.BlockSignature for block in lnk.extraData.getBlocks()] == [0xA0000003]
+    assert lnk.pack() == contents
+    lnk.extraData.getBlock("TrackerDataBlock").MachineID = "edited"
+    assert lnk.pack().endswith(malformed + UNKNOWN_BLOCK + b"\x00\x00\x00\x00")
+
+    with pytest.raises(LNKParseError) as excInfo:
+        LNK.fromBytes(contents, limits = LNKLimits())
+    assert excInfo.value.section == "extraData"
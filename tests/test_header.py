@@ -0,0 +1,35 @@
+import struct
+
+from benchmark import FILETIME_2020, synthesizeHeader
+from main import _FILE_ATTRIBUTES, _LINK_FLAGS, _ShellLinkHeader
+
+# Every named bit reads from its own position, least significant bit first as [MS-SHLLINK] numbers them
+def testFlagBits():
+    for bitmaskName, bits in (("LinkFlags", _LINK_FLAGS), ("FileAttributes", _FILE_ATTRIBUTES)):
+        for name, mask in bits:
+            contents = synthesizeHeader(linkFlags = mask if bitmaskName == "LinkFlags" else 0, fileAttributes = mask if bitmaskName == "FileAttributes" else 0)
+            shellLinkHeader = _ShellLinkHeader(contents)
+            assert getattr(shellLinkHeader, bitmaskName) == mask
+            assert [otherName for otherName, otherMask in bits if getattr(shellLinkHeader, otherName)] == [name]
+
+    shellLinkHeader = _ShellLinkHeader(synthesizeHeader(linkFlags = 0x81))
+    assert shellLinkHeader.HasLinkTargetIDList and shellLinkHeader.IsUnicode and not shellLinkHeader.HasLinkInfo
+
+def testFields():
+    contents = struct.pack(
+        "<I16sIIQQQIiIBB10x",
+        0x4C, _ShellLinkHeader.LINK_CLSID, 0x9B, 0x20, FILETIME_2020, FILETIME_2020 + 1, FILETIME_2020 + 2, 4096, -3, 7, 0x41, 0x02
+        )
+    shellLinkHeader = _ShellLinkHeader(b"\x00" * 8 + contents, 8)
+    assert shellLinkHeader.HeaderSize == 0x4C
+    assert shellLinkHeader.LinkCLSID == _ShellLinkHeader.LINK_CLSID
+    assert (shellLinkHeader.CreationFiletime, shellLinkHeader.AccessFiletime, shellLinkHeader.WriteFiletime) == (FILETIME_2020, FILETIME_2020 + 1, FILETIME_2020 + 2)
+    assert shellLinkHeader.CreationTime == 1577836800.0 # 2020-01-01T00:00:00Z
+    assert (shellLinkHeader.FileSize, shellLinkHeader.IconIndex, shellLinkHeader.ShowCommand) == (4096, -3, 7)
+    assert shellLinkHeader.HotkeyFlags == [0x41, 0x02]
+    assert shellLinkHeader.pack() == contents
+
+def testDefaultHeader():
+    shellLinkHeader = _ShellLinkHeader()
+    assert shellLinkHeader.pack() == struct.pack("<I16sIIQQQIiIBB10x", 0x4C, _ShellLinkHeader.LINK_CLSID, 0, 0, 0, 0, 0, 0, 0, 1, 0, 0)
+    assert _ShellLinkHeader(shellLinkHeader.pack()).ShowCommand == 1
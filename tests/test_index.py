@@ -0,0 +1,62 @@
+import struct
+
+from benchmark import synthesizeHeader, synthesizeIdList, synthesizeItemIdDatas, synthesizeLnk, synthesizeStringData, synthesizeTrackerDataBlock
+from main import LNK, LNKIndex
+
+# LinkInfo with both VolumeIDAndLocalBasePath and CommonNetworkRelativeLinkAndPathSuffix (LinkInfoFlags = 3)
+def synthesizeLinkInfoLocalAndNetwork(localBasePath: str, netName: str, commonPathSuffix: str):
+    volumeId = struct.pack("<IIII", 16 + 3, 3, 0x1234ABCD, 0x10) + b"OS\x00"
+    localBasePathEncoded = localBasePath.encode("ascii") + b"\x00"
+    netNameEncoded = netName.encode("ascii") + b"\x00"
+    commonNetworkRelativeLink = struct.pack("<IIIII", 0x14 + len(netNameEncoded), 2, 0x14, 0, 0x00020000) + netNameEncoded
+    volumeIdOffset = 0x1C
+    localBasePathOffset = volumeIdOffset + len(volumeId)
+    commonNetworkRelativeLinkOffset = localBasePathOffset + len(localBasePathEncoded)
+    commonPathSuffixOffset = commonNetworkRelativeLinkOffset + len(commonNetworkRelativeLink)
+    commonPathSuffixEncoded = commonPathSuffix.encode("ascii") + b"\x00"
+    linkInfoSize = commonPathSuffixOffset + len(commonPathSuffixEncoded)
+    return (
+        struct.pack("<IIIIIII", linkInfoSize, 0x1C, 3, volumeIdOffset, localBasePathOffset, commonNetworkRelativeLinkOffset, commonPathSuffixOffset)
+        + volumeId + localBasePathEncoded + commonNetworkRelativeLink + commonPathSuffixEncoded
+        )
+
+def synthesizeLocalAndNetworkLnk():
+    return (
+        synthesizeHeader(linkFlags = 0x01 | 0x02 | 0x80)
+        + synthesizeIdList(synthesizeItemIdDatas())
+        + synthesizeLinkInfoLocalAndNetwork("C:\\share\\", "\\\\SERVER\\share", "tool.exe")
+        + b"\x00\x00\x00\x00" # TerminalBlock
+        )
+
+def testPointingAtAndUnder():
+    lnkIndex = LNKIndex.fromResults([
+        ("local.lnk", LNK.fromBytes(synthesizeLnk()), None),
+        ("network.lnk", LNK.fromBytes(synthesizeLnk(isNetwork = True)), None),
+        ("failed.lnk", None, "LNKParseError: bad"),
+        ])
+
+    assert len(lnkIndex) == 2
+    assert lnkIndex.pointingAt("c:/windows/system32/CMD.EXE") == ["local.lnk"]
+    assert lnkIndex.pointingUnder("C:\\Windows") == ["local.lnk"]
+    assert lnkIndex.pointingUnder("C:\\Win") == [] # Whole components only
+    assert lnkIndex.pointingUnder("\\\\server") == ["network.lnk"]
+    assert lnkIndex.onVolume(0x1234ABCD) == ["local.lnk"]
+
+def testFromMachine():
+    lnkIndex = LNKIndex()
+    lnkIndex.add(LNK.fromBytes(synthesizeLnk(extraData = synthesizeTrackerDataBlock("Host-A"))), "a.lnk")
+    lnkIndex.add(LNK.fromBytes(synthesizeLnk(extraData = synthesizeTrackerDataBlock("host-b"))), "b.lnk")
+    assert lnkIndex.fromMachine("HOST-a") == ["a.lnk"]
+    assert lnkIndex.fromMachine("host-c") == []
+
+# A link with both a local path and a UNC path is found by either
+def testLocalAndNetworkPaths():
+    lnk = LNK.fromBytes(synthesizeLocalAndNetworkLnk())
+    assert lnk.getLinkInfoPaths() == ("C:\\share\\tool.exe", "\\\\SERVER\\share\\tool.exe")
+    assert lnk.getTargetPath() == "C:\\share\\tool.exe"
+
+    lnkIndex = LNKIndex()
+    lnkIndex.add(lnk, "both.lnk")
+    assert lnkIndex.pointingAt("C:\\share\\tool.exe") == ["both.lnk"]
+    assert lnkIndex.pointingUnder("\\\\SERVER\\share") == ["both.lnk"]
+    assert lnkIndex.pointingAt("\\\\server\\share\\tool.exe") == ["both.lnk"]
@@ -0,0 +1,50 @@
+import pickle
+
+import pytest
+
+from benchmark import synthesizeLnk, synthesizeTrackerDataBlock
+from main import LNK
+
+CONTENTS = synthesizeLnk(arguments = "/c echo lazy", extraData = synthesizeTrackerDataBlock("lazy-host"))
+
+# Owned bytes are decoded section by section, as asked for, and let go once the last one is decoded
+def testSectionsDecodedOnDemand():
+    lnk = LNK.fromBytes(CONTENTS)
+    assert all(name not in lnk.__dict__ for name in LNK.SECTIONS)
+    assert lnk._contents is CONTENTS
+
+    assert lnk.stringData.COMMAND_LINE_ARGUMENTS == "/c echo lazy"
+    assert "stringData" in lnk.__dict__ and "linkInfo" not in lnk.__dict__
+    assert lnk._contents is CONTENTS
+
+    for name in LNK.SECTIONS:
+        getattr(lnk, name)
+    assert lnk._contents == None
+    assert lnk.pack() == CONTENTS
+
+def testFields():
+    lnk = LNK.fromBytes(CONTENTS, fields = ("stringData",))
+    assert lnk.stringData.COMMAND_LINE_ARGUMENTS == "/c echo lazy"
+    assert lnk.linkInfo.LocalBasePath == None # Skipped: an empty section, never decoded
+    assert lnk._contents == None # Nothing requested is left to decode
+    with pytest.raises(ValueError):
+        lnk.pack()
+
+    with pytest.raises(ValueError):
+        LNK.fromBytes(CONTENTS, fields = ("stringData", "nonsense"))
+
+# A header-only link keeps no more than its header; pickling it (as scan() results are) sends no raw file along
+def testHeaderOnly():
+    blob = CONTENTS + b"\x00" * 100000
+    lnk = LNK.fromBytes(blob, fields = ())
+    assert lnk._contents == None
+    assert lnk.totalSize == len(CONTENTS)
+    assert lnk.shellLinkHeader.HasLinkInfo
+    assert len(pickle.dumps(lnk)) < 2048
+
+def testFromPathWithFields(tmp_path):
+    lnkFilePath = tmp_path / "lazy.lnk"
+    lnkFilePath.write_bytes(CONTENTS)
+    lnk = LNK(str(lnkFilePath), fields = ("extraData",))
+    assert lnk.extraData.getBlock("TrackerDataBlock").MachineID == "lazy-host"
+    assert lnk.stringData.COMMAND_LINE_ARGUMENTS == ""
@@ -0,0 +1,90 @@
+import json
+import pickle
+
+from benchmark import synthesizeLnk, synthesizeTrackerDataBlock
+from conftest import LNK_TREE
+from main import LNK, LNKMetrics
+
+CONTENTS = synthesizeLnk(extraData = synthesizeTrackerDataBlock())
+
+def parseEditAndPack(contents: bytes):
+    lnk = LNK.fromBytes(contents)
+    for name in LNK.SECTIONS:
+        getattr(lnk, name)
+    lnk.stringData.COMMAND_LINE_ARGUMENTS = "/c echo measured"
+    return lnk.pack()
+
+def counts(metrics: LNKMetrics):
+    return {key: entry.count for key, entry in metrics.entries.items()}
+
+def testRecordsWhileEnabledOnly():
+    assert LNKMetrics.active() == None
+    with LNKMetrics() as metrics:
+        assert LNKMetrics.active() is metrics
+        parseEditAndPack(CONTENTS)
+    assert LNKMetrics.active() == None
+    parseEditAndPack(CONTENTS) # Not recorded
+
+    assert counts(metrics) == {
+        ("parse", "shellLinkHeader"): 1, ("locate", "sections"): 1,
+        ("parse", "linkTargetIdList"): 1, ("parse", "linkInfo"): 1, ("parse", "stringData"): 1, ("parse", "extraData"): 1,
+        ("copy", "shellLinkHeader"): 1, ("copy", "linkTargetIdList"): 1, ("copy", "linkInfo"): 1, ("pack", "stringData"): 1, ("copy", "extraData"): 1,
+        }
+    assert metrics.get("parse", "shellLinkHeader").bytes == 0x4C
+    assert metrics.get("locate", "sections").bytes == len(CONTENTS) - 0x4C
+    assert metrics.get("pack", "stringData").nanoseconds > 0
+    assert metrics.get("pack", "linkInfo") == None
+
+def testEnableAndNesting():
+    outer = LNKMetrics.enable()
+    try:
+        with LNKMetrics() as inner:
+            LNK.fromBytes(CONTENTS)
+        assert LNKMetrics.active() is outer
+        LNK.fromBytes(CONTENTS)
+        LNK.fromBytes(CONTENTS)
+    finally:
+        assert LNKMetrics.disable() is outer
+    assert LNKMetrics.active() == None
+    assert inner.get("parse", "shellLinkHeader").count == 1
+    assert outer.get("parse", "shellLinkHeader").count == 2
+
+    outer.reset()
+    assert outer.entries == {}
+
+def testMergeAndPickle():
+    with LNKMetrics() as first:
+        parseEditAndPack(CONTENTS)
+    with LNKMetrics() as second:
+        parseEditAndPack(CONTENTS)
+        parseEditAndPack(CONTENTS)
+
+    copied = pickle.loads(pickle.dumps(second))
+    assert copied.toDict() == second.toDict()
+
+    merged = LNKMetrics().merge(first).merge(copied)
+    entry = merged.get("parse", "stringData")
+    assert entry.count == 3
+    assert entry.bytes == 3 * first.get("parse", "stringData").bytes
+    assert entry.nanoseconds == first.get("parse", "stringData").nanoseconds + second.get("parse", "stringData").nanoseconds
+    assert entry.maxNanoseconds == max(first.get("parse", "stringData").maxNanoseconds, second.get("parse", "stringData").maxNanoseconds)
+
+    toDict = json.loads(json.dumps(merged.toDict()))
+    assert toDict["pack/stringData"]["count"] == 3
+    assert sorted(toDict["pack/stringData"]) == ["allocatedBlocks", "bytes", "count", "maxNanoseconds", "nanoseconds"]
+    lines = merged.summary().splitlines()
+    assert lines[0].startswith("operation/section") and len(lines) == 1 + len(merged.entries)
+
+# Worker processes measure their chunks and send the registries back to the enabled one
+def testPooledScanIsMeasured(lnkTree):
+    lnkFiles = [relativePath for relativePath in LNK_TREE if relativePath.endswith(".lnk")]
+    with LNKMetrics() as metrics:
+        results = list(LNK.scan(str(lnkTree), workers = 2, chunkSize = 1))
+    assert len(results) == len(lnkFiles)
+    assert metrics.get("read", "file").count == len(lnkFiles)
+    assert metrics.get("read", "file").bytes == sum(len(LNK_TREE[relativePath]) for relativePath in lnkFiles)
+    assert metrics.get("parse", "shellLinkHeader").count == len(lnkFiles)
+
+    # Without a registry enabled, none is left enabled afterwards either
+    list(LNK.scan(str(lnkTree), workers = 2, chunkSize = 1))
+    assert LNKMetrics.active() == None
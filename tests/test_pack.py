@@ -0,0 +1,102 @@
+import mmap
+import os
+
+from benchmark import synthesizeHeader, synthesizeLnk, synthesizeTrackerDataBlock
+from main import LNK, LNKCache, LNKLimits
+
+# A link whose header has Reserved1 set: packing the header's fields alone would write zeros there
+def synthesizeNonCanonicalLnk():
+    contents = bytearray(synthesizeLnk(extraData = synthesizeTrackerDataBlock()))
+    contents[0x42] = 0x01
+    return bytes(contents)
+
+def decodeAll(lnk: LNK):
+    for name in LNK.SECTIONS:
+        getattr(lnk, name)
+    return lnk
+
+def testPackFreshLink():
+    lnk = LNK()
+    lnk.shellLinkHeader.IsUnicode = True
+    lnk.shellLinkHeader.HasArguments = True
+    lnk.stringData.COMMAND_LINE_ARGUMENTS = "hello"
+    packed = lnk.pack()
+    assert LNK.fromBytes(packed).stringData.COMMAND_LINE_ARGUMENTS == "hello"
+    assert lnk.pack() == packed
+
+def testPackIntoOffset():
+    contents = synthesizeLnk()
+    lnk = LNK.fromBytes(contents)
+    buffer = bytearray(8 + len(contents))
+    assert lnk.packInto(buffer, 8) == buffer
+    assert bytes(buffer[8:]) == contents
+
+# Reserved and non-canonical bytes survive every way of parsing, whether or not the source buffer is still held
+def testNonCanonicalBytesRoundTrip(tmp_path):
+    contents = synthesizeNonCanonicalLnk()
+    lnkFilePath = os.path.join(tmp_path, "reserved.lnk")
+    with open(lnkFilePath, "wb") as lnkFile:
+        lnkFile.write(contents)
+
+    assert LNK.fromBytes(contents).pack() == contents
+    assert decodeAll(LNK.fromBytes(contents)).pack() == contents
+    assert LNK.fromBytes(memoryview(contents)).pack() == contents
+    assert LNK.fromBytes(bytearray(contents)).pack() == contents
+    assert LNK.fromBytes(contents, limits = LNKLimits()).pack() == contents
+    assert LNK(lnkFilePath).pack() == contents
+    assert LNK(lnkFilePath, useMmap = True).pack() == contents
+
+    with open(lnkFilePath, "rb") as lnkFile:
+        with mmap.mmap(lnkFile.fileno(), 0, access=mmap.ACCESS_READ) as lnkFileMap:
+            with memoryview(lnkFileMap) as view:
+                lnk = LNK.fromBytes(view)
+    assert lnk.pack() == contents
+
+    with LNKCache(os.path.join(tmp_path, "cache.sqlite")) as lnkCache:
+        assert lnkCache.load(lnkFilePath).pack() == contents # Miss
+        assert lnkCache.load(lnkFilePath).pack() == contents # Hit
+        assert lnkCache.hits == 1 and lnkCache.misses == 1
+
+# Unchanged sections are copied, not re-serialized; only what was edited is packed again
+def testDirtySections():
+    contents = synthesizeNonCanonicalLnk()
+    for lnk in (LNK.fromBytes(contents), decodeAll(LNK.fromBytes(contents)), LNK.fromBytes(memoryview(contents))):
+        assert lnk.dirtySections() == []
+        lnk.stringData.COMMAND_LINE_ARGUMENTS = "/c echo edited"
+        assert lnk.dirtySections() == ["stringData"]
+        packed = lnk.pack()
+        assert packed[0x42] == 0x01
+        assert LNK.fromBytes(packed).stringData.COMMAND_LINE_ARGUMENTS == "/c echo edited"
+        assert lnk.dirtySections() == []
+
+    lnk = LNK.fromBytes(contents)
+    lnk.shellLinkHeader.IconIndex = 3
+    assert lnk.dirtySections() == ["shellLinkHeader"]
+    assert LNK.fromBytes(lnk.pack()).shellLinkHeader.IconIndex == 3
+
+# Flipping IsUnicode rewrites the strings in the other encoding
+def testPackIsUnicodeChange():
+    lnk = LNK.fromBytes(synthesizeLnk(isUnicode = True))
+    lnk.shellLinkHeader.IsUnicode = False
+    reparsed = LNK.fromBytes(lnk.pack())
+    assert reparsed.shellLinkHeader.IsUnicode == False
+    assert reparsed.stringData.COMMAND_LINE_ARGUMENTS == "/c echo hello"
+
+def testPackHeaderOnly():
+    contents = synthesizeHeader(linkFlags = 0) + b"\x00\x00\x00\x00"
+    assert LNK.fromBytes(contents).pack() == contents
+
+# Large sections (a long IDList, a 32k-character argument string) serialize into one buffer and parse back the same
+def testPackLargeLink(tmp_path):
+    lnk = decodeAll(LNK.fromBytes(synthesizeLnk(arguments = "a" * 32000)))
+    lnk.linkTargetIdList.itemIdDatas = lnk.linkTargetIdList.itemIdDatas * 200
+    packed = lnk.pack()
+    assert len(packed) == lnk.shellLinkHeader.packedSize() + sum(getattr(lnk, name).packedSize() for name in LNK.SECTIONS)
+
+    reparsed = LNK.fromBytes(packed)
+    assert reparsed.linkTargetIdList.itemIdDatas == lnk.linkTargetIdList.itemIdDatas
+    assert reparsed.stringData.COMMAND_LINE_ARGUMENTS == "a" * 32000
+
+    lnkFilePath = tmp_path / "large.lnk"
+    assert lnk.packAndSave(str(lnkFilePath)) == packed
+    assert lnkFilePath.read_bytes() == packed
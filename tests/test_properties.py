@@ -0,0 +1,75 @@
+import struct
+import uuid
+
+import pytest
+
+from benchmark import synthesizeLnk, synthesizePropertyStoreDataBlock
+from main import LNK, LNKLimits, LNKParseError
+
+LINK_FORMAT_ID = "B9B4B3FC-2B51-4A42-B5D8-324146AFCF25" # System.Link.TargetParsingPath is PropertyID 2
+TEST_FORMAT_ID = "00000000-0000-0000-0000-0000000000AA"
+
+# PropertyStoreDataBlock with one storage of raw TypedPropertyValues: {PropertyID: Type and Value bytes}
+def synthesizeTypedPropertyStoreDataBlock(typedValues: dict):
+    values = b""
+    for propertyId, typedValue in typedValues.items():
+        typedValue += b"\x00" * (-len(typedValue) % 4)
+        values += struct.pack("<IIB", 9 + len(typedValue), propertyId, 0) + typedValue
+    values += b"\x00\x00\x00\x00" # End of the storage
+    propertyStore = struct.pack("<II16s", 24 + len(values), 0x53505331, uuid.UUID(TEST_FORMAT_ID).bytes_le) + values
+    propertyStore += b"\x00\x00\x00\x00" # TerminalStorage
+    return struct.pack("<II", 8 + len(propertyStore), 0xA0000009) + propertyStore
+
+TYPED_VALUES = {
+    2: struct.pack("<HHi", 0x0003, 0, -7), # VT_I4
+    3: struct.pack("<HHH", 0x000B, 0, 0xFFFF), # VT_BOOL
+    4: struct.pack("<HHIII", 0x1013, 0, 2, 10, 20), # VT_VECTOR | VT_UI4
+    5: struct.pack("<HHQ", 0x0040, 0, 132223104000000000), # VT_FILETIME
+    6: struct.pack("<HH", 0x0001, 0), # VT_NULL
+    7: struct.pack("<HH", 0x0102, 0) + b"\x01\x02\x03\x04", # No decoder: raw bytes
+}
+
+def testGetProperty():
+    contents = synthesizeLnk(extraData = synthesizePropertyStoreDataBlock({(LINK_FORMAT_ID, 2): "C:\\Tools\\run.exe"}))
+    lnk = LNK.fromBytes(contents)
+    assert lnk.getProperty("System.Link.TargetParsingPath") == "C:\\Tools\\run.exe"
+    assert lnk.getProperty((LINK_FORMAT_ID, 2)) == "C:\\Tools\\run.exe"
+    assert lnk.getProperty((uuid.UUID(LINK_FORMAT_ID).bytes_le, 2)) == "C:\\Tools\\run.exe"
+    assert lnk.getProperty((LINK_FORMAT_ID, 3), "missing") == "missing"
+    with pytest.raises(ValueError):
+        lnk.getProperty("System.NoSuchProperty")
+
+    assert LNK.fromBytes(synthesizeLnk()).getProperty("System.Link.TargetParsingPath") == None
+    assert lnk.pack() == contents
+
+def testTypedValues():
+    lnk = LNK.fromBytes(synthesizeLnk(extraData = synthesizeTypedPropertyStoreDataBlock(TYPED_VALUES)))
+    propertyStore = lnk.extraData.getBlock("PropertyStoreDataBlock").propertyStore
+    assert [propertyId for formatId, propertyId in propertyStore.keys()] == list(TYPED_VALUES)
+    assert [lnk.getProperty((TEST_FORMAT_ID, propertyId)) for propertyId in TYPED_VALUES] == [
+        -7, True, [10, 20], 132223104000000000, None, b"\x01\x02\x03\x04",
+        ]
+
+# A malformed value comes back as its raw bytes, or in strict mode raises LNKParseError
+def testMalformedValue():
+    typedValues = {2: struct.pack("<HHI", 0x001F, 0, 2) + b"\x00\xD8\x00\x00"} # VT_LPWSTR holding a lone surrogate
+    contents = synthesizeLnk(extraData = synthesizeTypedPropertyStoreDataBlock(typedValues))
+    assert isinstance(LNK.fromBytes(contents).getProperty((TEST_FORMAT_ID, 2)), bytes)
+    with pytest.raises(LNKParseError):
+        LNK.fromBytes(contents, limits = LNKLimits()).getProperty((TEST_FORMAT_ID, 2))
+
+def testExtractProperties(tmp_path):
+    for i in range(3):
+        (tmp_path / f"link{i}.lnk").write_bytes(synthesizeLnk(extraData = synthesizePropertyStoreDataBlock({(LINK_FORMAT_ID, 2): f"C:\\Tools\\run{i}.exe"})))
+    (tmp_path / "none.lnk").write_bytes(synthesizeLnk())
+    (tmp_path / "broken.lnk").write_bytes(b"\x4C\x00")
+
+    keys = ["System.Link.TargetParsingPath", (TEST_FORMAT_ID, 2)]
+    for workers in (1, 2):
+        results = {lnkFilePath.rsplit("/", 1)[-1].rsplit("\\", 1)[-1]: (values, error) for lnkFilePath, values, error in LNK.extractProperties(str(tmp_path), keys, workers = workers)}
+        assert results["link1.lnk"] == ({"System.Link.TargetParsingPath": "C:\\Tools\\run1.exe", (TEST_FORMAT_ID, 2): None}, None)
+        assert results["none.lnk"] == ({"System.Link.TargetParsingPath": None, (TEST_FORMAT_ID, 2): None}, None)
+        assert results["broken.lnk"][0] == None and results["broken.lnk"][1].startswith("StructError: ")
+
+    with pytest.raises(ValueError):
+        list(LNK.extractProperties(str(tmp_path), ["System.NoSuchProperty"]))
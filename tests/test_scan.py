@@ -0,0 +1,35 @@
+import os
+
+from conftest import LNK_TREE
+from main import LNK
+
+def relativeResults(lnkTree, results):
+    return {os.path.relpath(lnkFilePath, lnkTree).replace(os.sep, "/"): (lnk, error) for lnkFilePath, lnk, error in results}
+
+def testScanInline(lnkTree):
+    results = relativeResults(lnkTree, LNK.scan(lnkTree, workers = 1))
+    assert sorted(results) == ["broken.lnk", "local.lnk", "sub/ansi.lnk", "sub/network.lnk"]
+
+    lnk, error = results["sub/ansi.lnk"]
+    assert error == None
+    assert lnk.stringData.COMMAND_LINE_ARGUMENTS == "/c echo ansi"
+    assert lnk._contents == None # Decoded in full, the raw file is not kept
+
+    lnk, error = results["broken.lnk"]
+    assert lnk == None
+    assert error.startswith("StructError: ")
+
+# The pool gives what parsing inline gives, whatever the chunk size
+def testScanPooled(lnkTree):
+    inline = relativeResults(lnkTree, LNK.scan(lnkTree, workers = 1))
+    pooled = relativeResults(lnkTree, LNK.scan(lnkTree, workers = 2, chunkSize = 1))
+    assert sorted(pooled) == sorted(inline)
+    for relativePath, (lnk, error) in pooled.items():
+        assert error == inline[relativePath][1]
+        if lnk != None:
+            assert lnk.pack() == LNK_TREE[relativePath]
+
+def testScanPathsAndRecursion(lnkTree):
+    assert sorted(relativeResults(lnkTree, LNK.scan(lnkTree, workers = 1, recursive = False))) == ["broken.lnk", "local.lnk"]
+    paths = [os.path.join(lnkTree, "local.lnk"), os.path.join(lnkTree, "sub")]
+    assert sorted(relativeResults(lnkTree, LNK.scan(paths, workers = 1))) == ["local.lnk", "sub/ansi.lnk", "sub/network.lnk"]
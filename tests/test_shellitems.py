@@ -0,0 +1,75 @@
+import struct
+import uuid
+
+from benchmark import synthesizeHeader, synthesizeIdList, synthesizeItemIdDatas, synthesizeLnk
+from main import LNK, LNKPathCache, _FileEntryShellItem, _NetworkLocationShellItem, _RootFolderShellItem, _ShellItem, _VolumeShellItem
+
+# File entry with a BEEF0004 extension block (version 9) carrying the long name
+def synthesizeFileEntryWithLongName(primaryName: str, longName: str):
+    primaryNameEncoded = primaryName.encode("ascii") + b"\x00"
+    primaryNameEncoded += b"\x00" * (len(primaryNameEncoded) % 2)
+    longNameEncoded = longName.encode("utf-16le") + b"\x00\x00"
+    extensionBlock = struct.pack("<HHIII", 0, 9, 0xBEEF0004, 0x50215021, 0x50215021) + b"\x00" * 30 + longNameEncoded
+    extensionBlock = struct.pack("<H", len(extensionBlock)) + extensionBlock[2:]
+    return b"\x32\x00" + struct.pack("<IIH", 4096, 0x50215021, 0x20) + primaryNameEncoded + extensionBlock
+
+def synthesizeIdListLnk(itemIdDatas: list):
+    return synthesizeHeader(linkFlags = 0x01 | 0x80) + synthesizeIdList(itemIdDatas) + b"\x00\x00\x00\x00"
+
+def testShellItems():
+    lnk = LNK.fromBytes(synthesizeLnk())
+    shellItems = lnk.linkTargetIdList.getShellItems()
+    assert [type(shellItem) for shellItem in shellItems] == [_RootFolderShellItem, _VolumeShellItem, _FileEntryShellItem, _FileEntryShellItem, _FileEntryShellItem]
+    assert shellItems[1].VolumeName == "C:\\"
+    assert [shellItem.Name for shellItem in shellItems[2:]] == ["Windows", "System32", "cmd.exe"]
+    assert shellItems[2].IsDirectory and shellItems[4].IsFile and shellItems[4].FileSize == 4096
+    assert lnk.linkTargetIdList.getPath() == "C:\\Windows\\System32\\cmd.exe"
+
+def testLongName():
+    itemIdDatas = synthesizeItemIdDatas("C:\\Program Files")[:2] + [synthesizeFileEntryWithLongName("PROGRA~1", "Program Files")]
+    lnk = LNK.fromBytes(synthesizeIdListLnk(itemIdDatas))
+    assert lnk.linkTargetIdList.getShellItems()[2].PrimaryName == "PROGRA~1"
+    assert lnk.linkTargetIdList.getPath() == "C:\\Program Files"
+
+# Network locations carry a whole UNC path; other shell folders are written as "::{CLSID}"; unknown items end the path
+def testPathForms():
+    networkLocation = b"\x41\x01\x80" + b"\\\\SERVER\\share\x00" + b"Share on SERVER\x00"
+    network = LNK.fromBytes(synthesizeIdListLnk([networkLocation, synthesizeItemIdDatas("C:\\run.exe")[2]]))
+    assert isinstance(network.linkTargetIdList.getShellItems()[0], _NetworkLocationShellItem)
+    assert network.linkTargetIdList.getShellItems()[0].Description == "Share on SERVER"
+    assert network.linkTargetIdList.getPath() == "\\\\SERVER\\share\\run.exe"
+
+    controlPanel = b"\x1F\x50" + uuid.UUID("21EC2020-3AEA-1069-A2DD-08002B30309D").bytes_le
+    assert LNK.fromBytes(synthesizeIdListLnk([controlPanel])).linkTargetIdList.getPath() == "::{21EC2020-3AEA-1069-A2DD-08002B30309D}"
+
+    unknown = LNK.fromBytes(synthesizeIdListLnk([b"\x74\x00\x01\x02"] + synthesizeItemIdDatas()[2:]))
+    assert type(unknown.linkTargetIdList.getShellItems()[0]) == _ShellItem
+    assert unknown.linkTargetIdList.getPath() == None
+    assert unknown.getTargetPath() == "" # No RELATIVE_PATH either
+
+    # Truncated items come back as plain _ShellItem rather than raising
+    truncated = LNK.fromBytes(synthesizeIdListLnk([b"\x32\x00\x01"]))
+    assert type(truncated.linkTargetIdList.getShellItems()[0]) == _ShellItem
+
+# Without LinkInfo, the target path comes from the IDList
+def testTargetPathFromIdList():
+    lnk = LNK.fromBytes(synthesizeIdListLnk(synthesizeItemIdDatas("D:\\data\\report.txt")))
+    assert lnk.getLinkInfoPaths() == ("", "")
+    assert lnk.getTargetPath() == "D:\\data\\report.txt"
+
+# A shared cache resolves the same paths, and keeps one trie node per folder rather than per link
+def testSharedPathCache():
+    lnks = [LNK.fromBytes(synthesizeIdListLnk(synthesizeItemIdDatas(f"C:\\Users\\alice\\file{i}.txt"))) for i in range(20)]
+    pathCache = LNKPathCache()
+    assert [lnk.linkTargetIdList.getPath(pathCache) for lnk in lnks] == [lnk.linkTargetIdList.getPath() for lnk in lnks]
+    assert [lnk.getTargetPath(pathCache) for lnk in lnks] == [f"C:\\Users\\alice\\file{i}.txt" for i in range(20)]
+
+    nodes = 0
+    pending = [pathCache.root]
+    while len(pending) != 0:
+        children = pending.pop()
+        nodes += len(children)
+        pending.extend(node[1] for node in children.values())
+    assert nodes == 4 # My Computer, C:\, Users, alice
+
+    assert pathCache.resolve([]) == None
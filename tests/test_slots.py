@@ -0,0 +1,30 @@
+import pytest
+
+from benchmark import synthesizeLnk
+from main import LNK, _ShellLinkHeader
+
+# Parsed sections hold their fields in __slots__, with no per-instance __dict__
+def testSectionsHaveNoDict():
+    lnk = LNK.fromBytes(synthesizeLnk())
+    for section in (lnk.shellLinkHeader, lnk.linkInfo, lnk.stringData):
+        assert not hasattr(section, "__dict__")
+    with pytest.raises(AttributeError):
+        lnk.shellLinkHeader.HasLinkTargetIdList = True # Misspelt flag
+
+# The flags are properties over the two bitmasks: reading and writing one touches only its own bit
+def testFlagProperties():
+    shellLinkHeader = _ShellLinkHeader()
+    shellLinkHeader.HasArguments = True
+    shellLinkHeader.IsUnicode = True
+    assert shellLinkHeader.LinkFlags == 0x20 | 0x80
+    shellLinkHeader.HasArguments = False
+    assert shellLinkHeader.LinkFlags == 0x80 and not shellLinkHeader.HasArguments
+
+    shellLinkHeader.FileAttributes = 0x21
+    assert shellLinkHeader.FILE_ATTRIBUTE_READONLY and shellLinkHeader.FILE_ATTRIBUTE_ARCHIVE
+    shellLinkHeader.FILE_ATTRIBUTE_READONLY = False
+    assert shellLinkHeader.FileAttributes == 0x20
+
+    shellLinkHeader.LinkFlags = 0xFFFFFFFF
+    shellLinkHeader.IsUnicode = False
+    assert shellLinkHeader.LinkFlags == 0xFFFFFF7F
@@ -0,0 +1,60 @@
+import io
+import zipfile
+
+import pytest
+
+from benchmark import synthesizeLnk, synthesizeTrackerDataBlock
+from main import LNK, LNKLimits, LNKParseError
+
+CONTENTS = synthesizeLnk(arguments = "/c echo stream", extraData = synthesizeTrackerDataBlock("stream-host"))
+
+# Readers handing back something other than bytes, as some wrapped streams do
+class BytearrayStream(io.RawIOBase):
+    def __init__(self, contents: bytes):
+        self.stream = io.BytesIO(contents)
+
+    def readable(self):
+        return True
+
+    def read(self, size = -1):
+        return bytearray(self.stream.read(size))
+
+def testFromStream():
+    lnk = LNK.fromStream(io.BytesIO(CONTENTS))
+    assert lnk.stringData.COMMAND_LINE_ARGUMENTS == "/c echo stream"
+    assert lnk.pack() == CONTENTS
+
+    # From the current position on
+    stream = io.BytesIO(b"\xFF" * 10 + CONTENTS)
+    stream.seek(10)
+    assert LNK.fromStream(stream).pack() == CONTENTS
+
+    lnk = LNK.fromStream(BytearrayStream(CONTENTS))
+    assert lnk.extraData.getBlock("TrackerDataBlock").MachineID == "stream-host"
+    assert lnk.pack() == CONTENTS
+
+    lnk = LNK.fromStream(io.BytesIO(CONTENTS), fields = ("stringData",))
+    assert lnk.stringData.COMMAND_LINE_ARGUMENTS == "/c echo stream"
+    assert lnk.linkInfo.LocalBasePath == None
+
+# A shortcut inside an archive is parsed from the member, never written to disk
+def testFromZipMember():
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zipFile:
+        zipFile.writestr("Desktop/shortcut.lnk", CONTENTS)
+    with zipfile.ZipFile(archive) as zipFile:
+        with zipFile.open("Desktop/shortcut.lnk") as member:
+            lnk = LNK.fromStream(member, limits = LNKLimits())
+    assert lnk.pack() == CONTENTS
+
+# In strict mode no more than maxFileSize + 1 bytes are read
+def testFromStreamLimits():
+    stream = io.BytesIO(CONTENTS + b"\x00" * 1000)
+    with pytest.raises(LNKParseError):
+        LNK.fromStream(stream, limits = LNKLimits(maxFileSize = len(CONTENTS)))
+    assert stream.tell() == len(CONTENTS) + 1
+
+    assert LNK.fromStream(io.BytesIO(CONTENTS), limits = LNKLimits(maxFileSize = len(CONTENTS))).pack() == CONTENTS
+
+    with pytest.raises(LNKParseError):
+        LNK.fromStream(io.BytesIO(CONTENTS[:40]), limits = LNKLimits())
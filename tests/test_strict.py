@@ -0,0 +1,106 @@
+import struct
+import time
+import uuid
+
+import pytest
+
+from benchmark import synthesizeHeader, synthesizeLnk, synthesizeTrackerDataBlock
+from conftest import LNK_TREE
+from main import LNK, LNKLimits, LNKParseError, _timeBudget
+
+CONTENTS = synthesizeLnk(extraData = synthesizeTrackerDataBlock("one") + synthesizeTrackerDataBlock("two"))
+ID_LIST_OFFSET = 0x4C
+
+def patched(contents: bytes, offset: int, value: bytes):
+    return contents[:offset] + value + contents[offset + len(value):]
+
+def parseError(contents, limits: LNKLimits = None):
+    with pytest.raises(LNKParseError) as excInfo:
+        LNK.fromBytes(contents, limits = limits or LNKLimits())
+    return excInfo.value
+
+def testWellFormed():
+    lnk = LNK.fromBytes(CONTENTS, limits = LNKLimits())
+    assert lnk._contents == None # Decoded up front
+    assert [block.MachineID for block in lnk.extraData.getBlocks()] == ["one", "two"]
+    assert lnk.pack() == CONTENTS
+
+def testSizeLimits(tmp_path):
+    assert parseError(CONTENTS, LNKLimits(maxFileSize = len(CONTENTS) - 1)).section == None
+    LNK.fromBytes(CONTENTS, limits = LNKLimits(maxFileSize = len(CONTENTS)))
+
+    lnkFilePath = tmp_path / "large.lnk"
+    lnkFilePath.write_bytes(CONTENTS)
+    with pytest.raises(LNKParseError):
+        LNK(str(lnkFilePath), limits = LNKLimits(maxFileSize = 100))
+
+def testHeader():
+    error = parseError(CONTENTS[:40])
+    assert (error.section, error.reason) == ("shellLinkHeader", "truncated")
+    assert parseError(patched(CONTENTS, 0, b"\x4D")).reason == "bad HeaderSize or LinkCLSID"
+    assert parseError(patched(CONTENTS, 4, b"\x02")).reason == "bad HeaderSize or LinkCLSID"
+
+# Each malformed section is reported with its name and the offset of what is wrong; lenient mode carries on
+def testMalformedSections():
+    contents = patched(CONTENTS, ID_LIST_OFFSET + 2, b"\x01\x00")
+    error = parseError(contents)
+    assert (error.section, error.offset) == ("linkTargetIdList", ID_LIST_OFFSET + 2)
+    assert LNK.fromBytes(contents).linkTargetIdList.itemIdDatas == []
+
+    error = parseError(patched(CONTENTS, ID_LIST_OFFSET, b"\xFF\x7F")) # IDListSize past the end of the file
+    assert error.section in ("linkTargetIdList", "linkInfo", "stringData", "extraData")
+
+    linkInfoOnly = synthesizeHeader(linkFlags = 0x02) + struct.pack("<II", 0x10, 0x1C) + bytes(8) + b"\x00\x00\x00\x00"
+    error = parseError(linkInfoOnly)
+    assert (error.section, error.offset) == ("linkInfo", 0x4C)
+
+    error = parseError(CONTENTS[:-50]) # The last block cut short
+    assert (error.section, error.reason) == ("extraData", "BlockSize 96 runs past the end of the buffer")
+    assert LNK.fromBytes(CONTENTS[:-50]).extraData.getBlock("TrackerDataBlock").MachineID == "one"
+
+    headerOnly = synthesizeHeader(linkFlags = 0) + b"\x00\x00\x00\x00"
+    assert parseError(headerOnly[:-4] + struct.pack("<I", 6) + b"\x00\x00" + headerOnly[-4:]).reason == "BlockSize 6 is too small for a block"
+    assert LNK.fromBytes(headerOnly[:-4], limits = LNKLimits()).pack() == headerOnly[:-4] # A missing TerminalBlock is let through, and kept missing
+
+def testCountLimits():
+    error = parseError(CONTENTS, LNKLimits(maxItemIds = 4))
+    assert (error.section, error.reason) == ("linkTargetIdList", "more than 4 ItemIDs")
+    LNK.fromBytes(CONTENTS, limits = LNKLimits(maxItemIds = 5))
+
+    error = parseError(CONTENTS, LNKLimits(maxExtraDataBlocks = 1))
+    assert (error.section, error.reason) == ("extraData", "more than 1 ExtraData blocks")
+
+# Blocks are decoded when asked for; a malformed one raises LNKParseError rather than the decoder's own error
+def testMalformedBlockOnDemand():
+    trackerDataBlock = struct.pack("<IIII16s16s16s16s16s", 0x60, 0xA0000003, 0x58, 0, b"host\xff", *(uuid.uuid4().bytes_le for i in range(4)))
+    contents = synthesizeLnk(extraData = trackerDataBlock)
+    with pytest.raises(UnicodeDecodeError):
+        LNK.fromBytes(contents).extraData.getBlock("TrackerDataBlock")
+
+    lnk = LNK.fromBytes(contents, limits = LNKLimits())
+    with pytest.raises(LNKParseError) as excInfo:
+        lnk.extraData.getBlock("TrackerDataBlock")
+    assert excInfo.value.section == "extraData"
+    assert excInfo.value.offset == len(contents) - len(trackerDataBlock) - 4
+    assert lnk.pack() == contents
+
+# scan() reports each file's failure as "LNKParseError: ..." and goes on with the rest
+def testScanErrors(lnkTree):
+    results = {lnkFilePath.replace("\\", "/").rsplit("/", 1)[-1]: (lnk, error) for lnkFilePath, lnk, error in LNK.scan(lnkTree, workers = 1, limits = LNKLimits())}
+    assert results["broken.lnk"][0] == None
+    assert results["broken.lnk"][1].startswith("LNKParseError: ")
+    assert results["local.lnk"][1] == None and results["local.lnk"][0].pack() == LNK_TREE["local.lnk"]
+
+    results = list(LNK.scan(lnkTree, workers = 1, limits = LNKLimits(maxFileSize = 100)))
+    assert all(error.startswith("LNKParseError: ") and "larger than 100 bytes" in error for lnkFilePath, lnk, error in results)
+
+def testTimeBudget():
+    with pytest.raises(LNKParseError):
+        with _timeBudget(0.01):
+            while True:
+                time.sleep(0.001)
+    with _timeBudget(None):
+        pass
+    with _timeBudget(0.2):
+        pass
+    time.sleep(0.3) # The timer was cleared on the way out
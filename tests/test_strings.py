@@ -0,0 +1,48 @@
+import tracemalloc
+
+from main import LNK, getStringUtf8, getStringUtf16Le
+
+def testUtf16Terminator():
+    assert getStringUtf16Le("abc\x00def".encode("utf-16le")) == "abc"
+    # U+0100 U+0041: its bytes hold a misaligned 00 00 pair, which is not a terminator
+    assert getStringUtf16Le(b"x" + "ĀA\x00".encode("utf-16le"), 1) == "ĀA"
+    assert getStringUtf16Le("abcdef".encode("utf-16le"), 0, 3) == "abc"
+    assert getStringUtf16Le(memoryview(("z" * 3000 + "\x00").encode("utf-16le"))) == "z" * 3000
+
+def testUtf8Terminator():
+    assert getStringUtf8(b"abc\x00def") == "abc"
+    assert getStringUtf8(memoryview(b"abc\x00def"), 4, 3) == "def"
+
+def testUnterminatedString():
+    for function, contents in ((getStringUtf8, b"abc"), (getStringUtf16Le, "abc".encode("utf-16le"))):
+        try:
+            function(contents)
+        except IndexError:
+            continue
+        assert False, f"{function.__name__} read an unterminated string"
+
+# A link with LinkInfo's unicode paths, which are NULL-terminated rather than counted
+def synthesizeUnicodeLinkInfoLnk():
+    lnk = LNK()
+    lnk.shellLinkHeader.HasLinkInfo = True
+    lnk.linkInfo.VolumeIDAndLocalBasePathPresent = True
+    lnk.linkInfo.LocalBasePath = "C:\\tool.exe"
+    lnk.linkInfo.LocalBasePathUnicode = "C:\\tool.exe"
+    return lnk.pack()
+
+# A small link at the start of a big borrowed buffer: parsing it must not copy the rest of the buffer
+def testMemoryviewParseDoesNotCopyBuffer():
+    contents = synthesizeUnicodeLinkInfoLnk()
+    buffer = bytearray(64 * 1024 * 1024)
+    buffer[0:len(contents)] = contents
+
+    tracemalloc.start()
+    try:
+        lnk = LNK.fromBytes(memoryview(buffer), 0)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    assert lnk.linkInfo.LocalBasePathUnicode == "C:\\tool.exe"
+    assert lnk.pack() == contents
+    assert peak < 1024 * 1024
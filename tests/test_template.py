@@ -0,0 +1,47 @@
+import pytest
+
+from benchmark import synthesizeLnk
+from main import LNK, LNKTemplate
+
+CONTENTS = synthesizeLnk(arguments = "/c echo template")
+
+def testRenderWithoutOverrides():
+    lnkTemplate = LNKTemplate(LNK.fromBytes(CONTENTS))
+    rendered = lnkTemplate.render()
+    assert isinstance(rendered, bytes)
+    assert rendered == CONTENTS
+
+# Each override lands in its own section and leaves the template itself untouched
+def testRenderOverrides():
+    lnkTemplate = LNKTemplate(LNK.fromBytes(CONTENTS))
+    lnk = LNK.fromBytes(lnkTemplate.render({"COMMAND_LINE_ARGUMENTS": "/c echo variant", "IconIndex": 5, "LocalBasePath": "D:\\tool.exe"}))
+    assert lnk.stringData.COMMAND_LINE_ARGUMENTS == "/c echo variant"
+    assert lnk.shellLinkHeader.IconIndex == 5
+    assert lnk.linkInfo.LocalBasePath == "D:\\tool.exe"
+    assert lnkTemplate.render() == CONTENTS
+
+    # A header change that moves the strings' encoding rewrites them
+    lnk = LNK.fromBytes(lnkTemplate.render({"IsUnicode": False}))
+    assert not lnk.shellLinkHeader.IsUnicode
+    assert lnk.stringData.COMMAND_LINE_ARGUMENTS == "/c echo template"
+
+    with pytest.raises(ValueError):
+        lnkTemplate.render({"NoSuchField": 1})
+
+def testTemplateRefusesPartialLink():
+    with pytest.raises(ValueError):
+        LNKTemplate(LNK.fromBytes(CONTENTS, fields = ("stringData",)))
+
+def testGenerate(tmp_path):
+    lnkTemplate = LNKTemplate(LNK.fromBytes(CONTENTS))
+    variants = [(str(tmp_path / f"variant{i}.lnk"), {"COMMAND_LINE_ARGUMENTS": f"/c echo {i}"}) for i in range(50)]
+    variants.append((str(tmp_path / "bad.lnk"), {"NoSuchField": 1}))
+    results = dict(lnkTemplate.generate(variants, workers = 4))
+
+    assert len(results) == 51
+    assert results[str(tmp_path / "bad.lnk")].startswith("ValueError: ")
+    assert not (tmp_path / "bad.lnk").exists()
+    for i in range(50):
+        variantPath = str(tmp_path / f"variant{i}.lnk")
+        assert results[variantPath] == None
+        assert LNK(variantPath).stringData.COMMAND_LINE_ARGUMENTS == f"/c echo {i}"
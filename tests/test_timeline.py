@@ -0,0 +1,92 @@
+import datetime
+import io
+
+from benchmark import synthesizeLnk
+from main import LNK, LNKTimeline, datetimeToFiletime, filetimeToDatetime, filetimeToIso
+
+FILETIME_2024 = 133485408000000000 # 2024-01-01T00:00:00Z
+
+def timedLnk(created: int, accessed: int, modified: int):
+    lnk = LNK.fromBytes(synthesizeLnk())
+    lnk.shellLinkHeader.CreationFiletime = created
+    lnk.shellLinkHeader.AccessFiletime = accessed
+    lnk.shellLinkHeader.WriteFiletime = modified
+    return LNK.fromBytes(lnk.pack(), fields = ())
+
+def testConversions():
+    assert filetimeToIso(FILETIME_2024) == "2024-01-01T00:00:00.0000000Z"
+    assert filetimeToIso(FILETIME_2024 + 1234567) == "2024-01-01T00:00:00.1234567Z"
+    assert filetimeToIso(0) == "1601-01-01T00:00:00.0000000Z"
+    assert filetimeToIso((1 << 64) - 1) == "" # Past the year 9999
+
+    value = datetime.datetime(2024, 1, 1, 0, 0, 0, 123456, tzinfo = datetime.timezone.utc)
+    assert datetimeToFiletime(value) == FILETIME_2024 + 1234560
+    assert datetimeToFiletime(value.replace(tzinfo = None)) == FILETIME_2024 + 1234560 # Naive is UTC
+    assert datetimeToFiletime(value.astimezone(datetime.timezone(datetime.timedelta(hours = 5)))) == FILETIME_2024 + 1234560
+    assert filetimeToDatetime(FILETIME_2024 + 1234567) == value # The last digit is truncated
+    assert datetimeToFiletime(filetimeToDatetime(FILETIME_2024 + 1234560)) == FILETIME_2024 + 1234560
+
+# Events come out in time order across runs, unset times left out; start is inclusive and end exclusive
+def testEventsInOrder():
+    lnkTimeline = LNKTimeline(runSize = 4)
+    lnkTimeline.add(timedLnk(FILETIME_2024 + 50, FILETIME_2024 + 10, 0), "a.lnk")
+    lnkTimeline.add(timedLnk(FILETIME_2024 + 30, FILETIME_2024 + 30, FILETIME_2024 + 20), "b.lnk")
+    lnkTimeline.add(timedLnk(FILETIME_2024 + 40, FILETIME_2024 + 1, FILETIME_2024 + 60), "c.lnk")
+    assert len(lnkTimeline) == 8
+    assert len(lnkTimeline.runs) == 1 # One sealed run, three events not yet sorted
+
+    events = list(lnkTimeline.events())
+    assert events == sorted(events)
+    assert [(filetime - FILETIME_2024, LNKTimeline.KINDS[kind], lnkTimeline.entries[entry]) for filetime, kind, entry in events] == [
+        (1, "accessed", "c.lnk"), (10, "accessed", "a.lnk"), (20, "modified", "b.lnk"), (30, "created", "b.lnk"),
+        (30, "accessed", "b.lnk"), (40, "created", "c.lnk"), (50, "created", "a.lnk"), (60, "modified", "c.lnk"),
+        ]
+
+    assert [filetime - FILETIME_2024 for filetime, kind, entry in lnkTimeline.events(FILETIME_2024 + 20, FILETIME_2024 + 50)] == [20, 30, 30, 40]
+    start = filetimeToDatetime(FILETIME_2024 + 20)
+    assert [filetime - FILETIME_2024 for filetime, kind, entry in lnkTimeline.events(start = start)] == [20, 30, 30, 40, 50, 60]
+    assert list(lnkTimeline.events(FILETIME_2024 + 61)) == []
+
+    assert list(lnkTimeline.iterDatetimes(end = FILETIME_2024 + 10)) == [(filetimeToDatetime(FILETIME_2024 + 1), "accessed", "c.lnk")]
+
+def testFromResultsAndMerge():
+    first = LNKTimeline.fromResults([
+        ("a.lnk", timedLnk(FILETIME_2024 + 3, 0, 0), None),
+        ("failed.lnk", None, "LNKParseError: bad"),
+        ])
+    second = LNKTimeline.fromResults([timedLnk(FILETIME_2024 + 1, 0, FILETIME_2024 + 5)])
+    assert len(first.entries) == 1 and len(second.entries) == 1
+
+    merged = first.merge(second)
+    assert len(merged.entries) == 2 and isinstance(merged.entries[1], LNK)
+    assert [(filetime - FILETIME_2024, entry) for filetime, kind, entry in merged.events()] == [(1, 1), (3, 0), (5, 1)]
+
+# A FILETIME past the year 9999 is kept and exported as its integer, but has no datetime
+def testOutOfRangeFiletime():
+    lnkTimeline = LNKTimeline()
+    lnkTimeline.add(timedLnk(FILETIME_2024, (1 << 64) - 1, 0), "crafted.lnk")
+    assert [event[0] for event in lnkTimeline.events()] == [FILETIME_2024, (1 << 64) - 1]
+    assert [event[1] for event in lnkTimeline.iterDatetimes()] == ["created"]
+    assert lnkTimeline.skippedEvents == 1
+
+    outFile = io.StringIO()
+    assert lnkTimeline.export(outFile) == 2
+    assert outFile.getvalue().splitlines()[2] == f",{(1 << 64) - 1},accessed,crafted.lnk"
+
+def testExport(tmp_path):
+    lnkTimeline = LNKTimeline(runSize = 2)
+    for i in range(5):
+        lnkTimeline.add(timedLnk(FILETIME_2024 + i * 10_000_000, 0, 0), f"link{i}.lnk")
+    lnkTimeline.add(timedLnk(FILETIME_2024 + 1, 0, 0)) # No path: an LNK entry
+
+    csvFilePath = tmp_path / "timeline.csv"
+    assert lnkTimeline.export(str(csvFilePath), bufferRecords = 2) == 6
+    lines = csvFilePath.read_text(encoding="utf-8").splitlines()
+    assert lines[0] == "time,filetime,kind,path"
+    assert lines[1] == f"2024-01-01T00:00:00.0000000Z,{FILETIME_2024},created,link0.lnk"
+    assert lines[2] == f"2024-01-01T00:00:00.0000001Z,{FILETIME_2024 + 1},created,"
+    assert lines[6] == f"2024-01-01T00:00:04.0000000Z,{FILETIME_2024 + 40_000_000},created,link4.lnk"
+
+    outFile = io.StringIO()
+    assert lnkTimeline.export(outFile, FILETIME_2024 + 10_000_000, FILETIME_2024 + 30_000_000) == 2
+    assert [line.rsplit(",", 1)[1] for line in outFile.getvalue().splitlines()[1:]] == ["link1.lnk", "link2.lnk"]
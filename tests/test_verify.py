@@ -0,0 +1,68 @@
+import os
+import pickle
+
+from benchmark import synthesizeLnk, synthesizeTrackerDataBlock
+from conftest import LNK_TREE
+from main import LNK, LNKSectionDiff, LNKVerifyReport
+
+def writeFiles(tmp_path, files: dict):
+    for name, contents in files.items():
+        (tmp_path / name).write_bytes(contents)
+
+def verifyResults(tmp_path, **kwargs):
+    return {os.path.basename(lnkFilePath): (diffs, error) for lnkFilePath, diffs, error in LNK.verify(str(tmp_path), **kwargs)}
+
+CLEAN = synthesizeLnk(extraData = synthesizeTrackerDataBlock())
+RESERVED = CLEAN[:0x42] + b"\x01" + CLEAN[0x43:] # Reserved1, which the header serializer writes as zero
+
+def testRoundTrips(tmp_path):
+    writeFiles(tmp_path, {"clean.lnk": CLEAN, "reserved.lnk": RESERVED, "trailing.lnk": CLEAN + b"junk", "broken.lnk": CLEAN[:200]})
+    results = verifyResults(tmp_path, workers = 1)
+
+    assert results["clean.lnk"] == ({}, None)
+
+    diffs, error = results["reserved.lnk"]
+    assert error == None and list(diffs) == ["shellLinkHeader"]
+    diff = diffs["shellLinkHeader"]
+    assert (diff.sourceSize, diff.packedSize, diff.differingBytes, diff.offsets, diff.stable) == (0x4C, 0x4C, 1, [0x42], True)
+
+    diffs, error = results["trailing.lnk"]
+    assert list(diffs) == ["trailing"] and diffs["trailing"].sourceSize == 4 and diffs["trailing"].packedSize == 0
+
+    diffs, error = results["broken.lnk"]
+    assert diffs == None and error.startswith("StructError: ")
+
+    # The pool gives the same
+    pooled = verifyResults(tmp_path, workers = 2, chunkSize = 1)
+    assert {name: error for name, (diffs, error) in pooled.items()} == {name: error for name, (diffs, error) in results.items()}
+    assert pooled["reserved.lnk"][0]["shellLinkHeader"].offsets == [0x42]
+
+def testReport(tmp_path):
+    writeFiles(tmp_path, {"clean.lnk": CLEAN, "reserved1.lnk": RESERVED, "reserved2.lnk": RESERVED, "broken.lnk": CLEAN[:200]})
+    lnkVerifyReport = LNKVerifyReport.fromResults(LNK.verify(str(tmp_path), workers = 1))
+    assert (lnkVerifyReport.files, lnkVerifyReport.identical) == (4, 1)
+    assert lnkVerifyReport.errors == {"StructError": 1}
+    assert lnkVerifyReport.sectionMismatches == {"shellLinkHeader": 2}
+    assert lnkVerifyReport.sizeMismatches == {} and lnkVerifyReport.unstable == {}
+    assert lnkVerifyReport.offsetHistogram == {"shellLinkHeader": {0x42: 2}}
+
+    summary = lnkVerifyReport.summary()
+    assert summary.splitlines()[0] == "4 files, 1 identical, 2 differing, 1 failed"
+    assert "  shellLinkHeader: 2 files (0 resized, 0 unstable)" in summary
+    assert "    +0x0042: 2" in summary
+
+    # Reports from other processes or runs add up
+    merged = LNKVerifyReport().merge(lnkVerifyReport).merge(pickle.loads(pickle.dumps(lnkVerifyReport)))
+    assert (merged.files, merged.identical, merged.errors) == (8, 2, {"StructError": 2})
+    assert merged.offsetHistogram == {"shellLinkHeader": {0x42: 4}}
+
+def testTree(lnkTree):
+    lnkVerifyReport = LNKVerifyReport.fromResults(LNK.verify(str(lnkTree), workers = 1))
+    assert lnkVerifyReport.files == sum(1 for relativePath in LNK_TREE if relativePath.endswith(".lnk"))
+    assert lnkVerifyReport.identical == lnkVerifyReport.files - 1 # broken.lnk
+
+def testSectionDiffOffsetsAreCapped():
+    diff = LNKSectionDiff(bytes(200), b"\xFF" * 100, False)
+    assert diff.differingBytes == 100
+    assert diff.offsets == list(range(LNKSectionDiff.MAX_OFFSETS))
+    assert (diff.sourceSize, diff.packedSize, diff.stable) == (200, 100, False)